@@ -0,0 +1,290 @@
+"""
+Benchmark de carga y de endpoints sobre datasets sintéticos.
+
+Para cada tamaño genera un CSV con generar_dataset.py y lanza un proceso nuevo
+que importa main.py con RUTA_CSV apuntando a ese archivo. Así cada medición
+parte de cero y el pico de memoria no se mezcla entre tamaños. En ese proceso
+se mide:
+    - la carga desde el CSV (importar main) y desde el snapshot (load_pacientes)
+    - el pico de memoria residente (RSS)
+    - la latencia p50/p99 de cada endpoint, llamando a la app ASGI en el mismo
+      proceso, sin red ni servidor. Se mide con la caché de respuestas
+      desactivada, para medir el cálculo y no la caché
+    - aparte, la latencia p50 de los aciertos de caché de los endpoints que la usan
+
+Los resultados se comparan con benchmark_baseline.json. Un valor que supera
+su línea base por más de la tolerancia cuenta como regresión, igual que una
+métrica que no tiene línea base, y el proceso termina con código 1.
+
+Uso:
+    python benchmark.py --filas 10000 100000
+    python benchmark.py --filas 10000 100000 --guardar-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from generar_dataset import generar_dataset
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUTA_BASELINE = os.path.join(DIRECTORIO, "benchmark_baseline.json")
+# Cociente máximo entre la medición y la línea base antes de marcar una regresión
+TOLERANCIA = 1.5
+# Diferencia absoluta por debajo de la cual no se marca regresión (ruido de reloj)
+MARGEN_MS = 0.5
+
+
+def consultas(filas: int) -> List[Tuple[str, str, str, Optional[Dict]]]:
+    """
+    Consultas representativas de cada endpoint.
+
+    Args:
+        filas (int): Tamaño del dataset, para elegir un id existente
+
+    Returns:
+        List[Tuple[str, str, str, Optional[Dict]]]: Nombre, método, ruta y cuerpo JSON
+    """
+    return [
+        ('pacientes_pagina', 'GET', '/pacientes?limit=100', None),
+        ('paciente_por_id', 'GET', f'/pacientes/s{filas // 2}', None),
+        ('por_servicio', 'GET', '/pacientes/por_servicio/?servicio=pediatria&limit=100', None),
+        ('por_enfermedad', 'GET', '/pacientes/por_enfermedad/?enfermedad=diabetes&limit=100', None),
+        ('por_enfermedad_fuzzy', 'GET', '/pacientes/por_enfermedad/?enfermedad=diabetis&fuzzy=true&limit=100', None),
+        ('por_estancia', 'GET', '/pacientes/por_estancia/?estancia=7&limit=100', None),
+        ('por_estancia_rango', 'GET', '/pacientes/por_estancia/?min=7&max=30&limit=100', None),
+        ('por_edad_conteo', 'GET', '/pacientes/por_edad/?min=60&solo_conteo=true', None),
+        ('exportar_csv', 'GET', '/pacientes/exportar/?servicio=pediatria', None),
+        ('consulta_compuesta', 'GET', '/pacientes/consulta/?enfermedad=diabetes&servicio=hospitalizacion&genero=f&edad_min=60&estancia_min=7&limit=100', None),
+        ('promedio_estancia', 'GET', '/pacientes/promedio_estancia_por_enfermedad/?enfermedad=diabetes', None),
+        ('estadisticas_estancia', 'GET', '/pacientes/estadisticas_estancia/?servicio=pediatria', None),
+        ('distribucion_estancia', 'GET', '/pacientes/distribucion_estancia/?enfermedad=diabetes&servicio=hospitalizacion', None),
+        ('censo_camas', 'GET', '/pacientes/censo_camas/?desde=2019-01-01&hasta=2019-12-31', None),
+        ('altas_proyectadas', 'GET', '/pacientes/altas_proyectadas/?fecha=2019-06-02', None),
+        ('chat', 'POST', '/chat', {'mensaje': 'promedio de estancia para diabetes en pediatria'}),
+    ]
+
+
+async def llamar_asgi(app, metodo: str, ruta: str, cuerpo: Optional[Dict] = None) -> Tuple[int, int]:
+    """
+    Ejecuta una petición directamente sobre la aplicación ASGI.
+
+    Returns:
+        Tuple[int, int]: Código de estado y bytes del cuerpo de la respuesta
+    """
+    camino, _, query = ruta.partition('?')
+    datos = json.dumps(cuerpo).encode() if cuerpo is not None else b''
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': metodo, 'scheme': 'http', 'path': camino, 'raw_path': camino.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'benchmark'), (b'content-type', b'application/json'), (b'content-length', str(len(datos)).encode())],
+        'client': ('127.0.0.1', 0), 'server': ('benchmark', 80),
+    }
+    pendientes = [{'type': 'http.request', 'body': datos, 'more_body': False}]
+    estado = {'codigo': 0, 'bytes': 0}
+
+    async def receive():
+        if pendientes:
+            return pendientes.pop()
+        # El cliente nunca se desconecta durante la medición
+        await asyncio.Future()
+
+    async def send(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado['codigo'] = mensaje['status']
+        elif mensaje['type'] == 'http.response.body':
+            estado['bytes'] += len(mensaje.get('body', b''))
+
+    await app(scope, receive, send)
+    return estado['codigo'], estado['bytes']
+
+
+async def cronometrar(app, metodo: str, ruta: str, cuerpo: Optional[Dict], repeticiones: int) -> List[float]:
+    """Latencia en milisegundos de `repeticiones` llamadas seguidas a la misma consulta."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await llamar_asgi(app, metodo, ruta, cuerpo)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+async def medir_endpoints(app, cache, filas: int, repeticiones: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mide p50/p99 de cada consulta con la caché de respuestas desactivada.
+
+    La primera llamada calienta los índices perezosos y no se cuenta. Después
+    se restituye el presupuesto de la caché y, si la consulta la usa, se mide
+    aparte la latencia de sus aciertos (cache_p50_ms).
+
+    Args:
+        app: Aplicación ASGI
+        cache: Caché de respuestas de la aplicación
+        filas (int): Tamaño del dataset
+        repeticiones (int): Llamadas medidas por consulta y modo
+
+    Returns:
+        Dict[str, Dict[str, float]]: Métricas por nombre de consulta
+    """
+    presupuesto = cache.presupuesto
+    resultados = {}
+    try:
+        for nombre, metodo, ruta, cuerpo in consultas(filas):
+            cache.presupuesto = 0
+            codigo, _ = await llamar_asgi(app, metodo, ruta, cuerpo)
+            if codigo != 200:
+                raise RuntimeError(f"{metodo} {ruta} respondió {codigo}")
+            tiempos = await cronometrar(app, metodo, ruta, cuerpo, repeticiones)
+            resultados[nombre] = {
+                'p50_ms': round(float(np.percentile(tiempos, 50)), 3),
+                'p99_ms': round(float(np.percentile(tiempos, 99)), 3),
+            }
+
+            cache.presupuesto = presupuesto
+            await llamar_asgi(app, metodo, ruta, cuerpo)
+            aciertos = cache.aciertos
+            tiempos = await cronometrar(app, metodo, ruta, cuerpo, repeticiones)
+            if cache.aciertos - aciertos == repeticiones:
+                resultados[nombre]['cache_p50_ms'] = round(float(np.percentile(tiempos, 50)), 3)
+    finally:
+        cache.presupuesto = presupuesto
+    return resultados
+
+
+def medir_proceso(filas: int, repeticiones: int) -> Dict:
+    """
+    Mediciones dentro del proceso hijo, con RUTA_CSV ya configurada en el entorno.
+
+    Returns:
+        Dict: Tiempos de carga, pico de RSS y latencias por endpoint
+    """
+    inicio = time.perf_counter()
+    import main
+    carga_csv_ms = (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    main.load_pacientes()
+    carga_snapshot_ms = (time.perf_counter() - inicio) * 1000
+
+    endpoints = asyncio.run(medir_endpoints(main.app, main.cache_respuestas, filas, repeticiones))
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico_mb = pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+    return {
+        'carga_csv_ms': round(carga_csv_ms, 1),
+        'carga_snapshot_ms': round(carga_snapshot_ms, 1),
+        'pico_rss_mb': round(pico_mb, 1),
+        'endpoints': endpoints,
+    }
+
+
+def ejecutar(filas: int, repeticiones: int, directorio: str) -> Dict:
+    """Genera (o reutiliza) el dataset de `filas` filas y lo mide en un proceso nuevo."""
+    ruta = os.path.join(directorio, f"sintetico_{filas}.csv")
+    if not os.path.exists(ruta):
+        generar_dataset(filas, ruta)
+    # Sin snapshot previo, la primera carga se mide desde el CSV
+    if os.path.exists(ruta + ".snapshot"):
+        os.remove(ruta + ".snapshot")
+    entorno = {**os.environ, 'RUTA_CSV': ruta, 'USAR_SNAPSHOT': '1', 'MODO_DATOS': 'local', 'RECARGA_AUTOMATICA': '0'}
+    salida = subprocess.run(
+        [sys.executable, __file__, '--medir', str(filas), '--repeticiones', str(repeticiones)],
+        cwd=DIRECTORIO, env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def aplanar(resultado: Dict) -> Dict[str, float]:
+    """Convierte un resultado en pares métrica -> valor para compararlo con la línea base."""
+    metricas = {k: v for k, v in resultado.items() if k != 'endpoints'}
+    for nombre, valores in resultado['endpoints'].items():
+        for metrica, valor in valores.items():
+            metricas[f"{nombre}.{metrica}"] = valor
+    return metricas
+
+
+def comparar(resultados: Dict[str, Dict], baseline: Dict[str, Dict], tolerancia: float) -> List[str]:
+    """
+    Lista las métricas que empeoraron respecto de la línea base.
+
+    Una métrica (o un tamaño) sin línea base también cuenta: de lo contrario
+    un endpoint nuevo quedaría fuera de la comparación sin que nadie lo note.
+
+    Returns:
+        List[str]: Descripción de cada regresión o línea base faltante
+    """
+    regresiones = []
+    for filas, resultado in resultados.items():
+        if filas not in baseline:
+            regresiones.append(f"{filas} filas: sin línea base (regenerarla con --guardar-baseline)")
+            continue
+        referencia = aplanar(baseline[filas])
+        for metrica, valor in aplanar(resultado).items():
+            base = referencia.get(metrica)
+            if base is None:
+                regresiones.append(f"{filas} filas, {metrica}: {valor} sin línea base (regenerarla con --guardar-baseline)")
+                continue
+            margen = 0 if metrica == 'pico_rss_mb' else MARGEN_MS
+            if valor > base * tolerancia and valor - base > margen:
+                regresiones.append(f"{filas} filas, {metrica}: {valor} (línea base {base})")
+    return regresiones
+
+
+def imprimir(resultados: Dict[str, Dict]) -> None:
+    """Muestra los resultados como tabla de texto."""
+    for filas, resultado in resultados.items():
+        print(f"\n== {filas} filas ==")
+        print(f"carga CSV {resultado['carga_csv_ms']} ms | carga snapshot {resultado['carga_snapshot_ms']} ms | "
+              f"pico RSS {resultado['pico_rss_mb']} MB")
+        for nombre, valores in resultado['endpoints'].items():
+            cache = f"   caché p50 {valores['cache_p50_ms']:>7.3f} ms" if 'cache_p50_ms' in valores else ''
+            print(f"  {nombre:<24} p50 {valores['p50_ms']:>9.3f} ms   p99 {valores['p99_ms']:>9.3f} ms{cache}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga y endpoints de la API de pacientes")
+    parser.add_argument("--filas", type=int, nargs='+', default=[10_000, 100_000], help="Tamaños de dataset a medir")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Peticiones medidas por endpoint")
+    parser.add_argument("--directorio", default=os.path.join(tempfile.gettempdir(), "benchmark_pacientes"),
+                        help="Dónde se guardan (y reutilizan) los CSV sintéticos")
+    parser.add_argument("--baseline", default=RUTA_BASELINE, help="Archivo JSON con la línea base")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Reemplaza la línea base con esta ejecución")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Cociente admitido sobre la línea base")
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir is not None:
+        print(json.dumps(medir_proceso(args.medir, args.repeticiones)))
+        sys.exit(0)
+
+    os.makedirs(args.directorio, exist_ok=True)
+    resultados = {str(filas): ejecutar(filas, args.repeticiones, args.directorio) for filas in args.filas}
+    imprimir(resultados)
+
+    if args.guardar_baseline:
+        with open(args.baseline, 'w') as archivo:
+            json.dump({
+                'entorno': {'python': platform.python_version(), 'plataforma': platform.platform(), 'numpy': np.__version__},
+                'filas': resultados
+            }, archivo, indent=2, ensure_ascii=False)
+            archivo.write('\n')
+        print(f"\nLínea base guardada en {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as archivo:
+            regresiones = comparar(resultados, json.load(archivo)['filas'], args.tolerancia)
+        if regresiones:
+            print("\nRegresiones respecto de la línea base:")
+            print("\n".join(f"  - {r}" for r in regresiones))
+            sys.exit(1)
+        print("\nSin regresiones respecto de la línea base")
@@ -0,0 +1,171 @@
+"""
+Prepara los archivos de Static/ para servirlos con caché de larga duración.
+
+Por cada archivo escribe en Static/dist/ una copia con el hash del contenido
+en el nombre (hospital_futurista.1a2b3c4d5e6f.png). Como la URL cambia cuando
+cambia el archivo, main.py puede servirlos como "immutable". Además:
+    - genera variantes .gz y .br (si está instalado brotli) cuando la
+      compresión ahorra al menos un 10%
+    - genera versiones reducidas en WebP y JPEG de las imágenes de
+      IMAGENES_RESPONSIVAS (si está instalado Pillow), para usarlas en srcset
+
+El resultado queda descrito en Static/dist/manifest.json, que main.py lee al
+arrancar. Sin ese manifiesto la API sirve los archivos originales.
+
+Uso:
+    python construir_estaticos.py
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DIRECTORIO_ORIGEN = "Static"
+DIRECTORIO_DESTINO = os.path.join(DIRECTORIO_ORIGEN, "dist")
+RUTA_MANIFIESTO = os.path.join(DIRECTORIO_DESTINO, "manifest.json")
+
+# Ahorro mínimo para que valga la pena guardar una variante comprimida
+AHORRO_MINIMO = 0.10
+
+# Anchos (px) de las versiones reducidas de cada imagen
+IMAGENES_RESPONSIVAS = {
+    'hospital_futurista.png': (480, 768, 1024),
+}
+CALIDAD_WEBP = 80
+CALIDAD_JPEG = 82
+
+
+def nombre_versionado(nombre: str, contenido: bytes) -> str:
+    """Agrega al nombre los primeros 12 caracteres del SHA-256 del contenido."""
+    base, extension = os.path.splitext(nombre)
+    return f"{base}.{hashlib.sha256(contenido).hexdigest()[:12]}{extension}"
+
+
+def escribir_variantes(nombre: str, contenido: bytes) -> str:
+    """
+    Escribe el archivo versionado y sus variantes comprimidas.
+
+    Args:
+        nombre (str): Nombre lógico del archivo (p. ej. "Fondo.jpg")
+        contenido (bytes): Contenido del archivo
+
+    Returns:
+        str: Nombre del archivo versionado dentro de dist/
+    """
+    versionado = nombre_versionado(nombre, contenido)
+    ruta = os.path.join(DIRECTORIO_DESTINO, versionado)
+    with open(ruta, 'wb') as archivo:
+        archivo.write(contenido)
+
+    comprimidos = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        comprimidos['.br'] = brotli.compress(contenido, quality=11)
+    for sufijo, datos in comprimidos.items():
+        if len(datos) <= len(contenido) * (1 - AHORRO_MINIMO):
+            with open(ruta + sufijo, 'wb') as archivo:
+                archivo.write(datos)
+    return versionado
+
+
+def versiones_reducidas(nombre: str, contenido: bytes, anchos: tuple) -> List[Dict]:
+    """
+    Genera las versiones WebP y JPEG de una imagen para cada ancho.
+
+    Returns:
+        List[Dict]: Ancho, tipo MIME y archivo versionado de cada versión
+    """
+    imagen = Image.open(io.BytesIO(contenido)).convert('RGB')
+    base = os.path.splitext(nombre)[0]
+    versiones = []
+    for ancho in anchos:
+        ancho = min(ancho, imagen.width)
+        reducida = imagen if ancho == imagen.width else imagen.resize(
+            (ancho, round(imagen.height * ancho / imagen.width)), Image.LANCZOS
+        )
+        for formato, tipo, extension, opciones in (
+            ('WEBP', 'image/webp', 'webp', {'quality': CALIDAD_WEBP, 'method': 6}),
+            ('JPEG', 'image/jpeg', 'jpg', {'quality': CALIDAD_JPEG, 'optimize': True, 'progressive': True}),
+        ):
+            salida = io.BytesIO()
+            reducida.save(salida, formato, **opciones)
+            versiones.append({
+                'ancho': ancho,
+                'alto': reducida.height,
+                'tipo': tipo,
+                'archivo': escribir_variantes(f"{base}-{ancho}.{extension}", salida.getvalue())
+            })
+    return versiones
+
+
+def construir(limpiar: bool = False) -> Dict[str, Dict]:
+    """
+    Procesa todos los archivos de DIRECTORIO_ORIGEN y escribe el manifiesto.
+
+    Los archivos versionados de construcciones anteriores se conservan (salvo
+    con `limpiar`), para que una instancia que aún usa el manifiesto previo
+    pueda seguir sirviéndolos.
+
+    Args:
+        limpiar (bool): Borra dist/ antes de construir
+
+    Returns:
+        Dict[str, Dict]: Manifiesto generado
+    """
+    if limpiar and os.path.isdir(DIRECTORIO_DESTINO):
+        shutil.rmtree(DIRECTORIO_DESTINO)
+    os.makedirs(DIRECTORIO_DESTINO, exist_ok=True)
+
+    manifiesto = {}
+    for nombre in sorted(os.listdir(DIRECTORIO_ORIGEN)):
+        ruta = os.path.join(DIRECTORIO_ORIGEN, nombre)
+        if not os.path.isfile(ruta):
+            continue
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        entrada = {'archivo': escribir_variantes(nombre, contenido)}
+        if nombre in IMAGENES_RESPONSIVAS and Image is not None:
+            entrada['versiones'] = versiones_reducidas(nombre, contenido, IMAGENES_RESPONSIVAS[nombre])
+        manifiesto[nombre] = entrada
+
+    temporal = RUTA_MANIFIESTO + '.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(manifiesto, archivo, indent=2, sort_keys=True)
+    os.replace(temporal, RUTA_MANIFIESTO)
+    return manifiesto
+
+
+def tamano(entrada: Dict) -> int:
+    """Tamaño en bytes del archivo versionado de una entrada del manifiesto."""
+    return os.path.getsize(os.path.join(DIRECTORIO_DESTINO, entrada['archivo']))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera los estáticos versionados y precomprimidos")
+    parser.add_argument("--limpiar", action="store_true", help="Borra las construcciones anteriores")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli no está instalado: solo se generan variantes .gz")
+    if Image is None:
+        print("Pillow no está instalado: no se generan versiones reducidas de las imágenes")
+
+    for nombre, entrada in construir(args.limpiar).items():
+        print(f"{nombre} -> {entrada['archivo']} ({tamano(entrada)} bytes)")
+        for version in entrada.get('versiones', []):
+            print(f"    {version['ancho']}px {version['tipo']} -> {version['archivo']} ({tamano(version)} bytes)")
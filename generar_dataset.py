@@ -0,0 +1,116 @@
+"""
+Generador de datasets sintéticos de pacientes con el esquema de Dataset_Pacientes_LOS.csv.
+
+Cada fila sintética toma Genero, Edad, Enfermedad, Servicio y Estancia de una
+fila real elegida al azar, de modo que se conservan las distribuciones
+conjuntas del dataset original (incluidos sus valores irregulares). Las
+fechas de ingreso se reparten en el mismo periodo que el original y el alta
+se calcula como ingreso + Estancia.
+
+Uso:
+    python generar_dataset.py 1000000 Dataset/sintetico_1m.csv --semilla 7
+"""
+
+import argparse
+import os
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Mismo esquema que lee main.py (no se importa main para no cargar el dataset ni la API)
+RUTA_CSV = "Dataset/Dataset_Pacientes_LOS.csv"
+COLUMNAS_CSV = ['id', 'fecha_entrada', 'fecha_alta', 'Genero', 'Edad', 'Enfermedad', 'Servicio', 'Estancia']
+FORMATO_FECHA = '%m/%d/%Y'
+
+# Filas generadas y escritas por cada bloque, para acotar la memoria en datasets grandes
+FILAS_POR_BLOQUE = 500_000
+
+
+def leer_muestra(ruta_csv: str) -> pd.DataFrame:
+    """
+    Lee el dataset real conservando los valores tal como están escritos.
+
+    Args:
+        ruta_csv (str): Ruta del CSV original
+
+    Returns:
+        pd.DataFrame: Filas reales usadas como población de muestreo
+    """
+    return pd.read_csv(ruta_csv, delimiter=";", dtype=str, keep_default_na=False, usecols=COLUMNAS_CSV)
+
+
+def formatear_fechas(fechas: np.ndarray) -> pd.Series:
+    """Escribe fechas datetime64[D] como en el CSV original (7/28/2020); NaT queda vacío."""
+    serie = pd.Series(pd.to_datetime(fechas))
+    texto = (
+        serie.dt.month.astype('Int64').astype(str) + '/'
+        + serie.dt.day.astype('Int64').astype(str).str.zfill(2) + '/'
+        + serie.dt.year.astype('Int64').astype(str)
+    )
+    return texto.where(serie.notna(), '')
+
+
+def generar_bloque(muestra: pd.DataFrame, inicio: int, filas: int, periodo: Tuple, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Genera un bloque de filas sintéticas.
+
+    Args:
+        muestra (pd.DataFrame): Filas reales de las que se copian los atributos
+        inicio (int): Número de la primera fila del bloque (para los ids)
+        filas (int): Cantidad de filas a generar
+        periodo (Tuple): Primer y último día de ingreso como np.datetime64
+        rng (np.random.Generator): Generador aleatorio
+
+    Returns:
+        pd.DataFrame: Bloque con las columnas de COLUMNAS_CSV
+    """
+    elegidas = muestra.iloc[rng.integers(0, len(muestra), filas)].reset_index(drop=True)
+    desde, hasta = periodo
+    dias = int((hasta - desde).astype(int)) + 1
+    # Ingresos ordenados dentro del bloque, como en el archivo original
+    entrada = desde + np.sort(rng.integers(0, dias, filas)).astype('timedelta64[D]')
+    estancia = pd.to_numeric(elegidas['Estancia'], errors='coerce').to_numpy()
+    alta = np.where(np.isnan(estancia), np.datetime64('NaT', 'D'), entrada + np.nan_to_num(estancia).astype('timedelta64[D]'))
+
+    bloque = elegidas.copy()
+    bloque['id'] = [f"s{n}" for n in range(inicio + 1, inicio + filas + 1)]
+    bloque['fecha_entrada'] = formatear_fechas(entrada)
+    bloque['fecha_alta'] = formatear_fechas(alta)
+    return bloque[COLUMNAS_CSV]
+
+
+def generar_dataset(filas: int, destino: str, semilla: int = 0, origen: str = RUTA_CSV) -> None:
+    """
+    Escribe un CSV sintético de `filas` filas con el delimitador ';'.
+
+    Args:
+        filas (int): Cantidad total de filas
+        destino (str): Ruta del CSV a escribir
+        semilla (int): Semilla del generador aleatorio
+        origen (str): CSV real del que se toman las distribuciones
+    """
+    muestra = leer_muestra(origen)
+    entradas = pd.to_datetime(muestra['fecha_entrada'], format=FORMATO_FECHA, errors='coerce').dropna()
+    periodo = (np.datetime64(entradas.min(), 'D'), np.datetime64(entradas.max(), 'D'))
+    rng = np.random.default_rng(semilla)
+
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    with open(destino, 'w', newline='') as archivo:
+        for inicio in range(0, filas, FILAS_POR_BLOQUE):
+            bloque = generar_bloque(muestra, inicio, min(FILAS_POR_BLOQUE, filas - inicio), periodo, rng)
+            bloque.to_csv(archivo, sep=';', index=False, header=inicio == 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un CSV sintético de pacientes hospitalizados")
+    parser.add_argument("filas", type=int, help="Cantidad de filas (por ejemplo 10000 a 10000000)")
+    parser.add_argument("destino", help="Ruta del CSV a generar")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla aleatoria para resultados reproducibles")
+    parser.add_argument("--origen", default=RUTA_CSV, help="CSV real del que se toman las distribuciones")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    generar_dataset(args.filas, args.destino, args.semilla, args.origen)
+    print(f"{args.filas} filas escritas en {args.destino} en {time.perf_counter() - inicio:.1f} s")
@@ -3,74 +3,3917 @@
 # ======================================================
 
 # Bibliotecas estándar
+import bisect
+import copy
+import gzip
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import logging
+import mimetypes
 import os
-from typing import List, Dict, Union
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import date
+from functools import cached_property, lru_cache
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
 
 # Bibliotecas de terceros
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException as StarletteHTTPException
+import numpy as np
 import pandas as pd
-import nltk
-from nltk.corpus import wordnet
-from nltk.tokenize import RegexpTokenizer
 import unidecode
 
-# Configuración de NLTK
-nltk.data.path.append('C:\\Users\\latat\\AppData\\Local\\Programs\\Python\\Python312\\Lib\\site-packages\\nltk')
-nltk_path = os.path.join(os.getenv("APPDATA"), "nltk_data")
-nltk.data.path.append(nltk_path)
+# Dependencia opcional: sin brotli la página se comprime solo con gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-# Descarga de recursos necesarios para NLP
-nltk.download('punkt')  # Tokenizador de texto
-nltk.download('wordnet')  # Base de datos léxica para sinónimos
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Inicio de la medición del tiempo de arranque (sin contar las importaciones)
+_inicio_arranque = time.perf_counter()
+
+# Presupuesto de arranque: tiempo máximo esperado hasta poder atender /pacientes
+PRESUPUESTO_ARRANQUE_MS = float(os.getenv("PRESUPUESTO_ARRANQUE_MS", "250"))
+
+# Configuración de NLTK: los recursos se leen solo de rutas locales, nunca se
+# descargan al arrancar. Para instalarlos: python -m nltk.downloader -d <ruta> wordnet
+# MODO_NLP='perezoso' (por defecto) los carga en el primer uso; 'inmediato' al arrancar.
+MODO_NLP = os.getenv("MODO_NLP", "perezoso")
+NLTK_RUTAS = [ruta for ruta in os.getenv("NLTK_DATA", "").split(os.pathsep) if ruta]
+NLTK_RUTAS.append('C:\\Users\\latat\\AppData\\Local\\Programs\\Python\\Python312\\Lib\\site-packages\\nltk')
+if os.getenv("APPDATA"):
+    NLTK_RUTAS.append(os.path.join(os.getenv("APPDATA"), "nltk_data"))
+
+# ======================================================
+# MÉTRICAS Y PERFILADO
+# ======================================================
+
+# Límites (le) de los histogramas expuestos en /metrics
+LIMITES_LATENCIA_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LIMITES_TAMANO_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LIMITES_CARGA_S = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# PERFILADOR=1 arranca el perfilador de muestreo; también se activa en caliente desde /metrics/perfilador
+PERFILADOR_ACTIVO = os.getenv("PERFILADOR", "0") == "1"
+INTERVALO_PERFILADOR_S = float(os.getenv("INTERVALO_PERFILADOR_S", "0.005"))
+# Token que exige POST /metrics/perfilador en la cabecera X-Token-Admin; sin él, el control en caliente queda deshabilitado
+TOKEN_ADMIN_PERFILADOR = os.getenv("TOKEN_ADMIN_PERFILADOR", "")
+
+# Filas escaneadas y devueltas por la petición en curso
+_costo_peticion: ContextVar[Optional[List[int]]] = ContextVar('costo_peticion', default=None)
+
+
+class Histograma:
+    """Histograma acumulativo con límites fijos, en el formato de Prometheus."""
+
+    __slots__ = ('limites', 'conteos', 'suma', 'total')
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.conteos[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def exponer(self, nombre: str, etiquetas: str) -> List[str]:
+        """Líneas _bucket/_sum/_count; `etiquetas` ya viene formateado (p. ej. 'ruta="/x",')."""
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.limites + ('+Inf',), self.conteos):
+            acumulado += conteo
+            lineas.append(f'{nombre}_bucket{{{etiquetas}le="{limite}"}} {acumulado}')
+        etiquetas = etiquetas.rstrip(',')
+        lineas.append(f'{nombre}_sum{{{etiquetas}}} {self.suma}')
+        lineas.append(f'{nombre}_count{{{etiquetas}}} {self.total}')
+        return lineas
+
+
+def etiqueta(valor: str) -> str:
+    """Escapa un valor de etiqueta para el formato de texto de Prometheus."""
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RegistroMetricas:
+    """
+    Métricas de la API en memoria: latencia, tamaño de respuesta y costo por ruta,
+    y duración de las cargas del dataset.
+
+    Las rutas se agrupan por su plantilla (/pacientes/{id}) para que la cantidad
+    de series no crezca con los valores consultados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rutas = {}
+        self.cargas = {}
+
+    def observar_peticion(
+        self, metodo: str, ruta: str, codigo: int, segundos: float, tamano: int, escaneadas: int, devueltas: int
+    ) -> None:
+        with self._lock:
+            metricas = self.rutas.get((metodo, ruta))
+            if metricas is None:
+                metricas = self.rutas[(metodo, ruta)] = {
+                    'latencia': Histograma(LIMITES_LATENCIA_S),
+                    'tamano': Histograma(LIMITES_TAMANO_BYTES),
+                    'codigos': Counter(),
+                    'escaneadas': 0,
+                    'devueltas': 0
+                }
+            metricas['latencia'].observar(segundos)
+            metricas['tamano'].observar(tamano)
+            metricas['codigos'][codigo] += 1
+            metricas['escaneadas'] += escaneadas
+            metricas['devueltas'] += devueltas
+
+    def observar_carga(self, tipo: str, segundos: float) -> None:
+        with self._lock:
+            self.cargas.setdefault(tipo, Histograma(LIMITES_CARGA_S)).observar(segundos)
+
+    def exponer(self) -> str:
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lineas = [
+            '# HELP pacientes_http_duracion_segundos Latencia de las peticiones por ruta',
+            '# TYPE pacientes_http_duracion_segundos histogram',
+        ]
+        with self._lock:
+            rutas = sorted(self.rutas.items())
+            for (metodo, ruta), metricas in rutas:
+                lineas += metricas['latencia'].exponer(
+                    'pacientes_http_duracion_segundos', f'metodo="{metodo}",ruta="{etiqueta(ruta)}",'
+                )
+            lineas += [
+                '# HELP pacientes_http_respuesta_bytes Tamaño del cuerpo de las respuestas por ruta',
+                '# TYPE pacientes_http_respuesta_bytes histogram',
+            ]
+            for (metodo, ruta), metricas in rutas:
+                lineas += metricas['tamano'].exponer(
+                    'pacientes_http_respuesta_bytes', f'metodo="{metodo}",ruta="{etiqueta(ruta)}",'
+                )
+            lineas += ['# HELP pacientes_http_peticiones_total Peticiones por ruta y código de estado',
+                       '# TYPE pacientes_http_peticiones_total counter']
+            for (metodo, ruta), metricas in rutas:
+                for codigo, total in sorted(metricas['codigos'].items()):
+                    lineas.append(f'pacientes_http_peticiones_total{{metodo="{metodo}",ruta="{etiqueta(ruta)}",codigo="{codigo}"}} {total}')
+            for nombre, ayuda in (('escaneadas', 'Filas examinadas para responder'), ('devueltas', 'Filas entregadas en las respuestas')):
+                lineas += [f'# HELP pacientes_filas_{nombre}_total {ayuda}', f'# TYPE pacientes_filas_{nombre}_total counter']
+                for (metodo, ruta), metricas in rutas:
+                    lineas.append(f'pacientes_filas_{nombre}_total{{metodo="{metodo}",ruta="{etiqueta(ruta)}"}} {metricas[nombre]}')
+            lineas += ['# HELP pacientes_carga_duracion_segundos Duración de las cargas y recargas del dataset',
+                       '# TYPE pacientes_carga_duracion_segundos histogram']
+            for tipo, histograma in sorted(self.cargas.items()):
+                lineas += histograma.exponer('pacientes_carga_duracion_segundos', f'tipo="{tipo}",')
+        return '\n'.join(lineas) + '\n'
+
+
+METRICAS = RegistroMetricas()
+
+
+def contar_filas(escaneadas: int = 0, devueltas: int = 0) -> None:
+    """
+    Suma filas escaneadas y devueltas al costo de la petición en curso.
+
+    Fuera de una petición (scripts, vigilante) no hace nada.
+    """
+    costo = _costo_peticion.get()
+    if costo is not None:
+        costo[0] += escaneadas
+        costo[1] += devueltas
+
+
+class PerfiladorMuestreo:
+    """
+    Perfilador de muestreo: cada `intervalo` segundos toma la pila de todos los
+    hilos y cuenta las pilas repetidas (formato "folded" de los flame graphs).
+
+    Solo lee sys._current_frames() desde su propio hilo, así que no instrumenta
+    el código medido; apagado no tiene costo. Las pilas acumuladas se leen y
+    se modifican bajo `_lock`, porque /metrics/perfilador las recorre desde
+    otro hilo mientras el muestreo sigue agregando.
+    """
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.muestras = 0
+        self._lock = threading.Lock()
+        self._detener = None
+        self._hilo = None
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self) -> None:
+        if self.activo:
+            return
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, args=(self._detener,), name="perfilador", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        if self.activo:
+            self._detener.set()
+            self._hilo.join()
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self.pilas = Counter()
+            self.muestras = 0
+
+    def _muestrear(self, detener: threading.Event) -> None:
+        propio = threading.get_ident()
+        while not detener.wait(self.intervalo):
+            muestra = []
+            for hilo, marco in sys._current_frames().items():
+                if hilo == propio:
+                    continue
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{marco.f_lineno}")
+                    marco = marco.f_back
+                muestra.append(';'.join(reversed(pila)))
+            with self._lock:
+                self.pilas.update(muestra)
+                self.muestras += 1
+
+    def exponer(self, maximo: int) -> str:
+        """Devuelve las `maximo` pilas más frecuentes, una por línea, seguidas de su cantidad de muestras."""
+        with self._lock:
+            frecuentes = self.pilas.most_common(maximo)
+        return ''.join(f"{pila} {cantidad}\n" for pila, cantidad in frecuentes)
+
+
+perfilador = PerfiladorMuestreo(INTERVALO_PERFILADOR_S)
+
+# ======================================================
+# ALMACÉN COLUMNAR DE PACIENTES
+# ======================================================
+
+# Columnas del CSV utilizadas por la API
+COLUMNAS_CSV = ['id', 'fecha_entrada', 'fecha_alta', 'Genero', 'Edad', 'Enfermedad', 'Servicio', 'Estancia']
+
+# Columnas codificadas por diccionario dentro del almacén
+COLUMNAS_CATEGORICAS = ['genero', 'edad_texto', 'enfermedad', 'servicio']
+
+# Las fechas del dataset vienen como mes/día/año (p. ej. "1/02/2010")
+FORMATO_FECHA = '%m/%d/%Y'
+
+
+def normalizar(texto: str) -> str:
+    """Pasa el texto a minúsculas y sin tildes para comparaciones de búsqueda."""
+    return unidecode.unidecode(texto).lower()
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre los valores distintos de una columna.
+
+    Cada trigrama apunta al conjunto de códigos de categoría que lo contienen.
+    Una búsqueda por subcadena intersecta las listas de sus trigramas y solo
+    verifica los candidatos resultantes.
+    """
+
+    def __init__(self, valores: List[str]):
+        self.valores = valores
+        self.listas: Dict[str, set] = {}
+        for codigo, valor in enumerate(valores):
+            for trigrama in trigramas(valor):
+                self.listas.setdefault(trigrama, set()).add(codigo)
+
+    def buscar(self, texto: str) -> List[int]:
+        """
+        Devuelve los códigos cuyo valor normalizado contiene `texto`.
+
+        Args:
+            texto (str): Subcadena ya normalizada
+
+        Returns:
+            List[int]: Códigos de categoría coincidentes, en orden
+        """
+        claves = trigramas(texto)
+        if not claves:
+            # Consultas de menos de tres caracteres: se revisan los valores distintos
+            candidatos = range(len(self.valores))
+        else:
+            # Se intersecta empezando por la lista más corta
+            listas = sorted((self.listas.get(t, set()) for t in claves), key=len)
+            candidatos = set.intersection(*listas)
+        return sorted(c for c in candidatos if texto in self.valores[c])
+
+
+def trigramas(texto: str) -> set:
+    """Devuelve el conjunto de trigramas de un texto."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def distancia_edicion(a: str, b: str, maximo: Optional[int] = None) -> int:
+    """
+    Distancia de Levenshtein: inserciones, borrados y sustituciones de un carácter.
+
+    Usa la formulación bit-paralela de Myers: cada columna de la matriz de
+    programación dinámica se guarda como diferencias de ±1 en los bits de un
+    entero, así que cada carácter de `a` cuesta unas pocas operaciones en vez
+    de un recorrido de `b`. Con `maximo`, devuelve maximo + 1 en cuanto se sabe
+    que la distancia lo supera.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if maximo is not None and len(a) - len(b) > maximo:
+        return maximo + 1
+    if not b:
+        return len(a)
+    # Máscara de posiciones de cada carácter de b
+    posiciones: Dict[str, int] = {}
+    for i, caracter in enumerate(b):
+        posiciones[caracter] = posiciones.get(caracter, 0) | (1 << i)
+    mascara = (1 << len(b)) - 1
+    ultimo = 1 << (len(b) - 1)
+    positivos, negativos, distancia = mascara, 0, len(b)
+    for j, caracter in enumerate(a):
+        iguales = posiciones.get(caracter, 0)
+        xv = iguales | negativos
+        xh = ((((iguales & positivos) + positivos) & mascara) ^ positivos) | iguales
+        suben = (negativos | ~(xh | positivos)) & mascara
+        bajan = positivos & xh
+        if suben & ultimo:
+            distancia += 1
+        elif bajan & ultimo:
+            distancia -= 1
+        # Cada carácter restante puede bajar la distancia a lo sumo en uno
+        if maximo is not None and distancia - (len(a) - j - 1) > maximo:
+            return maximo + 1
+        suben = ((suben << 1) | 1) & mascara
+        bajan = (bajan << 1) & mascara
+        positivos = (bajan | ~(xv | suben)) & mascara
+        negativos = suben & xv
+    return distancia
+
+
+class IndiceBK:
+    """
+    Árbol BK sobre un vocabulario de textos normalizados.
+
+    Cada palabra cuelga de su padre según la distancia de edición entre ambas.
+    Por la desigualdad triangular, si la consulta está a distancia d de un nodo,
+    las palabras a lo sumo a k ediciones de ella solo pueden estar en los hijos
+    a distancia entre d - k y d + k; el resto de las ramas no se visita.
+    """
+
+    def __init__(self, palabras: List[str]):
+        self.raiz: Optional[Tuple[str, Dict]] = None
+        for palabra in palabras:
+            self.agregar(palabra)
+
+    def agregar(self, palabra: str) -> None:
+        """Inserta una palabra (las repetidas se ignoran)."""
+        if self.raiz is None:
+            self.raiz = (palabra, {})
+            return
+        nodo = self.raiz
+        while True:
+            distancia = distancia_edicion(palabra, nodo[0])
+            if distancia == 0:
+                return
+            hijo = nodo[1].get(distancia)
+            if hijo is None:
+                nodo[1][distancia] = (palabra, {})
+                return
+            nodo = hijo
+
+    def buscar(self, texto: str, max_ediciones: int) -> List[Tuple[int, str]]:
+        """
+        Devuelve las palabras a lo sumo a `max_ediciones` ediciones de `texto`.
+
+        Args:
+            texto (str): Consulta ya normalizada
+            max_ediciones (int): Distancia máxima admitida
+
+        Returns:
+            List[Tuple[int, str]]: Distancia y palabra, de la más cercana a la más lejana
+        """
+        resultados = []
+        pendientes = [self.raiz] if self.raiz is not None else []
+        while pendientes:
+            palabra, hijos = pendientes.pop()
+            # Basta la distancia exacta hasta el hijo más lejano + k: por encima
+            # de eso ningún hijo cae en el rango ni la palabra es resultado
+            distancia = distancia_edicion(texto, palabra, max(hijos, default=0) + max_ediciones)
+            if distancia <= max_ediciones:
+                resultados.append((distancia, palabra))
+            pendientes.extend(
+                hijo for d, hijo in hijos.items() if distancia - max_ediciones <= d <= distancia + max_ediciones
+            )
+        return sorted(resultados)
+
+
+class ColumnaCategorica:
+    """
+    Columna de texto codificada por diccionario.
+
+    Cada fila guarda solo un código entero que apunta a la lista de valores
+    distintos; el código -1 representa un valor vacío. Los filtros de texto se
+    evalúan una sola vez por valor distinto y luego se proyectan sobre las filas.
+
+    Las columnas indexadas guardan además un índice de trigramas sobre los
+    valores normalizados y las filas de cada código agrupadas (orden + límites),
+    de modo que una búsqueda solo toca las filas que devuelve.
+    """
+
+    def __init__(
+        self,
+        codigos: np.ndarray,
+        categorias: List[str],
+        indexar: bool = False,
+        orden_filas: Optional[np.ndarray] = None,
+        limites: Optional[np.ndarray] = None
+    ):
+        self.codigos = codigos
+        self.categorias = categorias
+        self.normalizadas = [normalizar(c) for c in categorias]
+        self.indice_trigramas = IndiceTrigramas(self.normalizadas) if indexar else None
+        self.orden_filas = orden_filas
+        self.limites = limites
+        if indexar and orden_filas is None:
+            # Filas agrupadas por código; el grupo del código c está en
+            # orden_filas[limites[c + 1]:limites[c + 2]] (la posición 0 es el vacío)
+            self.orden_filas = np.argsort(codigos, kind='stable')
+            conteos = np.bincount(codigos + 1, minlength=len(categorias) + 1)
+            self.limites = np.concatenate(([0], np.cumsum(conteos)))
+
+    @classmethod
+    def desde_serie(cls, serie: pd.Series, indexar: bool = False) -> 'ColumnaCategorica':
+        categorica = pd.Categorical(serie)
+        return cls(
+            categorica.codes.astype(np.int32),
+            [str(c) for c in categorica.categories],
+            indexar=indexar
+        )
+
+    def extender(self, serie: pd.Series) -> 'ColumnaCategorica':
+        """
+        Devuelve una nueva columna con los valores de `serie` agregados al final.
+
+        Los valores nuevos se agregan al final del diccionario, así que los
+        códigos existentes no cambian. En columnas indexadas los grupos de filas
+        se combinan en O(n) sin volver a ordenar las filas anteriores.
+
+        Args:
+            serie (pd.Series): Valores de las filas nuevas
+
+        Returns:
+            ColumnaCategorica: Columna con las filas anteriores y las nuevas
+        """
+        categorias = list(self.categorias)
+        posicion = {c: i for i, c in enumerate(categorias)}
+        nuevas = pd.Categorical(serie)
+        traduccion = []
+        for categoria in (str(c) for c in nuevas.categories):
+            if categoria not in posicion:
+                posicion[categoria] = len(categorias)
+                categorias.append(categoria)
+            traduccion.append(posicion[categoria])
+        # El código -1 (vacío) se traduce a sí mismo mediante la última posición
+        codigos_nuevos = np.array(traduccion + [-1], dtype=np.int32)[nuevas.codes]
+        codigos = np.concatenate([self.codigos, codigos_nuevos])
+        if self.orden_filas is None:
+            return ColumnaCategorica(codigos, categorias)
+
+        # Grupos por código (posición 0 = vacío): primero las filas anteriores,
+        # luego las nuevas, conservando el orden ascendente dentro de cada grupo
+        anteriores = len(self.codigos)
+        conteo_anterior = np.zeros(len(categorias) + 1, dtype=np.int64)
+        conteo_anterior[:len(self.limites) - 1] = np.diff(self.limites)
+        conteo_nuevo = np.bincount(codigos_nuevos + 1, minlength=len(categorias) + 1)
+        limites = np.concatenate(([0], np.cumsum(conteo_anterior + conteo_nuevo)))
+
+        orden_filas = np.empty(len(codigos), dtype=np.int64)
+        grupo_anterior = np.repeat(np.arange(len(self.limites) - 1), np.diff(self.limites))
+        orden_filas[np.arange(anteriores) - self.limites[grupo_anterior] + limites[grupo_anterior]] = self.orden_filas
+
+        orden_nuevo = np.argsort(codigos_nuevos, kind='stable')
+        grupo_nuevo = codigos_nuevos[orden_nuevo] + 1
+        inicio_nuevo = np.concatenate(([0], np.cumsum(conteo_nuevo)))
+        destino = limites[grupo_nuevo] + conteo_anterior[grupo_nuevo] + np.arange(len(orden_nuevo)) - inicio_nuevo[grupo_nuevo]
+        orden_filas[destino] = orden_nuevo + anteriores
+
+        return ColumnaCategorica(codigos, categorias, indexar=True, orden_filas=orden_filas, limites=limites)
+
+    def grupos(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Agrupa los valores que coinciden al normalizarlos ("Pediatría" y "Pediatria").
+
+        Returns:
+            Tuple[List[str], np.ndarray]: Clave normalizada de cada grupo (incluye
+            '' para el vacío) y el grupo de cada código; la última posición
+            atiende el código -1, así que `grupo_de_codigo[codigos]` es válido
+        """
+        claves = list(dict.fromkeys(self.normalizadas + ['']))
+        posicion = {v: i for i, v in enumerate(claves)}
+        grupo_de_codigo = np.array([posicion[v] for v in self.normalizadas] + [posicion['']], dtype=np.int64)
+        return claves, grupo_de_codigo
+
+    def etiquetas_grupos(self) -> List[str]:
+        """Primer valor original de cada grupo de grupos(); el vacío queda como ''."""
+        claves, grupo_de_codigo = self.grupos()
+        etiquetas = [''] * len(claves)
+        for codigo in range(len(self.categorias) - 1, -1, -1):
+            etiquetas[grupo_de_codigo[codigo]] = self.categorias[codigo]
+        return etiquetas
+
+    def valor(self, fila: int) -> str:
+        codigo = self.codigos[fila]
+        return self.categorias[codigo] if codigo >= 0 else ''
+
+    def buscar(self, texto: str) -> List[int]:
+        """Devuelve los códigos cuyo valor contiene `texto` (sin tildes ni mayúsculas)."""
+        texto = normalizar(texto)
+        if self.indice_trigramas is not None:
+            return self.indice_trigramas.buscar(texto)
+        return [i for i, valor in enumerate(self.normalizadas) if texto in valor]
+
+    @cached_property
+    def codigos_por_clave(self) -> Dict[str, List[int]]:
+        """Códigos de cada valor normalizado ("Pediatría" y "Pediatria" comparten clave)."""
+        codigos = {}
+        for codigo, clave in enumerate(self.normalizadas):
+            codigos.setdefault(clave, []).append(codigo)
+        return codigos
+
+    @cached_property
+    def indice_bk(self) -> IndiceBK:
+        """Árbol BK sobre los valores normalizados distintos, construido en el primer uso."""
+        return IndiceBK([clave for clave in self.codigos_por_clave if clave])
+
+    def buscar_aproximado(self, texto: str, max_ediciones: int) -> List[Tuple[str, int, List[int]]]:
+        """
+        Devuelve los valores que contienen `texto` (distancia 0) o que están a
+        lo sumo a `max_ediciones` ediciones de él.
+
+        Args:
+            texto (str): Texto buscado, con o sin tildes y mayúsculas
+            max_ediciones (int): Distancia de edición máxima
+
+        Returns:
+            List[Tuple[str, int, List[int]]]: Clave normalizada, distancia y
+            códigos de cada valor, del más cercano al más lejano
+        """
+        texto = texto.strip()
+        distancias = {self.normalizadas[c]: 0 for c in self.buscar(texto)}
+        for distancia, clave in self.indice_bk.buscar(normalizar(texto), max_ediciones):
+            distancias.setdefault(clave, distancia)
+        ordenadas = sorted(distancias.items(), key=lambda par: (par[1], par[0]))
+        return [(clave, distancia, self.codigos_por_clave[clave]) for clave, distancia in ordenadas]
+
+    def mascara(self, codigos: List[int]) -> np.ndarray:
+        """
+        Genera la máscara booleana de las filas cuyo código está en `codigos`.
+
+        Args:
+            codigos (List[int]): Códigos de categoría aceptados
+
+        Returns:
+            np.ndarray: Máscara booleana con una posición por fila
+        """
+        # La última posición de la tabla atiende el código -1 (vacío)
+        tabla = np.zeros(len(self.categorias) + 1, dtype=bool)
+        tabla[list(codigos)] = True
+        return tabla[self.codigos]
+
+    def contar(self, codigos: List[int]) -> int:
+        """Cantidad de filas cuyo código está en `codigos` (O(códigos) si la columna está indexada)."""
+        if self.limites is None:
+            return int(self.mascara(codigos).sum())
+        return int(sum(self.limites[c + 2] - self.limites[c + 1] for c in codigos))
+
+    def filas(self, codigos: List[int]) -> np.ndarray:
+        """
+        Devuelve, en orden ascendente, las filas cuyo código está en `codigos`.
+
+        Args:
+            codigos (List[int]): Códigos de categoría aceptados
+
+        Returns:
+            np.ndarray: Índices de fila
+        """
+        if self.orden_filas is None:
+            return np.flatnonzero(self.mascara(codigos))
+        grupos = [self.orden_filas[self.limites[c + 1]:self.limites[c + 2]] for c in codigos]
+        if not grupos:
+            return np.empty(0, dtype=np.int64)
+        if len(grupos) == 1:
+            return grupos[0]
+        return np.sort(np.concatenate(grupos))
+
+
+def calcular_fin_estancia(fecha_entrada: np.ndarray, fecha_alta: np.ndarray, estancia: np.ndarray) -> np.ndarray:
+    """Fin de cada estancia según PacientesStore.fin_estancia, para filas sueltas o para todas."""
+    alta_valida = ~np.isnat(fecha_alta) & (fecha_alta >= fecha_entrada)
+    estancia_valida = ~np.isnan(estancia) & (estancia >= 0)
+    dias = np.where(estancia_valida, estancia, 0).astype('timedelta64[D]')
+    calculada = np.where(estancia_valida, fecha_entrada + dias, np.datetime64('NaT', 'D'))
+    return np.where(alta_valida, fecha_alta, calculada)
+
+
+class PacientesStore:
+    """
+    Almacén columnar en memoria con los pacientes hospitalizados.
+
+    Edad y Estancia se guardan como arreglos numéricos, las fechas como
+    datetime64[D] y Genero/Enfermedad/Servicio codificados por diccionario.
+    Los diccionarios de respuesta solo se construyen para las filas devueltas.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        fecha_entrada: np.ndarray,
+        fecha_alta: np.ndarray,
+        genero: ColumnaCategorica,
+        edad: np.ndarray,
+        edad_texto: ColumnaCategorica,
+        enfermedad: ColumnaCategorica,
+        servicio: ColumnaCategorica,
+        estancia: np.ndarray,
+        cubo_estancias: Optional['CuboEstancias'] = None,
+        indice_id: Optional['IndiceIds'] = None,
+        sketches_estancia: Optional['SketchesEstancia'] = None
+    ):
+        self.ids = ids
+        self.fecha_entrada = fecha_entrada
+        self.fecha_alta = fecha_alta
+        self.genero = genero
+        self.edad = edad
+        self.edad_texto = edad_texto
+        self.enfermedad = enfermedad
+        self.servicio = servicio
+        self.estancia = estancia
+        # Índice hash id -> fila; los ids repetidos se guardan aparte
+        self.indice_id = indice_id or IndiceIds.construir(ids)
+        # Generación del dataset a la que pertenece este almacén y huella del
+        # tramo del CSV que contiene (ver huella_csv)
+        self.generacion = 0
+        self.huella: Optional[Dict] = None
+        # Agregados de estancia precalculados para las estadísticas
+        self.cubo_estancias = cubo_estancias or CuboEstancias.desde_store(self)
+        # Sketches de cuantiles de la estancia por enfermedad y servicio
+        self.sketches_estancia = sketches_estancia or SketchesEstancia.desde_store(self)
+        # Última entrada del diario de escrituras aplicada a este almacén
+        self.seq_diario = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def registro(self, fila: int) -> Dict:
+        """Construye el diccionario de respuesta para una fila."""
+        return {
+            'id': str(self.ids[fila]),
+            'fecha_entrada': formatear_fecha(self.fecha_entrada[fila]),
+            'fecha_alta': formatear_fecha(self.fecha_alta[fila]),
+            'Genero': self.genero.valor(fila),
+            'Edad (años)': self.edad_texto.valor(fila),
+            'Enfermedad': self.enfermedad.valor(fila),
+            'Servicio': self.servicio.valor(fila),
+            'Estancia (días)': formatear_numero(self.estancia[fila])
+        }
+
+    def registros(self, filas: np.ndarray) -> List[Dict]:
+        """Construye los diccionarios de respuesta solo para las filas indicadas."""
+        return [self.registro(int(fila)) for fila in filas]
+
+    @cached_property
+    def fin_estancia(self) -> np.ndarray:
+        """
+        Fecha en que termina cada estancia (NaT = paciente aún hospitalizado).
+
+        Se usa fecha_alta cuando es coherente (no anterior al ingreso); si no,
+        fecha_entrada + Estancia. Sin alta ni estancia la estancia sigue abierta.
+        """
+        return calcular_fin_estancia(self.fecha_entrada, self.fecha_alta, self.estancia)
+
+    @cached_property
+    def censo(self) -> 'CensoCamas':
+        """Ocupación diaria de camas, calculada en el primer uso."""
+        return CensoCamas(self)
+
+    @cached_property
+    def indice_estancia(self) -> 'IndiceOrdenado':
+        """Índice ordenado de Estancia para consultas por rango, construido en el primer uso."""
+        return IndiceOrdenado(self.estancia)
+
+    @cached_property
+    def indice_edad(self) -> 'IndiceOrdenado':
+        """Índice ordenado de Edad (en años) para consultas por rango, construido en el primer uso."""
+        return IndiceOrdenado(self.edad)
+
+    @cached_property
+    def dias_entrada(self) -> np.ndarray:
+        """fecha_entrada como días desde 1970 en float (NaN = sin fecha), para filtrar por rango."""
+        dias = self.fecha_entrada.astype(np.int64).astype(np.float64)
+        return np.where(np.isnat(self.fecha_entrada), np.nan, dias)
+
+    @cached_property
+    def indice_fecha_entrada(self) -> 'IndiceOrdenado':
+        """Índice ordenado de fecha_entrada, construido en el primer uso."""
+        return IndiceOrdenado(self.dias_entrada)
+
+    @cached_property
+    def distribuciones_estancia(self) -> 'DistribucionesEstancia':
+        """Distribuciones empíricas de Estancia, calculadas en el primer uso."""
+        return DistribucionesEstancia(self)
+
+    @cached_property
+    def entidades_chat(self) -> 'ExtractorEntidades':
+        """Vocabulario de enfermedades y servicios para el chat, calculado en el primer uso."""
+        return ExtractorEntidades(self)
+
+    def extender(self, df: pd.DataFrame) -> 'PacientesStore':
+        """
+        Devuelve un nuevo almacén con las filas de `df` agregadas al final.
+
+        El almacén actual no se modifica, así que las peticiones en curso lo
+        siguen usando. Los índices y el cubo se actualizan de forma incremental.
+
+        Args:
+            df (pd.DataFrame): Filas nuevas con las columnas de COLUMNAS_CSV
+
+        Returns:
+            PacientesStore: Almacén con las filas anteriores y las nuevas
+        """
+        anteriores = len(self)
+        edad_texto = self.edad_texto.extender(df['Edad'])
+        ids = np.concatenate([self.ids, convertir_ids(df['id'])])
+        edad_nueva = tabla_edades(edad_texto.categorias)[edad_texto.codigos[anteriores:]]
+
+        # Con lotes grandes es más barato reconstruir el cubo y los sketches que actualizarlos fila a fila
+        incremental = len(df) <= max(anteriores // 10, 1000)
+        cubo = self.cubo_estancias.copia() if incremental else None
+        sketches = self.sketches_estancia.copia() if incremental else None
+        store = PacientesStore(
+            ids=ids,
+            fecha_entrada=np.concatenate([self.fecha_entrada, convertir_fechas(df['fecha_entrada'])]),
+            fecha_alta=np.concatenate([self.fecha_alta, convertir_fechas(df['fecha_alta'])]),
+            genero=self.genero.extender(df['Genero']),
+            edad=np.concatenate([self.edad, edad_nueva]),
+            edad_texto=edad_texto,
+            enfermedad=self.enfermedad.extender(df['Enfermedad']),
+            servicio=self.servicio.extender(df['Servicio']),
+            estancia=np.concatenate([self.estancia, convertir_numeros(df['Estancia'])]),
+            cubo_estancias=cubo,
+            indice_id=self.indice_id.extender(ids),
+            sketches_estancia=sketches
+        )
+        if incremental:
+            self._heredar_derivados(store, np.arange(anteriores, len(store)))
+            for fila in range(anteriores, len(store)):
+                cubo.agregar(
+                    store.enfermedad.valor(fila),
+                    store.servicio.valor(fila),
+                    store.genero.valor(fila),
+                    store.edad[fila],
+                    store.estancia[fila]
+                )
+                sketches.agregar(store.enfermedad.valor(fila), store.servicio.valor(fila), store.estancia[fila])
+        store.seq_diario = self.seq_diario
+        return store
+
+    def con_altas(self, filas: np.ndarray, fechas_alta: np.ndarray, estancias: np.ndarray) -> 'PacientesStore':
+        """
+        Devuelve un nuevo almacén con el alta registrada en las filas indicadas.
+
+        Solo se copian fecha_alta, Estancia, el cubo y los sketches; el resto de las columnas
+        e índices se comparte con este almacén, que no se modifica.
+
+        Args:
+            filas (np.ndarray): Filas a actualizar (sin repetir)
+            fechas_alta (np.ndarray): Nueva fecha_alta de cada fila (datetime64[D])
+            estancias (np.ndarray): Nueva Estancia de cada fila
+
+        Returns:
+            PacientesStore: Almacén con las altas aplicadas
+        """
+        fecha_alta = self.fecha_alta.copy()
+        fecha_alta[filas] = fechas_alta
+        estancia = self.estancia.copy()
+        estancia[filas] = estancias
+        cubo = self.cubo_estancias.copia()
+        sketches = self.sketches_estancia.copia()
+        for fila, nueva in zip(filas, estancias):
+            datos = (self.enfermedad.valor(fila), self.servicio.valor(fila), self.genero.valor(fila), self.edad[fila])
+            cubo.agregar(*datos, self.estancia[fila], signo=-1)
+            cubo.agregar(*datos, nueva)
+            sketches.agregar(datos[0], datos[1], self.estancia[fila], signo=-1)
+            sketches.agregar(datos[0], datos[1], nueva)
+        store = PacientesStore(
+            ids=self.ids,
+            fecha_entrada=self.fecha_entrada,
+            fecha_alta=fecha_alta,
+            genero=self.genero,
+            edad=self.edad,
+            edad_texto=self.edad_texto,
+            enfermedad=self.enfermedad,
+            servicio=self.servicio,
+            estancia=estancia,
+            cubo_estancias=cubo,
+            indice_id=self.indice_id,
+            sketches_estancia=sketches
+        )
+        if len(filas) <= max(len(self) // 10, 1000):
+            self._heredar_derivados(store, filas)
+        store.seq_diario = self.seq_diario
+        return store
+
+    def _heredar_derivados(self, store: 'PacientesStore', filas: np.ndarray) -> None:
+        """
+        Pasa a `store` los índices y agregados perezosos ya calculados en este almacén.
+
+        `store` difiere de este solo en `filas`: altas registradas (filas
+        existentes, mismas fechas de entrada y edades) o filas agregadas al
+        final. Lo que no depende de ellas se comparte y lo demás se actualiza
+        solo en esas filas, así la primera consulta después de una escritura no
+        reconstruye nada desde cero. Lo que aquí todavía no se calculó se sigue
+        construyendo en el primer uso.
+
+        Args:
+            store (PacientesStore): Almacén nuevo derivado de este
+            filas (np.ndarray): Filas cambiadas o agregadas, sin repetir
+        """
+        calculados = self.__dict__
+        heredados = store.__dict__
+        nuevas = len(store) > len(self)
+        mismas_categorias = (
+            len(store.enfermedad.categorias) == len(self.enfermedad.categorias)
+            and len(store.servicio.categorias) == len(self.servicio.categorias)
+        )
+
+        # Edad y fecha de entrada no cambian con un alta
+        for nombre, valores in (('indice_edad', 'edad'), ('indice_fecha_entrada', 'dias_entrada')):
+            if nombre in calculados:
+                if nuevas:
+                    heredados[nombre] = calculados[nombre].con_cambios(getattr(store, valores), filas)
+                else:
+                    heredados[nombre] = calculados[nombre]
+        if 'dias_entrada' in calculados and not nuevas:
+            heredados['dias_entrada'] = self.dias_entrada
+        if 'indice_estancia' in calculados:
+            heredados['indice_estancia'] = self.indice_estancia.con_cambios(
+                store.estancia, filas, None if nuevas else self.estancia[filas]
+            )
+        if 'entidades_chat' in calculados and mismas_categorias:
+            heredados['entidades_chat'] = self.entidades_chat
+
+        if 'fin_estancia' in calculados:
+            fin = np.empty(len(store), dtype=self.fin_estancia.dtype)
+            fin[:len(self)] = self.fin_estancia
+            fin[filas] = calcular_fin_estancia(store.fecha_entrada[filas], store.fecha_alta[filas], store.estancia[filas])
+            heredados['fin_estancia'] = fin
+
+        if 'distribuciones_estancia' in calculados and mismas_categorias:
+            heredados['distribuciones_estancia'] = self.distribuciones_estancia.con_cambios(
+                store.enfermedad.codigos[filas], store.servicio.codigos[filas],
+                None if nuevas else self.estancia[filas], store.estancia[filas]
+            )
+
+        if 'censo' in calculados and mismas_categorias and self.censo.descartadas < len(self):
+            censo = self.censo
+            entradas = store.fecha_entrada[filas]
+            validas = ~np.isnat(entradas)
+            entradas = entradas[validas]
+            if len(entradas) and entradas.min() < censo.inicio:
+                # El censo empezaría antes: se reconstruye en el primer uso
+                return
+            fines_anteriores = None if nuevas else self.fin_estancia[filas][validas]
+            fines_nuevos = store.fin_estancia[filas][validas]
+            if fines_anteriores is not None and (fines_anteriores == censo.ultimo).any():
+                # El último día puede adelantarse: se busca de nuevo entre todas las estancias
+                todas = ~np.isnat(store.fecha_entrada)
+                cerradas = todas & ~np.isnat(store.fin_estancia)
+                ultimo = store.fecha_entrada[todas].max()
+                if cerradas.any():
+                    ultimo = max(ultimo, store.fin_estancia[cerradas].max())
+            else:
+                cerradas = fines_nuevos[~np.isnat(fines_nuevos)]
+                ultimo = max([censo.ultimo] + ([entradas.max()] if len(entradas) else []) + ([cerradas.max()] if len(cerradas) else []))
+            _, grupo_de_codigo = store.servicio.grupos()
+            heredados['censo'] = censo.con_cambios(
+                grupo_de_codigo[store.servicio.codigos[filas][validas]], entradas,
+                fines_anteriores, fines_nuevos, ultimo, descartadas=int((~validas).sum())
+            )
+
+    def columnas(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """
+        Descompone el almacén en arreglos planos y metadatos serializables.
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], Dict]: Arreglos por nombre y metadatos
+            JSON (categorías y claves del cubo) para reconstruirlo
+        """
+        arreglos = {
+            'ids': self.ids,
+            'fecha_entrada': self.fecha_entrada,
+            'fecha_alta': self.fecha_alta,
+            'edad': self.edad,
+            'estancia': self.estancia,
+            'cubo_conteo': self.cubo_estancias.conteo,
+            'cubo_suma': self.cubo_estancias.suma,
+            'cubo_suma_cuadrados': self.cubo_estancias.suma_cuadrados,
+            'sketches_conteos': self.sketches_estancia.conteos,
+            'indice_id_tabla': self.indice_id.tabla
+        }
+        categorias = {}
+        for nombre in COLUMNAS_CATEGORICAS:
+            columna = getattr(self, nombre)
+            arreglos[f'{nombre}_codigos'] = columna.codigos
+            categorias[nombre] = columna.categorias
+            if columna.orden_filas is not None:
+                arreglos[f'{nombre}_orden_filas'] = columna.orden_filas
+                arreglos[f'{nombre}_limites'] = columna.limites
+        metadatos = {
+            'categorias': categorias,
+            'claves_cubo': {dim: list(claves) for dim, claves in self.cubo_estancias.claves.items()},
+            'claves_sketches': {dim: list(claves) for dim, claves in self.sketches_estancia.claves.items()},
+            'ids_duplicados': self.indice_id.duplicados
+        }
+        return arreglos, metadatos
+
+    @classmethod
+    def desde_columnas(cls, arreglos: Dict[str, np.ndarray], metadatos: Dict) -> 'PacientesStore':
+        """
+        Reconstruye el almacén a partir de lo devuelto por `columnas()`.
+
+        Los arreglos se usan tal cual, sin copiarlos, así que pueden venir de un
+        archivo mapeado en memoria; solo el cubo se copia porque se actualiza (los
+        sketches se actualizan siempre sobre una copia).
+        """
+        categoricas = {}
+        for nombre in COLUMNAS_CATEGORICAS:
+            categoricas[nombre] = ColumnaCategorica(
+                arreglos[f'{nombre}_codigos'],
+                metadatos['categorias'][nombre],
+                indexar=f'{nombre}_orden_filas' in arreglos,
+                orden_filas=arreglos.get(f'{nombre}_orden_filas'),
+                limites=arreglos.get(f'{nombre}_limites')
+            )
+        cubo = CuboEstancias(metadatos['claves_cubo'])
+        cubo.conteo[...] = arreglos['cubo_conteo']
+        cubo.suma[...] = arreglos['cubo_suma']
+        cubo.suma_cuadrados[...] = arreglos['cubo_suma_cuadrados']
+        store = cls(
+            ids=arreglos['ids'],
+            fecha_entrada=arreglos['fecha_entrada'],
+            fecha_alta=arreglos['fecha_alta'],
+            edad=arreglos['edad'],
+            estancia=arreglos['estancia'],
+            cubo_estancias=cubo,
+            indice_id=IndiceIds(arreglos['ids'], arreglos['indice_id_tabla'], metadatos['ids_duplicados']),
+            sketches_estancia=SketchesEstancia(metadatos['claves_sketches'], arreglos['sketches_conteos']),
+            **categoricas
+        )
+        store.generacion = metadatos.get('generacion', 0)
+        store.huella = metadatos.get('csv')
+        return store
+
+
+# Parámetros del hash FNV-1a de 64 bits usado por el índice de ids
+FNV_BASE = 0xcbf29ce484222325
+FNV_PRIMO = 0x100000001b3
+
+
+def hash_ids(ids: np.ndarray) -> np.ndarray:
+    """
+    Calcula un hash FNV-1a de 64 bits, estable entre procesos, para cada id.
+
+    Solo se usan los caracteres reales del id, así que el hash no depende del
+    ancho del arreglo de texto.
+
+    Args:
+        ids (np.ndarray): Arreglo de ids de tipo texto de ancho fijo ('<U...')
+
+    Returns:
+        np.ndarray: Hash uint64 de cada id
+    """
+    if len(ids) == 0:
+        # reshape(0, -1) no puede deducir el ancho
+        return np.empty(0, dtype=np.uint64)
+    caracteres = np.ascontiguousarray(ids).view(np.uint32).reshape(len(ids), -1)
+    largos = np.char.str_len(ids)
+    hashes = np.full(len(ids), FNV_BASE, dtype=np.uint64)
+    for posicion, columna in enumerate(caracteres.T):
+        activos = largos > posicion
+        hashes[activos] = (hashes[activos] ^ columna[activos].astype(np.uint64)) * np.uint64(FNV_PRIMO)
+    return hashes
+
+
+def hash_id(id: str) -> int:
+    """Mismo hash que hash_ids(), calculado en Python para un solo id."""
+    valor = FNV_BASE
+    for caracter in id:
+        valor = ((valor ^ ord(caracter)) * FNV_PRIMO) & 0xffffffffffffffff
+    return valor
+
+
+class IndiceIds:
+    """
+    Tabla hash de direccionamiento abierto id -> fila guardada en un arreglo.
+
+    Al ser un arreglo plano con un hash estable, la tabla se puede guardar en el
+    snapshot y compartir entre procesos sin reconstruirla. Los ids repetidos se
+    detectan al construirla y se guardan aparte.
+    """
+
+    def __init__(self, ids: np.ndarray, tabla: np.ndarray, duplicados: Dict[str, List[int]]):
+        self.ids = ids
+        self.tabla = tabla
+        self.mascara = len(tabla) - 1
+        self.duplicados = duplicados
+
+    @staticmethod
+    def _capacidad(filas: int) -> int:
+        """Potencia de dos que mantiene el factor de carga por debajo de 0,5."""
+        return 1 << max(int(2 * filas).bit_length(), 4)
+
+    @staticmethod
+    def _insertar(tabla: np.ndarray, ids: np.ndarray, filas: np.ndarray) -> None:
+        """
+        Inserta `filas` en la tabla con sondeo lineal, por rondas vectorizadas.
+
+        Args:
+            tabla (np.ndarray): Tabla a modificar (-1 = posición libre)
+            ids (np.ndarray): Columna de ids completa
+            filas (np.ndarray): Filas a insertar
+        """
+        mascara = len(tabla) - 1
+        pendientes = filas.astype(np.int64)
+        posiciones = (hash_ids(ids[pendientes]) & np.uint64(mascara)).astype(np.int64)
+        while len(pendientes):
+            libres = np.flatnonzero(tabla[posiciones] == -1)
+            # Entre los que apuntan a la misma posición libre gana la fila menor
+            _, primeros = np.unique(posiciones[libres], return_index=True)
+            ganadores = libres[primeros]
+            tabla[posiciones[ganadores]] = pendientes[ganadores]
+            quedan = np.ones(len(pendientes), dtype=bool)
+            quedan[ganadores] = False
+            pendientes = pendientes[quedan]
+            posiciones = (posiciones[quedan] + 1) & mascara
+
+    @classmethod
+    def construir(cls, ids: np.ndarray) -> 'IndiceIds':
+        """
+        Construye la tabla para todos los ids y detecta los repetidos.
+
+        Args:
+            ids (np.ndarray): Columna de ids del almacén
+
+        Returns:
+            IndiceIds: Índice con factor de carga máximo de 0,5
+        """
+        tabla = np.full(cls._capacidad(len(ids)), -1, dtype=np.int64)
+        cls._insertar(tabla, ids, np.arange(len(ids)))
+
+        repetidos = pd.Series(ids).duplicated(keep=False).to_numpy()
+        duplicados: Dict[str, List[int]] = {}
+        for fila in np.flatnonzero(repetidos).tolist():
+            duplicados.setdefault(str(ids[fila]), []).append(fila)
+        if duplicados:
+            logger.warning(
+                "Se encontraron %d ids duplicados en el dataset: %s",
+                len(duplicados), ', '.join(list(duplicados)[:20])
+            )
+        return cls(ids, tabla, duplicados)
+
+    def extender(self, ids: np.ndarray) -> 'IndiceIds':
+        """
+        Devuelve un nuevo índice que incluye las filas agregadas al final de `ids`.
+
+        El índice actual no se modifica (puede estar en uso o mapeado en memoria).
+
+        Args:
+            ids (np.ndarray): Columna de ids completa (filas anteriores + nuevas)
+
+        Returns:
+            IndiceIds: Índice para la columna completa
+        """
+        if self._capacidad(len(ids)) > len(self.tabla):
+            return IndiceIds.construir(ids)
+
+        anteriores = len(self.ids)
+        tabla = self.tabla.copy()
+        self._insertar(tabla, ids, np.arange(anteriores, len(ids)))
+
+        # Los repetidos se buscan contra el índice anterior y dentro del lote nuevo
+        duplicados = {id: list(filas) for id, filas in self.duplicados.items()}
+        vistos: Dict[str, int] = {}
+        for fila in range(anteriores, len(ids)):
+            id = str(ids[fila])
+            if id in duplicados:
+                duplicados[id].append(fila)
+                continue
+            existente = vistos.get(id)
+            if existente is None:
+                existente = self.buscar(id)
+            if existente is None:
+                vistos[id] = fila
+            else:
+                duplicados[id] = [existente, fila]
+                logger.warning("Id duplicado agregado al dataset: %s", id)
+        return IndiceIds(ids, tabla, duplicados)
+
+    def buscar(self, id: str) -> Optional[int]:
+        """
+        Devuelve la fila del id o None si no existe (O(1) esperado).
+
+        Args:
+            id (str): Id del paciente
+
+        Returns:
+            Optional[int]: Fila del paciente
+        """
+        posicion = hash_id(id) & self.mascara
+        while True:
+            fila = int(self.tabla[posicion])
+            if fila == -1:
+                return None
+            if self.ids[fila] == id:
+                return fila
+            posicion = (posicion + 1) & self.mascara
+
+
+class IndiceOrdenado:
+    """
+    Permutación de las filas ordenadas por el valor de una columna numérica.
+
+    Un rango [minimo, maximo] se ubica con dos búsquedas binarias sobre los
+    valores ordenados: contar cuesta O(log n) y obtener las filas O(log n + k).
+    Los valores NaN quedan fuera del índice.
+    """
+
+    def __init__(self, valores: np.ndarray, orden: Optional[np.ndarray] = None, ordenados: Optional[np.ndarray] = None):
+        if orden is None:
+            validas = np.flatnonzero(~np.isnan(valores))
+            orden = validas[np.argsort(valores[validas], kind='stable')]
+        self.orden = orden
+        self.valores = valores[orden] if ordenados is None else ordenados
+
+    def limites(self, minimo: Optional[float], maximo: Optional[float]) -> Tuple[int, int]:
+        """
+        Ubica el tramo del índice con valores dentro de [minimo, maximo].
+
+        Args:
+            minimo (Optional[float]): Cota inferior inclusiva; None = sin cota
+            maximo (Optional[float]): Cota superior inclusiva; None = sin cota
+
+        Returns:
+            Tuple[int, int]: Posiciones de inicio y fin (exclusivo) en el índice
+        """
+        inicio = 0 if minimo is None else int(np.searchsorted(self.valores, minimo, side='left'))
+        fin = len(self.valores) if maximo is None else int(np.searchsorted(self.valores, maximo, side='right'))
+        return inicio, max(inicio, fin)
+
+    def contar(self, minimo: Optional[float], maximo: Optional[float]) -> int:
+        """Cantidad de filas en el rango, sin materializarlas."""
+        inicio, fin = self.limites(minimo, maximo)
+        return fin - inicio
+
+    def filas(self, minimo: Optional[float], maximo: Optional[float]) -> np.ndarray:
+        """Filas con valor en el rango, en orden ascendente de fila."""
+        inicio, fin = self.limites(minimo, maximo)
+        return np.sort(self.orden[inicio:fin])
+
+    def con_cambios(self, valores: np.ndarray, filas: np.ndarray, anteriores: Optional[np.ndarray] = None) -> 'IndiceOrdenado':
+        """
+        Devuelve el índice de `valores` cuando solo cambiaron (o se agregaron) `filas`.
+
+        Las entradas anteriores de esas filas se ubican con búsqueda binaria
+        sobre su valor anterior y se quitan; luego se insertan con el valor
+        nuevo. Son copias O(n) de memoria en lugar de volver a ordenar. Entre
+        valores iguales las filas pueden quedar en otro orden que con argsort,
+        lo que no cambia ninguna consulta: filas() ordena.
+
+        Args:
+            valores (np.ndarray): Columna completa con los valores nuevos
+            filas (np.ndarray): Filas modificadas o agregadas, sin repetir
+            anteriores (Optional[np.ndarray]): Valor anterior de cada fila; None
+                si son filas nuevas, que todavía no están en el índice
+
+        Returns:
+            IndiceOrdenado: Índice nuevo; este no se modifica
+        """
+        orden, ordenados = self.orden, self.valores
+        if anteriores is not None:
+            estaban = ~np.isnan(anteriores)
+            inicios = np.searchsorted(ordenados, anteriores[estaban], side='left')
+            fines = np.searchsorted(ordenados, anteriores[estaban], side='right')
+            posiciones = [
+                inicio + int(np.flatnonzero(orden[inicio:fin] == fila)[0])
+                for fila, inicio, fin in zip(filas[estaban].tolist(), inicios.tolist(), fines.tolist())
+            ]
+            orden, ordenados = np.delete(orden, posiciones), np.delete(ordenados, posiciones)
+
+        filas = filas[~np.isnan(valores[filas])]
+        nuevos = valores[filas]
+        secuencia = np.argsort(nuevos, kind='stable')
+        filas, nuevos = filas[secuencia], nuevos[secuencia]
+        posiciones = np.searchsorted(ordenados, nuevos, side='right')
+        return IndiceOrdenado(valores, np.insert(orden, posiciones, filas), np.insert(ordenados, posiciones, nuevos))
+
+
+def formatear_fecha(fecha: np.datetime64) -> str:
+    """Devuelve la fecha con el formato original del CSV o '' si falta."""
+    if np.isnat(fecha):
+        return ''
+    dia = fecha.astype(object)
+    return f"{dia.month}/{dia.day:02d}/{dia.year}"
+
+
+def formatear_numero(valor: float) -> Union[int, float, str]:
+    """Devuelve enteros sin decimales y '' para valores faltantes."""
+    if np.isnan(valor):
+        return ''
+    return int(valor) if float(valor).is_integer() else float(valor)
+
+
+def parsear_edad(texto: str) -> float:
+    """
+    Convierte el texto de la columna Edad a años.
+
+    Args:
+        texto (str): Valor original, p. ej. "30" o "5 jours" para neonatos
+
+    Returns:
+        float: Edad en años o NaN si no se puede interpretar
+    """
+    partes = texto.strip().lower().split()
+    try:
+        valor = float(partes[0].replace(',', '.'))
+    except (IndexError, ValueError):
+        return np.nan
+    if len(partes) > 1 and partes[1].startswith('jour'):
+        return valor / 365.0
+    return valor
+
+
+def convertir_ids(serie: pd.Series) -> np.ndarray:
+    """Convierte la columna id en un arreglo de texto de ancho fijo."""
+    return serie.astype(str).to_numpy(dtype=str)
+
+
+def convertir_fechas(serie: pd.Series) -> np.ndarray:
+    """Convierte una columna de fechas del CSV a datetime64[D] (NaT si no es válida)."""
+    return pd.to_datetime(serie, format=FORMATO_FECHA, errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+def convertir_numeros(serie: pd.Series) -> np.ndarray:
+    """Convierte una columna numérica a float64 (NaN si no es válida)."""
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def tabla_edades(categorias: List[str]) -> np.ndarray:
+    """Edad en años de cada valor distinto de Edad; la última posición atiende el vacío."""
+    return np.array([parsear_edad(c) for c in categorias] + [np.nan], dtype=np.float64)
+
+
+def construir_store(df: pd.DataFrame) -> PacientesStore:
+    """
+    Convierte el DataFrame leído del CSV en un almacén columnar.
+
+    Args:
+        df (pd.DataFrame): Datos con las columnas de COLUMNAS_CSV
+
+    Returns:
+        PacientesStore: Almacén columnar listo para consultas vectorizadas
+    """
+    edad_texto = ColumnaCategorica.desde_serie(df['Edad'])
+
+    return PacientesStore(
+        ids=convertir_ids(df['id']),
+        fecha_entrada=convertir_fechas(df['fecha_entrada']),
+        fecha_alta=convertir_fechas(df['fecha_alta']),
+        genero=ColumnaCategorica.desde_serie(df['Genero']),
+        # La edad numérica se calcula una vez por valor distinto
+        edad=tabla_edades(edad_texto.categorias)[edad_texto.codigos],
+        edad_texto=edad_texto,
+        enfermedad=ColumnaCategorica.desde_serie(df['Enfermedad'], indexar=True),
+        servicio=ColumnaCategorica.desde_serie(df['Servicio'], indexar=True),
+        estancia=convertir_numeros(df['Estancia'])
+    )
+
+# ======================================================
+# CUBO DE AGREGADOS DE ESTANCIA
+# ======================================================
+
+# Dimensiones del cubo, en el orden de sus ejes
+DIMENSIONES_CUBO = ('enfermedad', 'servicio', 'genero', 'banda_edad')
+
+# Límites inferiores (en años) de las bandas de edad y sus etiquetas
+LIMITES_BANDAS_EDAD = [1, 5, 15, 30, 45, 60, 75]
+BANDAS_EDAD = ['<1', '1-4', '5-14', '15-29', '30-44', '45-59', '60-74', '75+']
+BANDA_SIN_DATO = 'sin dato'
+
+
+def indices_banda_edad(edades: np.ndarray) -> np.ndarray:
+    """Devuelve la posición en BANDAS_EDAD de cada edad (NaN -> BANDA_SIN_DATO)."""
+    posiciones = np.digitize(edades, LIMITES_BANDAS_EDAD)
+    posiciones[np.isnan(edades)] = len(BANDAS_EDAD)
+    return posiciones
+
+
+class CuboEstancias:
+    """
+    Cubo group-by con conteo, suma y suma de cuadrados de la estancia.
+
+    Cada eje corresponde a una dimensión de DIMENSIONES_CUBO y su última
+    posición acumula el total de la dimensión, así que el promedio y la
+    varianza de cualquier combinación de filtros se leen en O(1). Los textos se
+    agrupan normalizados ("Malaria" y "malaria" forman un solo grupo). Solo se
+    consideran estancias positivas, igual que el promedio por enfermedad.
+    """
+
+    def __init__(self, valores: Dict[str, List[str]]):
+        self.claves = {dim: {v: i for i, v in enumerate(valores[dim])} for dim in DIMENSIONES_CUBO}
+        # La posición adicional de cada eje guarda el total de la dimensión
+        forma = tuple(len(valores[dim]) + 1 for dim in DIMENSIONES_CUBO)
+        self.conteo = np.zeros(forma, dtype=np.int64)
+        self.suma = np.zeros(forma, dtype=np.float64)
+        self.suma_cuadrados = np.zeros(forma, dtype=np.float64)
+
+    @classmethod
+    def desde_store(cls, store: 'PacientesStore') -> 'CuboEstancias':
+        """
+        Construye el cubo completo a partir de las columnas del almacén.
+
+        Args:
+            store (PacientesStore): Almacén con los pacientes cargados
+
+        Returns:
+            CuboEstancias: Cubo con todos los totales calculados
+        """
+        # Código de grupo normalizado para cada código de categoría de cada columna
+        valores: Dict[str, List[str]] = {}
+        indices = []
+        for dim, columna in (('enfermedad', store.enfermedad), ('servicio', store.servicio), ('genero', store.genero)):
+            valores[dim], grupo_de_codigo = columna.grupos()
+            indices.append(grupo_de_codigo[columna.codigos])
+        valores['banda_edad'] = BANDAS_EDAD + [BANDA_SIN_DATO]
+        indices.append(indices_banda_edad(store.edad))
+
+        cubo = cls(valores)
+        validas = store.estancia > 0
+        estancias = store.estancia[validas]
+        plano = np.ravel_multi_index(tuple(i[validas] for i in indices), cubo.conteo.shape)
+        for destino, pesos in ((cubo.conteo, None), (cubo.suma, estancias), (cubo.suma_cuadrados, estancias ** 2)):
+            destino += np.bincount(plano, weights=pesos, minlength=destino.size).reshape(destino.shape).astype(destino.dtype)
+        cubo._calcular_totales()
+        return cubo
+
+    def copia(self) -> 'CuboEstancias':
+        """Devuelve una copia independiente del cubo para actualizarla sin afectar a este."""
+        cubo = CuboEstancias({dim: list(claves) for dim, claves in self.claves.items()})
+        cubo.conteo[...] = self.conteo
+        cubo.suma[...] = self.suma
+        cubo.suma_cuadrados[...] = self.suma_cuadrados
+        return cubo
+
+    def _calcular_totales(self) -> None:
+        """Rellena la posición de total de cada eje sumando el resto del eje."""
+        for eje in range(len(DIMENSIONES_CUBO)):
+            for arreglo in (self.conteo, self.suma, self.suma_cuadrados):
+                total = [slice(None)] * arreglo.ndim
+                total[eje] = -1
+                parciales = [slice(None)] * arreglo.ndim
+                parciales[eje] = slice(0, -1)
+                arreglo[tuple(total)] = arreglo[tuple(parciales)].sum(axis=eje)
+
+    def _indice(self, dim: str, valor: str) -> int:
+        """Devuelve la posición de `valor` en el eje `dim`, ampliando el eje si es nuevo."""
+        claves = self.claves[dim]
+        if valor not in claves:
+            eje = DIMENSIONES_CUBO.index(dim)
+            posicion = len(claves)
+            self.conteo = np.insert(self.conteo, posicion, 0, axis=eje)
+            self.suma = np.insert(self.suma, posicion, 0, axis=eje)
+            self.suma_cuadrados = np.insert(self.suma_cuadrados, posicion, 0, axis=eje)
+            claves[valor] = posicion
+        return claves[valor]
+
+    def agregar(self, enfermedad: str, servicio: str, genero: str, edad: float, estancia: float, signo: int = 1) -> None:
+        """
+        Actualiza el cubo de forma incremental con un nuevo registro.
+
+        Solo se tocan las 2^4 celdas afectadas (el grupo exacto y sus totales).
+
+        Args:
+            enfermedad (str): Enfermedad del paciente
+            servicio (str): Servicio del paciente
+            genero (str): Género del paciente
+            edad (float): Edad en años (NaN si se desconoce)
+            estancia (float): Estancia en días
+            signo (int): 1 para agregar el registro, -1 para quitarlo
+        """
+        if not estancia > 0:
+            return
+        exacto = (
+            self._indice('enfermedad', normalizar(enfermedad)),
+            self._indice('servicio', normalizar(servicio)),
+            self._indice('genero', normalizar(genero)),
+            int(indices_banda_edad(np.array([edad], dtype=np.float64))[0])
+        )
+        for usar_total in itertools.product((False, True), repeat=len(exacto)):
+            celda = tuple(-1 if total else i for i, total in zip(exacto, usar_total))
+            self.conteo[celda] += signo
+            self.suma[celda] += signo * estancia
+            self.suma_cuadrados[celda] += signo * estancia ** 2
+
+    def consultar(self, **filtros: Optional[str]) -> Optional[Dict]:
+        """
+        Devuelve conteo, promedio y varianza de la estancia para una combinación de filtros.
+
+        Args:
+            **filtros: Valor de cada dimensión de DIMENSIONES_CUBO; None agrega la dimensión
+
+        Returns:
+            Optional[Dict]: Estadísticas del grupo o None si no tiene registros
+        """
+        celda = []
+        for dim in DIMENSIONES_CUBO:
+            valor = filtros.get(dim)
+            if valor is None:
+                celda.append(-1)
+                continue
+            clave = valor if dim == 'banda_edad' else normalizar(valor.strip())
+            if clave not in self.claves[dim]:
+                return None
+            celda.append(self.claves[dim][clave])
+        celda = tuple(celda)
+
+        conteo = int(self.conteo[celda])
+        if not conteo:
+            return None
+        suma = float(self.suma[celda])
+        promedio = suma / conteo
+        # Varianza muestral a partir de las sumas acumuladas
+        varianza = max(float(self.suma_cuadrados[celda]) - suma * promedio, 0.0) / (conteo - 1) if conteo > 1 else 0.0
+        return {
+            'pacientes': conteo,
+            'promedio_estancia': round(promedio, 2),
+            'varianza_estancia': round(varianza, 2),
+            'desviacion_estancia': round(varianza ** 0.5, 2)
+        }
+
+# ======================================================
+# SKETCHES DE CUANTILES DE ESTANCIA
+# ======================================================
+
+# Error relativo máximo de los percentiles (1%) y estancia máxima representable;
+# las estancias mayores caen en la última cubeta
+PRECISION_SKETCH = 0.01
+ESTANCIA_MAXIMA_SKETCH = 36_500
+GAMMA_SKETCH = (1 + PRECISION_SKETCH) / (1 - PRECISION_SKETCH)
+NUM_CUBETAS_SKETCH = int(np.ceil(np.log(ESTANCIA_MAXIMA_SKETCH) / np.log(GAMMA_SKETCH))) + 1
+
+# Percentiles que se informan y rangos (en días) del histograma; desde ~50 días
+# una cubeta puede abarcar dos días, así que el borde de un rango es aproximado
+PERCENTILES_ESTANCIA = {'mediana': 0.5, 'p90': 0.9, 'p99': 0.99}
+LIMITES_HISTOGRAMA_ESTANCIA = [2, 3, 4, 5, 6, 8, 11, 15, 22, 31, 61, 91, 181, 366]
+RANGOS_HISTOGRAMA_ESTANCIA = ['1', '2', '3', '4', '5', '6-7', '8-10', '11-14', '15-21', '22-30', '31-60', '61-90', '91-180', '181-365', '366+']
+
+
+def cubetas_estancia(estancias: np.ndarray) -> np.ndarray:
+    """Cubeta de cada estancia: la i cubre (GAMMA^(i-1), GAMMA^i]."""
+    cubetas = np.ceil(np.log(np.maximum(estancias, 1.0)) / np.log(GAMMA_SKETCH) - 1e-9)
+    return np.clip(cubetas, 0, NUM_CUBETAS_SKETCH - 1).astype(np.int64)
+
+
+def valores_cubetas() -> np.ndarray:
+    """
+    Valor que representa a cada cubeta, a menos de PRECISION_SKETCH del real.
+
+    Las cubetas de menos de un día de ancho (estancias de hasta ~50 días)
+    contienen a lo sumo un día entero; como las estancias son días enteros,
+    ese día es su valor exacto.
+    """
+    superior = GAMMA_SKETCH ** np.arange(NUM_CUBETAS_SKETCH, dtype=np.float64)
+    inferior = superior / GAMMA_SKETCH
+    entero = np.floor(superior + 1e-9)
+    unico = (entero > inferior) & (entero - 1 <= inferior)
+    return np.where(unico, entero, 2 * superior / (GAMMA_SKETCH + 1))
+
+
+VALORES_CUBETAS = valores_cubetas()
+# Rango del histograma al que se suma cada cubeta
+RANGO_DE_CUBETA = np.digitize(VALORES_CUBETAS, LIMITES_HISTOGRAMA_ESTANCIA)
+
+
+class SketchesEstancia:
+    """
+    Sketches de cuantiles de la estancia por enfermedad y servicio.
+
+    Cada grupo guarda un histograma de cubetas logarítmicas (como DDSketch):
+    cualquier percentil se lee recorriendo las cubetas, sin ordenar filas, con
+    un error relativo de a lo sumo PRECISION_SKETCH. Igual que el cubo, la
+    última posición de cada eje acumula el total de la dimensión. Los sketches
+    se combinan sumando cubetas y admiten quitar un valor (al corregir una
+    estancia con un alta), así que se actualizan en O(1) por fila. Solo se
+    consideran estancias positivas, igual que en el cubo.
+    """
+
+    DIMENSIONES = ('enfermedad', 'servicio')
+
+    def __init__(self, valores: Dict[str, List[str]], conteos: Optional[np.ndarray] = None):
+        self.claves = {dim: {v: i for i, v in enumerate(valores[dim])} for dim in self.DIMENSIONES}
+        forma = tuple(len(valores[dim]) + 1 for dim in self.DIMENSIONES) + (NUM_CUBETAS_SKETCH,)
+        self.conteos = np.zeros(forma, dtype=np.int32) if conteos is None else conteos
+
+    @classmethod
+    def desde_store(cls, store: 'PacientesStore') -> 'SketchesEstancia':
+        """
+        Construye los sketches de todos los grupos a partir del almacén.
+
+        Args:
+            store (PacientesStore): Almacén con los pacientes cargados
+
+        Returns:
+            SketchesEstancia: Sketches con los totales calculados
+        """
+        valores: Dict[str, List[str]] = {}
+        indices = []
+        for dim, columna in (('enfermedad', store.enfermedad), ('servicio', store.servicio)):
+            valores[dim], grupo_de_codigo = columna.grupos()
+            indices.append(grupo_de_codigo[columna.codigos])
+
+        sketches = cls(valores)
+        validas = store.estancia > 0
+        indices.append(cubetas_estancia(store.estancia[validas]))
+        plano = np.ravel_multi_index((indices[0][validas], indices[1][validas], indices[2]), sketches.conteos.shape)
+        sketches.conteos += np.bincount(plano, minlength=sketches.conteos.size).reshape(sketches.conteos.shape).astype(np.int32)
+        # Totales por servicio, por enfermedad y general
+        sketches.conteos[-1, :-1] = sketches.conteos[:-1, :-1].sum(axis=0)
+        sketches.conteos[:, -1] = sketches.conteos[:, :-1].sum(axis=1)
+        return sketches
+
+    def copia(self) -> 'SketchesEstancia':
+        """Devuelve una copia independiente para actualizarla sin afectar a esta."""
+        return SketchesEstancia({dim: list(claves) for dim, claves in self.claves.items()}, self.conteos.copy())
+
+    def _indice(self, dim: str, valor: str) -> int:
+        """Devuelve la posición de `valor` en el eje `dim`, ampliando el eje si es nuevo."""
+        claves = self.claves[dim]
+        if valor not in claves:
+            claves[valor] = len(claves)
+            self.conteos = np.insert(self.conteos, claves[valor], 0, axis=self.DIMENSIONES.index(dim))
+        return claves[valor]
+
+    def agregar(self, enfermedad: str, servicio: str, estancia: float, signo: int = 1) -> None:
+        """
+        Suma (o quita, con signo=-1) una estancia a su grupo y a los totales.
+
+        Args:
+            enfermedad (str): Enfermedad del paciente
+            servicio (str): Servicio del paciente
+            estancia (float): Estancia en días
+            signo (int): 1 para agregar el valor, -1 para quitarlo
+        """
+        if not estancia > 0:
+            return
+        fila = self._indice('enfermedad', normalizar(enfermedad))
+        columna = self._indice('servicio', normalizar(servicio))
+        cubeta = int(cubetas_estancia(np.array([estancia], dtype=np.float64))[0])
+        for celda in ((fila, columna), (fila, -1), (-1, columna), (-1, -1)):
+            self.conteos[celda + (cubeta,)] += signo
+
+    def consultar(self, enfermedad: Optional[str] = None, servicio: Optional[str] = None) -> Optional[Dict]:
+        """
+        Devuelve percentiles e histograma de la estancia de un grupo.
+
+        Args:
+            enfermedad (Optional[str]): Enfermedad; None agrega la dimensión
+            servicio (Optional[str]): Servicio; None agrega la dimensión
+
+        Returns:
+            Optional[Dict]: Pacientes, PERCENTILES_ESTANCIA y conteo por rango
+            de RANGOS_HISTOGRAMA_ESTANCIA, o None si el grupo no tiene registros
+        """
+        celda = []
+        for dim, valor in (('enfermedad', enfermedad), ('servicio', servicio)):
+            if valor is None:
+                celda.append(-1)
+                continue
+            clave = normalizar(valor.strip())
+            if clave not in self.claves[dim]:
+                return None
+            celda.append(self.claves[dim][clave])
+        conteos = self.conteos[tuple(celda)]
+        acumulado = np.cumsum(conteos, dtype=np.int64)
+        total = int(acumulado[-1])
+        if not total:
+            return None
+        # Percentil "inferior": el valor en la posición floor(q * (n - 1)) de las estancias ordenadas
+        percentiles = {
+            nombre: round(float(VALORES_CUBETAS[np.searchsorted(acumulado, int(q * (total - 1)), side='right')]), 2)
+            for nombre, q in PERCENTILES_ESTANCIA.items()
+        }
+        histograma = np.bincount(RANGO_DE_CUBETA, weights=conteos, minlength=len(RANGOS_HISTOGRAMA_ESTANCIA))
+        return {
+            'pacientes': total,
+            **percentiles,
+            'histograma': [
+                {'dias': rango, 'pacientes': int(n)} for rango, n in zip(RANGOS_HISTOGRAMA_ESTANCIA, histograma)
+            ]
+        }
+
+# ======================================================
+# CENSO DIARIO DE CAMAS
+# ======================================================
+
+# Máximo de días que puede abarcar una consulta del censo
+MAX_DIAS_CENSO = 366 * 30
+
+
+class CensoCamas:
+    """
+    Camas ocupadas por día y por servicio, precalculadas con un arreglo de diferencias.
+
+    Cada estancia suma 1 el día de ingreso y resta 1 el día de alta (censo de
+    medianoche: ocupa cama los días ingreso <= d < alta); la suma acumulada da
+    la ocupación de todos los días en O(estancias + días). Las estancias
+    abiertas nunca restan. Consultar un rango es leer un tramo del arreglo.
+    """
+
+    def __init__(self, store: 'PacientesStore'):
+        claves, grupo_de_codigo = store.servicio.grupos()
+        self.claves = claves
+        self.etiquetas = store.servicio.etiquetas_grupos()
+        grupo = grupo_de_codigo[store.servicio.codigos]
+
+        entrada = store.fecha_entrada
+        fin = store.fin_estancia
+        validas = ~np.isnat(entrada)
+        self.descartadas = int((~validas).sum())
+        entrada, fin, grupo = entrada[validas], fin[validas], grupo[validas]
+        cerradas = ~np.isnat(fin)
+
+        if not len(entrada):
+            self.inicio = self.ultimo = self.ultimo_ingreso = np.datetime64(date.today(), 'D')
+            self.ocupacion = np.zeros((len(claves), 2), dtype=np.int64)
+            return
+        self.inicio = entrada.min()
+        self.ultimo_ingreso = entrada.max()
+        self.ultimo = max(entrada.max(), fin[cerradas].max() if cerradas.any() else entrada.max())
+        dias = int((self.ultimo - self.inicio).astype(int)) + 1
+
+        # La columna extra (posición `dias`) guarda la ocupación después del último día
+        ancho = dias + 1
+        ingresos = grupo * ancho + (entrada - self.inicio).astype(np.int64)
+        altas = grupo[cerradas] * ancho + (fin[cerradas] - self.inicio).astype(np.int64)
+        diferencias = np.bincount(ingresos, minlength=len(claves) * ancho) - np.bincount(altas, minlength=len(claves) * ancho)
+        self.ocupacion = np.cumsum(diferencias.reshape(len(claves), ancho), axis=1)
+
+    def con_cambios(
+        self,
+        grupos: np.ndarray,
+        entradas: np.ndarray,
+        fines_anteriores: Optional[np.ndarray],
+        fines_nuevos: np.ndarray,
+        ultimo: np.datetime64,
+        descartadas: int = 0
+    ) -> 'CensoCamas':
+        """
+        Devuelve el censo con algunas estancias cambiadas o agregadas, sin recorrer el almacén.
+
+        Se restan las diferencias de ingreso/alta anteriores de esas estancias,
+        se suman las nuevas y su suma acumulada se agrega a la ocupación:
+        O(estancias cambiadas + grupos x días).
+
+        Args:
+            grupos (np.ndarray): Grupo de servicio de cada estancia
+            entradas (np.ndarray): Ingreso de cada estancia (sin NaT, no anterior a self.inicio)
+            fines_anteriores (Optional[np.ndarray]): Fin anterior (NaT = abierta); None si son estancias nuevas
+            fines_nuevos (np.ndarray): Fin nuevo (NaT = abierta)
+            ultimo (np.datetime64): Último día con ingresos o altas después del cambio
+            descartadas (int): Estancias nuevas sin fecha de ingreso
+
+        Returns:
+            CensoCamas: Censo nuevo; este no se modifica
+        """
+        ancho = int((ultimo - self.inicio).astype(int)) + 2
+        ocupacion = self.ocupacion[:, :ancho]
+        if ocupacion.shape[1] < ancho:
+            # Después del último día anterior la ocupación ya no cambiaba
+            ocupacion = np.concatenate([ocupacion, np.repeat(ocupacion[:, -1:], ancho - ocupacion.shape[1], axis=1)], axis=1)
+
+        diferencias = np.zeros(ocupacion.shape, dtype=np.int64)
+        for fines, signo in ((fines_anteriores, -1), (fines_nuevos, 1)):
+            if fines is None:
+                continue
+            np.add.at(diferencias, (grupos, (entradas - self.inicio).astype(np.int64)), signo)
+            cerradas = ~np.isnat(fines)
+            dias = (fines[cerradas] - self.inicio).astype(np.int64)
+            # Un alta anterior posterior al nuevo último día ya no cae dentro del censo
+            dentro = dias < ancho
+            np.add.at(diferencias, (grupos[cerradas][dentro], dias[dentro]), -signo)
+
+        censo = copy.copy(self)
+        censo.ocupacion = ocupacion + np.cumsum(diferencias, axis=1)
+        censo.ultimo = ultimo
+        censo.ultimo_ingreso = max(self.ultimo_ingreso, entradas.max()) if len(entradas) else self.ultimo_ingreso
+        censo.descartadas = self.descartadas + descartadas
+        return censo
+
+    def serie(self, desde: np.datetime64, hasta: np.datetime64) -> np.ndarray:
+        """
+        Devuelve la ocupación diaria de cada grupo de servicio en [desde, hasta].
+
+        Args:
+            desde (np.datetime64): Primer día
+            hasta (np.datetime64): Último día
+
+        Returns:
+            np.ndarray: Matriz grupos x días con las camas ocupadas
+        """
+        posiciones = np.arange(int((desde - self.inicio).astype(int)), int((hasta - self.inicio).astype(int)) + 1)
+        tramo = self.ocupacion[:, np.clip(posiciones, 0, self.ocupacion.shape[1] - 1)]
+        tramo[:, posiciones < 0] = 0
+        return tramo
+
+# ======================================================
+# PROYECCIÓN DE ALTAS
+# ======================================================
+
+# Observaciones mínimas que debe tener un grupo para usar su propia distribución
+MIN_MUESTRAS_ESTANCIA = 5
+
+
+def supervivencia_estancias(frecuencias: np.ndarray) -> np.ndarray:
+    """Estancias de cada fila de `frecuencias` que duraron más de k días, para cada k."""
+    return frecuencias.sum(axis=1, keepdims=True, dtype=np.int32) - np.cumsum(frecuencias, axis=1, dtype=np.int32)
+
+
+class DistribucionesEstancia:
+    """
+    Distribuciones empíricas de la Estancia por enfermedad y servicio.
+
+    Guarda, por cada nivel (enfermedad+servicio, solo enfermedad y global), cuántas
+    estancias duraron k días y cuántas duraron más de k días. Con eso la
+    probabilidad de alta de un paciente que lleva `a` días es
+    P(estancia = k | estancia > a) = frecuencia[k] / supervivencia[a], y se
+    evalúa con indexación de arreglos para todas las estancias a la vez.
+    """
+
+    def __init__(self, store: 'PacientesStore'):
+        claves_enfermedad, grupo_enfermedad = store.enfermedad.grupos()
+        claves_servicio, grupo_servicio = store.servicio.grupos()
+        self.grupo_enfermedad = grupo_enfermedad
+        self.grupo_servicio = grupo_servicio
+        self.n_servicios = len(claves_servicio)
+
+        validas = ~np.isnan(store.estancia) & (store.estancia >= 0)
+        dias = store.estancia[validas].astype(np.int64)
+        enfermedad = grupo_enfermedad[store.enfermedad.codigos][validas]
+        servicio = grupo_servicio[store.servicio.codigos][validas]
+
+        # Filas: primero las combinaciones enfermedad+servicio, luego solo enfermedad y al final la global
+        n_combinados = len(claves_enfermedad) * self.n_servicios
+        self.fila_enfermedad = n_combinados
+        self.fila_global = n_combinados + len(claves_enfermedad)
+        self.max_dias = int(dias.max()) + 1 if len(dias) else 1
+        ancho = self.max_dias + 1
+
+        filas = np.concatenate([
+            enfermedad * self.n_servicios + servicio,
+            self.fila_enfermedad + enfermedad,
+            np.full(len(dias), self.fila_global)
+        ])
+        columnas = np.tile(dias, 3)
+        self.frecuencias = np.bincount(filas * ancho + columnas, minlength=(self.fila_global + 1) * ancho).astype(np.int32).reshape(-1, ancho)
+        # supervivencia[f, k] = estancias de la fila f que duraron más de k días
+        self.supervivencia = supervivencia_estancias(self.frecuencias)
+
+    def con_cambios(
+        self, codigos_enfermedad: np.ndarray, codigos_servicio: np.ndarray,
+        anteriores: Optional[np.ndarray], nuevas: np.ndarray
+    ) -> 'DistribucionesEstancia':
+        """
+        Devuelve las distribuciones con la Estancia de algunas filas cambiada o agregada.
+
+        Solo se recalcula la supervivencia de los grupos afectados; si cambia la
+        estancia máxima, las columnas se amplían o recortan igual que al
+        construirlas desde el almacén.
+
+        Args:
+            codigos_enfermedad (np.ndarray): Código de enfermedad de cada fila
+            codigos_servicio (np.ndarray): Código de servicio de cada fila
+            anteriores (Optional[np.ndarray]): Estancia anterior; None si son filas nuevas
+            nuevas (np.ndarray): Estancia nueva
+
+        Returns:
+            DistribucionesEstancia: Distribuciones nuevas; estas no se modifican
+        """
+        enfermedad = self.grupo_enfermedad[codigos_enfermedad]
+        combinada = enfermedad * self.n_servicios + self.grupo_servicio[codigos_servicio]
+        cambios = []
+        for estancias, signo in ((anteriores, -1), (nuevas, 1)):
+            if estancias is None:
+                continue
+            validas = ~np.isnan(estancias) & (estancias >= 0)
+            dias = estancias[validas].astype(np.int64)
+            for fila in (combinada[validas], self.fila_enfermedad + enfermedad[validas], np.full(len(dias), self.fila_global)):
+                cambios.append((fila, dias, signo))
+
+        ancho = max([self.max_dias] + [int(dias.max()) + 1 for _, dias, _ in cambios if len(dias)]) + 1
+        if ancho == self.frecuencias.shape[1]:
+            frecuencias = self.frecuencias.copy()
+        else:
+            frecuencias = np.zeros((len(self.frecuencias), ancho), dtype=self.frecuencias.dtype)
+            frecuencias[:, :self.frecuencias.shape[1]] = self.frecuencias
+        for fila, dias, signo in cambios:
+            np.add.at(frecuencias, (fila, dias), signo)
+        # La estancia máxima también puede bajar; la fila global tiene todas las estancias
+        usadas = np.flatnonzero(frecuencias[self.fila_global])
+        max_dias = int(usadas[-1]) + 1 if len(usadas) else 1
+        frecuencias = frecuencias[:, :max_dias + 1]
+
+        if frecuencias.shape == self.supervivencia.shape:
+            supervivencia = self.supervivencia.copy()
+        else:
+            supervivencia = np.zeros(frecuencias.shape, dtype=self.supervivencia.dtype)
+            comunes = min(frecuencias.shape[1], self.supervivencia.shape[1])
+            supervivencia[:, :comunes] = self.supervivencia[:, :comunes]
+        afectadas = np.unique(np.concatenate([fila for fila, _, _ in cambios]))
+        supervivencia[afectadas] = supervivencia_estancias(frecuencias[afectadas])
+
+        distribuciones = copy.copy(self)
+        distribuciones.max_dias = max_dias
+        distribuciones.frecuencias = frecuencias
+        distribuciones.supervivencia = supervivencia
+        return distribuciones
+
+    def probabilidad_alta(
+        self, codigos_enfermedad: np.ndarray, codigos_servicio: np.ndarray,
+        transcurridos: np.ndarray, hasta_alta: np.ndarray
+    ) -> np.ndarray:
+        """
+        Calcula la probabilidad de que cada estancia termine en un día concreto.
+
+        Args:
+            codigos_enfermedad (np.ndarray): Código de enfermedad de cada estancia
+            codigos_servicio (np.ndarray): Código de servicio de cada estancia
+            transcurridos (np.ndarray): Días que la estancia ya superó sin alta
+            hasta_alta (np.ndarray): Duración que tendría la estancia con el alta ese día
+
+        Returns:
+            np.ndarray: Probabilidad de alta de cada estancia
+        """
+        enfermedad = self.grupo_enfermedad[codigos_enfermedad]
+        transcurridos = np.minimum(transcurridos, self.max_dias)
+        hasta_alta = np.minimum(hasta_alta, self.max_dias)
+
+        # Se usa el nivel más específico que conserve suficientes estancias tan largas como esta
+        fila = np.full(len(enfermedad), self.fila_global)
+        for candidata in (self.fila_enfermedad + enfermedad, enfermedad * self.n_servicios + self.grupo_servicio[codigos_servicio]):
+            suficientes = self.supervivencia[candidata, transcurridos] >= MIN_MUESTRAS_ESTANCIA
+            fila = np.where(suficientes, candidata, fila)
+
+        restantes = self.supervivencia[fila, transcurridos]
+        frecuencia = self.frecuencias[fila, hasta_alta]
+        return np.divide(frecuencia, restantes, out=np.zeros(len(fila)), where=restantes > 0)
+
+
+def proyectar_altas(
+    store: 'PacientesStore', fecha: np.datetime64, corte: np.datetime64, mascara: Optional[np.ndarray] = None
+) -> Dict:
+    """
+    Proyecta las altas de un día a partir de los pacientes hospitalizados al cierre de `corte`.
+
+    Las altas ya registradas después de `corte` no se usan para proyectar; solo se
+    informan en `altas_registradas` para contrastar la proyección.
+
+    Args:
+        store (PacientesStore): Datos de pacientes
+        fecha (np.datetime64): Día a proyectar
+        corte (np.datetime64): Último día con información conocida
+        mascara (Optional[np.ndarray]): Si se indica, solo se consideran las filas marcadas
+
+    Returns:
+        Dict: Altas esperadas, total y por servicio, con un intervalo aproximado del 90%
+    """
+    fin = store.fin_estancia
+    hospitalizadas = (store.fecha_entrada <= corte) & (np.isnat(fin) | (fin > corte))
+    if mascara is not None:
+        hospitalizadas &= mascara
+    hospitalizados = np.flatnonzero(hospitalizadas)
+    entrada = store.fecha_entrada[hospitalizados]
+    probabilidades = store.distribuciones_estancia.probabilidad_alta(
+        store.enfermedad.codigos[hospitalizados],
+        store.servicio.codigos[hospitalizados],
+        (corte - entrada).astype(np.int64),
+        (fecha - entrada).astype(np.int64)
+    )
+
+    esperadas = float(probabilidades.sum())
+    margen = 1.645 * float(np.sqrt((probabilidades * (1 - probabilidades)).sum()))
+    claves, grupo_de_codigo = store.servicio.grupos()
+    etiquetas = store.servicio.etiquetas_grupos()
+    por_grupo = np.bincount(grupo_de_codigo[store.servicio.codigos[hospitalizados]], weights=probabilidades, minlength=len(claves))
+    return {
+        "fecha": str(fecha),
+        "corte": str(corte),
+        "pacientes_hospitalizados": int(len(hospitalizados)),
+        "altas_proyectadas": round(esperadas, 2),
+        "intervalo_90": [round(max(esperadas - margen, 0.0), 2), round(esperadas + margen, 2)],
+        "altas_registradas": int((fin[hospitalizados] == fecha).sum()),
+        "por_servicio": {
+            (etiquetas[g] or "sin servicio"): round(float(por_grupo[g]), 2)
+            for g in range(len(claves)) if por_grupo[g] > 0
+        }
+    }
+
+# ======================================================
+# CONSULTAS COMPUESTAS
+# ======================================================
+
+# Si el predicado más selectivo deja menos de 1/FRACCION_SONDEO de las filas,
+# los demás se verifican solo sobre esos candidatos; si no, se cruzan máscaras
+FRACCION_SONDEO = 8
+
+
+class Predicado(ABC):
+    """
+    Condición de una consulta compuesta.
+
+    Cada predicado sabe estimar cuántas filas cumple (barato), obtener esas
+    filas, verificarse sobre un conjunto de candidatos y generar su máscara
+    de bits sobre todas las filas.
+    """
+
+    descripcion = ''
+    estimacion = 0
+
+    @abstractmethod
+    def filas(self) -> np.ndarray:
+        """Filas que cumplen el predicado, en orden ascendente."""
+
+    @abstractmethod
+    def probar(self, filas: np.ndarray) -> np.ndarray:
+        """Máscara booleana de cuáles de `filas` cumplen el predicado."""
+
+    @abstractmethod
+    def mascara(self) -> np.ndarray:
+        """Máscara booleana sobre todas las filas del almacén."""
+
+
+class PredicadoCategoria(Predicado):
+    """Valor de una columna categórica que contiene un texto."""
+
+    def __init__(self, nombre: str, columna: ColumnaCategorica, texto: str):
+        self.descripcion = f"{nombre} contiene '{texto}'"
+        self.columna = columna
+        self.codigos = columna.buscar(texto)
+        self.estimacion = columna.contar(self.codigos)
+        # La última posición atiende el código -1 (vacío)
+        self.permitidos = np.zeros(len(columna.categorias) + 1, dtype=bool)
+        self.permitidos[self.codigos] = True
+
+    def filas(self) -> np.ndarray:
+        return self.columna.filas(self.codigos)
+
+    def probar(self, filas: np.ndarray) -> np.ndarray:
+        return self.permitidos[self.columna.codigos[filas]]
+
+    def mascara(self) -> np.ndarray:
+        return self.permitidos[self.columna.codigos]
+
+
+class PredicadoRango(Predicado):
+    """Valor numérico dentro de [minimo, maximo], resuelto con un índice ordenado."""
+
+    def __init__(self, descripcion: str, valores: np.ndarray, indice: IndiceOrdenado,
+                 minimo: Optional[float], maximo: Optional[float]):
+        self.descripcion = descripcion
+        self.valores = valores
+        self.indice = indice
+        self.minimo = -np.inf if minimo is None else minimo
+        self.maximo = np.inf if maximo is None else maximo
+        self.estimacion = indice.contar(minimo, maximo)
+
+    def filas(self) -> np.ndarray:
+        return self.indice.filas(self.minimo, self.maximo)
+
+    def probar(self, filas: np.ndarray) -> np.ndarray:
+        valores = self.valores[filas]
+        return (valores >= self.minimo) & (valores <= self.maximo)
+
+    def mascara(self) -> np.ndarray:
+        return (self.valores >= self.minimo) & (self.valores <= self.maximo)
+
+
+class PredicadoId(Predicado):
+    """Id exacto, resuelto con el índice hash (incluye ids duplicados)."""
+
+    def __init__(self, store: 'PacientesStore', id: str):
+        self.descripcion = f"id = '{id}'"
+        self.total = len(store)
+        if id in store.indice_id.duplicados:
+            self.coincidencias = np.sort(np.asarray(store.indice_id.duplicados[id], dtype=np.int64))
+        else:
+            fila = store.indice_id.buscar(id)
+            self.coincidencias = np.array([] if fila is None else [fila], dtype=np.int64)
+        self.estimacion = len(self.coincidencias)
+
+    def filas(self) -> np.ndarray:
+        return self.coincidencias
+
+    def probar(self, filas: np.ndarray) -> np.ndarray:
+        return np.isin(filas, self.coincidencias)
+
+    def mascara(self) -> np.ndarray:
+        mascara = np.zeros(self.total, dtype=bool)
+        mascara[self.coincidencias] = True
+        return mascara
+
+
+def describir_rango(nombre: str, minimo, maximo) -> str:
+    """Texto de un predicado de rango para el plan ("edad >= 60", "estancia entre 3 y 7")."""
+    if minimo is None:
+        return f"{nombre} <= {maximo}"
+    if maximo is None:
+        return f"{nombre} >= {minimo}"
+    return f"{nombre} entre {minimo} y {maximo}"
+
+
+def ejecutar_consulta(total: int, predicados: List[Predicado]) -> Tuple[np.ndarray, Dict]:
+    """
+    Evalúa la conjunción de los predicados empezando por el más selectivo.
+
+    Si el primero deja pocas filas, los demás solo se verifican sobre esos
+    candidatos (sondeo); si no, se cruzan las máscaras de bits de todos, en
+    orden de selectividad y cortando apenas el resultado queda vacío.
+
+    Args:
+        total (int): Cantidad de filas del almacén
+        predicados (List[Predicado]): Condiciones de la consulta
+
+    Returns:
+        Tuple[np.ndarray, Dict]: Filas resultantes en orden ascendente y el plan
+        con las estimaciones y las filas que quedaron tras cada paso
+    """
+    orden = sorted(predicados, key=lambda p: p.estimacion)
+    primero = orden[0]
+    estrategia = 'sondeo' if primero.estimacion * FRACCION_SONDEO <= total else 'mapa_de_bits'
+    pasos = []
+
+    if estrategia == 'sondeo':
+        filas = primero.filas()
+        escaneadas = len(filas)
+        pasos.append({"predicado": primero.descripcion, "estimacion": primero.estimacion, "filas": len(filas)})
+        for predicado in orden[1:]:
+            if len(filas):
+                escaneadas += len(filas)
+                filas = filas[predicado.probar(filas)]
+            pasos.append({"predicado": predicado.descripcion, "estimacion": predicado.estimacion, "filas": len(filas)})
+    else:
+        mascara = None
+        escaneadas = 0
+        for predicado in orden:
+            if mascara is None or mascara.any():
+                escaneadas += total
+                mascara = predicado.mascara() if mascara is None else mascara & predicado.mascara()
+            pasos.append({"predicado": predicado.descripcion, "estimacion": predicado.estimacion, "filas": int(mascara.sum())})
+        filas = np.flatnonzero(mascara)
+
+    contar_filas(escaneadas=escaneadas)
+    return filas, {"estrategia": estrategia, "pasos": pasos}
+
+# ======================================================
+# SNAPSHOT BINARIO DEL DATASET
+# ======================================================
+
+# Ruta del CSV de origen; el snapshot se guarda a su lado
+RUTA_CSV = os.getenv("RUTA_CSV", "Dataset/Dataset_Pacientes_LOS.csv")
+USAR_SNAPSHOT = os.getenv("USAR_SNAPSHOT", "1") == "1"
+
+# Formato: cabecera mágica + longitud (uint64) + cabecera JSON, y luego cada
+# arreglo alineado a ALINEACION_SNAPSHOT bytes para poder mapearlo sin copias
+MAGIA_SNAPSHOT = b'PACSNAP\x00'
+VERSION_SNAPSHOT = 3
+ALINEACION_SNAPSHOT = 64
+
+
+def ruta_snapshot(ruta_csv: str) -> str:
+    """Devuelve la ruta del snapshot asociado a un CSV."""
+    return ruta_csv + '.snapshot'
+
+
+# Bytes del final del tramo leído que se comparan para confirmar que el CSV
+# solo creció (y no fue reescrito) antes de leer únicamente lo agregado
+BYTES_MUESTRA = 4096
+
+
+class ArchivoAcotado(io.RawIOBase):
+    """Vista de lectura de un archivo binario limitada a un número de bytes."""
+
+    def __init__(self, archivo, limite: int):
+        self.archivo = archivo
+        self.restante = limite
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, destino) -> int:
+        datos = self.archivo.read(min(len(destino), self.restante))
+        destino[:len(datos)] = datos
+        self.restante -= len(datos)
+        return len(datos)
+
+
+def muestra_csv(ruta_csv: str, tamano: int) -> Tuple[str, bool]:
+    """
+    Resume los últimos BYTES_MUESTRA bytes del tramo [0, tamano) del CSV.
+
+    Returns:
+        Tuple[str, bool]: SHA-256 de la muestra y si el tramo termina en salto de línea
+    """
+    with open(ruta_csv, 'rb') as archivo:
+        archivo.seek(max(tamano - BYTES_MUESTRA, 0))
+        muestra = archivo.read(min(tamano, BYTES_MUESTRA))
+    return hashlib.sha256(muestra).hexdigest(), muestra.endswith(b'\n')
+
+
+def huella_csv(ruta_csv: str, tamano: Optional[int] = None, con_checksum: bool = True) -> Dict:
+    """
+    Identifica el tramo [0, tamano) del CSV que refleja un almacén.
+
+    Args:
+        ruta_csv (str): Ruta del CSV
+        tamano (Optional[int]): Bytes leídos; por defecto, el tamaño actual
+        con_checksum (bool): Si se calcula el SHA-256 de todo el tramo
+
+    Returns:
+        Dict: Huella con 'tamano', 'mtime_ns', 'muestra', 'termina_en_linea' y,
+        opcionalmente, 'sha256'
+    """
+    estado = os.stat(ruta_csv)
+    tamano = estado.st_size if tamano is None else tamano
+    muestra, termina_en_linea = muestra_csv(ruta_csv, tamano)
+    huella = {'tamano': tamano, 'mtime_ns': estado.st_mtime_ns, 'muestra': muestra, 'termina_en_linea': termina_en_linea}
+    if con_checksum:
+        sha = hashlib.sha256()
+        with open(ruta_csv, 'rb') as archivo:
+            lector = ArchivoAcotado(archivo, tamano)
+            for bloque in iter(lambda: lector.read(1 << 20), b''):
+                sha.update(bloque)
+        huella['sha256'] = sha.hexdigest()
+    return huella
+
+
+def comparar_csv(huella: Dict, ruta_csv: str) -> str:
+    """
+    Compara el CSV actual con la huella del tramo ya cargado.
+
+    Returns:
+        str: 'igual' si no cambió, 'agregado' si solo se le agregaron bytes al
+        final y 'distinto' en cualquier otro caso
+    """
+    estado = os.stat(ruta_csv)
+    if estado.st_size == huella['tamano']:
+        if estado.st_mtime_ns == huella['mtime_ns']:
+            return 'igual'
+        if 'sha256' in huella and huella_csv(ruta_csv)['sha256'] == huella['sha256']:
+            return 'igual'
+        return 'distinto'
+    if (
+        estado.st_size > huella['tamano']
+        and huella.get('termina_en_linea')
+        and muestra_csv(ruta_csv, huella['tamano'])[0] == huella['muestra']
+    ):
+        return 'agregado'
+    return 'distinto'
+
+
+def escribir_snapshot(store: PacientesStore, ruta: str, huella: Dict) -> None:
+    """
+    Escribe el snapshot binario del almacén.
+
+    Se escribe en un archivo temporal y se renombra al final, de modo que otro
+    proceso nunca lee un snapshot a medio escribir.
+
+    Args:
+        store (PacientesStore): Almacén a guardar
+        ruta (str): Ruta de destino del snapshot
+        huella (Dict): Huella del CSV en el momento de la carga
+    """
+    arreglos, metadatos = store.columnas()
+    arreglos = {nombre: np.ascontiguousarray(a) for nombre, a in arreglos.items()}
+
+    # Primero se calculan los desplazamientos relativos al inicio de los datos
+    descriptores = {}
+    desplazamiento = 0
+    for nombre, arreglo in arreglos.items():
+        descriptores[nombre] = {'dtype': arreglo.dtype.str, 'forma': list(arreglo.shape), 'desplazamiento': desplazamiento}
+        desplazamiento += -(-arreglo.nbytes // ALINEACION_SNAPSHOT) * ALINEACION_SNAPSHOT
+
+    cabecera = json.dumps({
+        'version': VERSION_SNAPSHOT,
+        'csv': huella,
+        'filas': len(store),
+        'generacion': store.generacion,
+        'arreglos': descriptores,
+        **metadatos
+    }, ensure_ascii=False).encode('utf-8')
+    inicio_datos = -(-(len(MAGIA_SNAPSHOT) + 8 + len(cabecera)) // ALINEACION_SNAPSHOT) * ALINEACION_SNAPSHOT
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(MAGIA_SNAPSHOT)
+        archivo.write(np.uint64(len(cabecera)).tobytes())
+        archivo.write(cabecera)
+        for nombre, arreglo in arreglos.items():
+            archivo.seek(inicio_datos + descriptores[nombre]['desplazamiento'])
+            archivo.write(arreglo.tobytes())
+        archivo.truncate(inicio_datos + desplazamiento)
+    os.replace(temporal, ruta)
+
+
+def abrir_snapshot(ruta: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Mapea un snapshot en memoria y devuelve vistas de solo lectura de sus arreglos.
+
+    Args:
+        ruta (str): Ruta del snapshot
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict]: Arreglos (sin copiar) y cabecera
+
+    Raises:
+        ValueError: Si el archivo no es un snapshot de una versión compatible
+    """
+    mapa = np.memmap(ruta, dtype=np.uint8, mode='r')
+    if bytes(mapa[:len(MAGIA_SNAPSHOT)]) != MAGIA_SNAPSHOT:
+        raise ValueError("El archivo no es un snapshot de pacientes")
+    largo = int(mapa[len(MAGIA_SNAPSHOT):len(MAGIA_SNAPSHOT) + 8].view(np.uint64)[0])
+    inicio_cabecera = len(MAGIA_SNAPSHOT) + 8
+    cabecera = json.loads(bytes(mapa[inicio_cabecera:inicio_cabecera + largo]).decode('utf-8'))
+    if cabecera.get('version') != VERSION_SNAPSHOT:
+        raise ValueError(f"Versión de snapshot no soportada: {cabecera.get('version')}")
+
+    inicio_datos = -(-(inicio_cabecera + largo) // ALINEACION_SNAPSHOT) * ALINEACION_SNAPSHOT
+    arreglos = {}
+    for nombre, descriptor in cabecera['arreglos'].items():
+        dtype = np.dtype(descriptor['dtype'])
+        cantidad = int(np.prod(descriptor['forma'], dtype=np.int64))
+        inicio = inicio_datos + descriptor['desplazamiento']
+        arreglos[nombre] = np.frombuffer(mapa, dtype=dtype, count=cantidad, offset=inicio).reshape(descriptor['forma'])
+    return arreglos, cabecera
+
+
+def leer_snapshot(ruta_csv: str) -> Optional[PacientesStore]:
+    """
+    Carga el almacén desde el snapshot si sigue correspondiendo al CSV.
+
+    El snapshot es válido si el CSV conserva tamaño y fecha de modificación o,
+    si la fecha cambió, cuando su checksum sigue siendo el mismo. También se
+    usa si el CSV solo creció; las filas agregadas se leen después.
+
+    Args:
+        ruta_csv (str): Ruta del CSV de origen
+
+    Returns:
+        Optional[PacientesStore]: Almacén mapeado en memoria o None si hay que
+        reconstruirlo desde el CSV
+    """
+    ruta = ruta_snapshot(ruta_csv)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        arreglos, cabecera = abrir_snapshot(ruta)
+    except (ValueError, OSError, KeyError) as e:
+        logger.warning("Snapshot descartado (%s): %s", ruta, e)
+        return None
+
+    if comparar_csv(cabecera['csv'], ruta_csv) == 'distinto':
+        return None
+    return PacientesStore.desde_columnas(arreglos, cabecera)
+
+# ======================================================
+# DATOS COMPARTIDOS ENTRE WORKERS
+# ======================================================
+
+# MODO_DATOS='local' (por defecto): cada proceso carga su propio almacén.
+# MODO_DATOS='compartido': un proceso cargador publica cada generación del
+# dataset como snapshot (python main.py --publicar) y los workers de uvicorn la
+# mapean en memoria de solo lectura, así el sistema operativo comparte las
+# mismas páginas entre todos los procesos en lugar de tener N copias.
+MODO_DATOS = os.getenv("MODO_DATOS", "local")
+
+# Archivo puntero con la generación vigente; se reemplaza de forma atómica
+RUTA_GENERACION = RUTA_CSV + '.generacion'
+
+# Generaciones anteriores que se conservan para los workers que aún no cambiaron
+GENERACIONES_CONSERVADAS = 1
+
+_mtime_puntero: Optional[int] = None
+_generacion_lock = threading.Lock()
+
+
+def ruta_snapshot_generacion(generacion: int) -> str:
+    """Devuelve la ruta del snapshot de una generación publicada."""
+    return f"{RUTA_CSV}.gen{generacion:06d}.snapshot"
+
+
+def leer_puntero_generacion() -> Optional[Dict]:
+    """Lee el puntero de generación vigente o devuelve None si no hay ninguna publicada."""
+    try:
+        with open(RUTA_GENERACION, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def publicar_generacion(store: PacientesStore, huella: Optional[Dict] = None) -> int:
+    """
+    Publica el almacén como una nueva generación compartida.
+
+    Escribe el snapshot de la generación y después reemplaza el puntero de
+    forma atómica, de modo que cada worker ve la generación anterior completa
+    o la nueva completa, nunca una mezcla.
+
+    Args:
+        store (PacientesStore): Almacén a publicar
+        huella (Optional[Dict]): Huella del CSV de origen
+
+    Returns:
+        int: Número de la generación publicada
+    """
+    puntero = leer_puntero_generacion()
+    generacion = puntero['generacion'] + 1 if puntero else 1
+    store.generacion = generacion
+    ruta = ruta_snapshot_generacion(generacion)
+    escribir_snapshot(store, ruta, huella or store.huella or huella_csv(RUTA_CSV))
+
+    temporal = f"{RUTA_GENERACION}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump({'generacion': generacion, 'snapshot': os.path.basename(ruta)}, archivo)
+    os.replace(temporal, RUTA_GENERACION)
+
+    # Los workers que aún mapean un snapshot borrado lo siguen leyendo sin problema
+    for anterior in range(1, generacion - GENERACIONES_CONSERVADAS):
+        try:
+            os.remove(ruta_snapshot_generacion(anterior))
+        except FileNotFoundError:
+            pass
+    logger.info("Generación %d publicada (%d pacientes)", generacion, len(store))
+    return generacion
+
+
+def adjuntar_generacion() -> PacientesStore:
+    """
+    Mapea en memoria la generación publicada vigente.
+
+    Returns:
+        PacientesStore: Almacén de solo lectura respaldado por el snapshot compartido
+
+    Raises:
+        RuntimeError: Si todavía no se publicó ninguna generación
+    """
+    global _mtime_puntero
+    mtime = os.stat(RUTA_GENERACION).st_mtime_ns if os.path.exists(RUTA_GENERACION) else None
+    puntero = leer_puntero_generacion()
+    if puntero is None:
+        raise RuntimeError("No hay ninguna generación publicada; ejecute: python main.py --publicar")
+    arreglos, cabecera = abrir_snapshot(os.path.join(os.path.dirname(RUTA_GENERACION), puntero['snapshot']))
+    _mtime_puntero = mtime
+    return PacientesStore.desde_columnas(arreglos, cabecera)
+
+
+def sincronizar_generacion() -> None:
+    """
+    Cambia al almacén de la generación vigente si el puntero cambió.
+
+    Cuesta un stat() por llamada mientras la generación no cambia; el cambio de
+    almacén es una sola asignación, así que cada petición trabaja con una
+    generación completa.
+    """
+    global pacientes_store
+    try:
+        mtime = os.stat(RUTA_GENERACION).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _mtime_puntero:
+        return
+    with _generacion_lock:
+        if mtime == _mtime_puntero:
+            return
+        try:
+            store = adjuntar_generacion()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("No se pudo adjuntar la nueva generación: %s", e)
+            return
+        if store.generacion != pacientes_store.generacion:
+            pacientes_store = store
+            logger.info("Worker %d usando la generación %d", os.getpid(), store.generacion)
+
+# ======================================================
+# CARGA Y PREPARACIÓN DE DATOS
+# ======================================================
+
+# Opciones de lectura comunes para el CSV completo y para los tramos agregados
+OPCIONES_CSV = {
+    'delimiter': ";",
+    'quotechar': '"',
+    'on_bad_lines': "skip",
+    'usecols': COLUMNAS_CSV,
+    'dtype': {'id': str, 'Genero': 'category', 'Enfermedad': 'category', 'Servicio': 'category', 'Edad': 'category'}
+}
+
+
+def leer_csv_completo(ruta_csv: str) -> PacientesStore:
+    """
+    Lee el CSV completo y construye el almacén.
+
+    Solo se leen los bytes presentes al empezar, de modo que la huella coincide
+    exactamente con lo cargado aunque el archivo siga creciendo.
+    """
+    huella = huella_csv(ruta_csv)
+    with open(ruta_csv, 'rb') as archivo:
+        df = pd.read_csv(io.BufferedReader(ArchivoAcotado(archivo, huella['tamano'])), **OPCIONES_CSV)
+    store = construir_store(df)
+    store.huella = huella
+    return store
+
+
+def leer_filas_agregadas(ruta_csv: str, desde: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Lee solo las líneas completas agregadas al CSV a partir del byte `desde`.
+
+    Args:
+        ruta_csv (str): Ruta del CSV
+        desde (int): Byte donde termina el tramo ya cargado
+
+    Returns:
+        Tuple[pd.DataFrame, int]: Filas nuevas y byte donde terminan; una línea
+        final incompleta se deja para la próxima lectura
+    """
+    encabezado = pd.read_csv(ruta_csv, delimiter=";", nrows=0).columns.tolist()
+    with open(ruta_csv, 'rb') as archivo:
+        archivo.seek(desde)
+        datos = archivo.read()
+    fin = datos.rfind(b'\n') + 1
+    if not fin:
+        return pd.DataFrame(columns=COLUMNAS_CSV), desde
+    df = pd.read_csv(io.BytesIO(datos[:fin]), header=None, names=encabezado, **OPCIONES_CSV)
+    return df, desde + fin
+
+
+def actualizar_store(store: PacientesStore, ruta_csv: str) -> Optional[PacientesStore]:
+    """
+    Construye la siguiente generación del almacén si el CSV cambió.
+
+    Si el CSV solo creció se leen únicamente los bytes agregados; si fue
+    modificado de otra forma se reconstruye todo.
+
+    Args:
+        store (PacientesStore): Almacén vigente
+        ruta_csv (str): Ruta del CSV
+
+    Returns:
+        Optional[PacientesStore]: Nuevo almacén o None si no hay cambios
+    """
+    cambio = comparar_csv(store.huella, ruta_csv)
+    if cambio == 'igual':
+        # El checksum confirmó que el contenido no cambió; se actualiza la fecha
+        store.huella['mtime_ns'] = os.stat(ruta_csv).st_mtime_ns
+        return None
+
+    if cambio == 'agregado':
+        df, fin = leer_filas_agregadas(ruta_csv, store.huella['tamano'])
+        if fin == store.huella['tamano']:
+            return None
+        nuevo = store.extender(df)
+        nuevo.huella = huella_csv(ruta_csv, fin, con_checksum=False)
+    else:
+        nuevo = leer_csv_completo(ruta_csv)
+    nuevo.generacion = store.generacion + 1
+    return nuevo
+
+
+def guardar_snapshot(store: PacientesStore) -> None:
+    """Escribe el snapshot del almacén junto al CSV si está habilitado."""
+    if not USAR_SNAPSHOT:
+        return
+    try:
+        escribir_snapshot(store, ruta_snapshot(RUTA_CSV), store.huella)
+    except OSError as e:
+        logger.warning("No se pudo escribir el snapshot: %s", e)
+
+
+def load_pacientes() -> PacientesStore:
+    """
+    Carga y prepara los datos de pacientes desde un archivo CSV.
+
+    Si existe un snapshot binario vigente del CSV se mapea en memoria sin volver
+    a parsear el archivo (si el CSV solo creció, se leen únicamente las filas
+    agregadas); en caso contrario se lee el CSV y se escribe el snapshot para
+    los siguientes arranques.
+
+    Returns:
+        PacientesStore: Almacén columnar con la información de pacientes
+    """
+    try:
+        inicio = time.perf_counter()
+        store = leer_snapshot(RUTA_CSV) if USAR_SNAPSHOT else None
+        if store is not None:
+            nuevo = actualizar_store(store, RUTA_CSV)
+            if nuevo is not None:
+                store = nuevo
+                guardar_snapshot(store)
+        else:
+            store = leer_csv_completo(RUTA_CSV)
+            guardar_snapshot(store)
+        store.generacion = max(store.generacion, 1)
+        METRICAS.observar_carga("carga", time.perf_counter() - inicio)
+        return store
+
+    except Exception as e:
+        raise RuntimeError(f"Error cargando datos: {str(e)}")
+
+# Cargar datos al iniciar la aplicación; en modo compartido los workers se
+# adjuntan a la generación publicada (el propio cargador siempre lee el CSV)
+if MODO_DATOS == "compartido" and __name__ != "__main__":
+    pacientes_store: PacientesStore = adjuntar_generacion()
+else:
+    pacientes_store: PacientesStore = load_pacientes()
+
+# ======================================================
+# RECARGA EN CALIENTE DEL CSV
+# ======================================================
+
+# RECARGA_AUTOMATICA=1 activa un hilo que revisa el CSV cada INTERVALO_RECARGA_S
+# segundos y publica la nueva generación sin reiniciar el proceso
+RECARGA_AUTOMATICA = os.getenv("RECARGA_AUTOMATICA", "0") == "1"
+INTERVALO_RECARGA_S = float(os.getenv("INTERVALO_RECARGA_S", "5"))
+
+_recarga_lock = threading.Lock()
+
+# Almacén fijado para la petición en curso (ver obtener_store)
+_store_peticion: ContextVar[Optional[PacientesStore]] = ContextVar('store_peticion', default=None)
+
+
+def obtener_store() -> PacientesStore:
+    """
+    Devuelve el almacén con el que debe trabajar la petición actual.
+
+    Cada petición fija la generación vigente al empezar, así que aunque se
+    publique una recarga a mitad de la petición, toda ella ve el mismo almacén.
+    """
+    store = _store_peticion.get()
+    return pacientes_store if store is None else store
+
+
+def recargar_pacientes() -> bool:
+    """
+    Revisa el CSV y, si cambió, reemplaza el almacén por la nueva generación.
+
+    El nuevo almacén se construye completo (datos e índices) antes de
+    reemplazar la referencia global con una sola asignación.
+
+    Returns:
+        bool: True si se publicó una nueva generación
+    """
+    global pacientes_store
+    with _recarga_lock:
+        inicio = time.perf_counter()
+        nuevo = actualizar_store(pacientes_store, RUTA_CSV)
+        if nuevo is None:
+            return False
+        if nuevo.seq_diario < pacientes_store.seq_diario:
+            # Reconstruido desde el CSV: faltan las escrituras aún no compactadas
+            nuevo = reaplicar_diario(nuevo)
+        filas_nuevas = len(nuevo) - len(pacientes_store)
+        pacientes_store = nuevo
+        METRICAS.observar_carga("recarga", time.perf_counter() - inicio)
+        logger.info(
+            "Generación %d cargada en %.0f ms (%d pacientes, %+d filas)",
+            nuevo.generacion, (time.perf_counter() - inicio) * 1000, len(nuevo), filas_nuevas
+        )
+    guardar_snapshot(nuevo)
+    return True
+
+
+def vigilar_csv(intervalo: float, al_recargar=None) -> None:
+    """
+    Bucle del vigilante: recarga el CSV cada vez que cambia.
+
+    Args:
+        intervalo (float): Segundos entre revisiones
+        al_recargar: Función opcional que recibe cada nuevo almacén
+    """
+    while True:
+        time.sleep(intervalo)
+        try:
+            if recargar_pacientes() and al_recargar is not None:
+                al_recargar(pacientes_store)
+        except Exception:
+            logger.exception("Error recargando el CSV de pacientes")
+
+
+def iniciar_vigilante(intervalo: float = INTERVALO_RECARGA_S, al_recargar=None) -> threading.Thread:
+    """Inicia el vigilante del CSV en un hilo en segundo plano."""
+    hilo = threading.Thread(target=vigilar_csv, args=(intervalo, al_recargar), name="vigilante-csv", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def filtrar_por_texto(columna: ColumnaCategorica, texto: str) -> np.ndarray:
+    """
+    Devuelve las filas cuyo valor contiene `texto`, sin distinguir mayúsculas
+    ni tildes ("pediatria" encuentra "Pediatría").
+
+    Args:
+        columna (ColumnaCategorica): Columna donde buscar
+        texto (str): Subcadena a buscar
+
+    Returns:
+        np.ndarray: Índices de las filas coincidentes
+    """
+    filas = columna.filas(columna.buscar(texto))
+    # El índice solo toca las filas de las categorías coincidentes
+    contar_filas(escaneadas=len(filas))
+    return filas
+
+
+# Ediciones admitidas por omisión en las búsquedas aproximadas: una para
+# textos cortos (donde dos cambian demasiado la palabra) y dos para el resto
+MAX_EDICIONES_FUZZY = 2
+LARGO_MINIMO_DOS_EDICIONES = 6
+
+
+def ediciones_por_omision(texto: str) -> int:
+    """Ediciones admitidas al buscar `texto` de forma aproximada si no se indican."""
+    return MAX_EDICIONES_FUZZY if len(texto.strip()) >= LARGO_MINIMO_DOS_EDICIONES else 1
+
+
+def filtrar_aproximado(columna: ColumnaCategorica, texto: str, max_ediciones: int) -> Tuple[np.ndarray, List[Tuple[str, int, List[int]]]]:
+    """
+    Como filtrar_por_texto, pero tolera errores de tipeo ("palustosiss").
+
+    Returns:
+        Tuple[np.ndarray, List]: Filas coincidentes y valores encontrados
+        (ver ColumnaCategorica.buscar_aproximado)
+    """
+    coincidencias = columna.buscar_aproximado(texto, max_ediciones)
+    filas = columna.filas(sorted(c for _, _, codigos in coincidencias for c in codigos))
+    contar_filas(escaneadas=len(filas))
+    return filas, coincidencias
+
+
+def describir_coincidencias(coincidencias: List[Tuple[str, int, List[int]]]) -> str:
+    """Valor de la cabecera X-Coincidencias: "palustosis=0, paludismo=2"."""
+    return ', '.join(f"{clave}={distancia}" for clave, distancia, _ in coincidencias)
+
+
+# ======================================================
+# ESCRITURAS: ADMISIONES Y ALTAS
+# ======================================================
+
+# Diario append-only (una línea JSON por escritura) junto al CSV
+RUTA_DIARIO = os.getenv("RUTA_DIARIO", RUTA_CSV + ".diario")
+# El diario se compacta en el CSV al llegar a UMBRAL_COMPACTACION escrituras
+# o, si hay alguna pendiente, cada INTERVALO_COMPACTACION_S segundos
+UMBRAL_COMPACTACION = int(os.getenv("UMBRAL_COMPACTACION", "10000"))
+INTERVALO_COMPACTACION_S = float(os.getenv("INTERVALO_COMPACTACION_S", "300"))
+
+
+class ErrorEscritura(Exception):
+    """Escritura rechazada; `estado` es el código HTTP con el que se informa."""
+
+    def __init__(self, estado: int, detalle: str):
+        super().__init__(detalle)
+        self.estado = estado
+        self.detalle = detalle
+
+
+def leer_diario(ruta: str) -> List[Dict]:
+    """
+    Lee las entradas de un diario; una última línea incompleta (caída a mitad
+    de una escritura) se descarta.
+    """
+    entradas = []
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            for linea in archivo:
+                try:
+                    entradas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    logger.warning("Entrada incompleta descartada en %s", ruta)
+                    break
+    except FileNotFoundError:
+        pass
+    return entradas
+
+
+def filas_csv(registros: List[Dict]) -> pd.DataFrame:
+    """Convierte filas con las columnas del CSV al mismo DataFrame que produce leer el CSV."""
+    texto = pd.DataFrame(registros, columns=COLUMNAS_CSV).to_csv(sep=';', index=False)
+    return pd.read_csv(io.StringIO(texto), **OPCIONES_CSV)
+
+
+def aplicar_lote(store: PacientesStore, lote: List[Dict], reaplicando: bool = False) -> PacientesStore:
+    """
+    Construye el almacén que resulta de aplicar un lote de entradas del diario.
+
+    Las admisiones se agregan en un solo extender() y las altas en un solo
+    con_altas(), de modo que una ráfaga de escrituras genera una sola
+    generación. Al reaplicar el diario tras un reinicio se omiten las
+    admisiones cuyo id ya está en el almacén, así reaplicar es idempotente.
+
+    Args:
+        store (PacientesStore): Almacén de partida (no se modifica)
+        lote (List[Dict]): Entradas en orden de secuencia
+        reaplicando (bool): True al reaplicar entradas ya confirmadas
+
+    Returns:
+        PacientesStore: Nuevo almacén
+    """
+    admisiones = [e['registro'] for e in lote if e['op'] == 'admision']
+    if reaplicando:
+        admisiones = [r for r in admisiones if store.indice_id.buscar(r['id']) is None]
+    nuevo = store.extender(filas_csv(admisiones)) if admisiones else store
+
+    # Si un id recibe varias altas en el lote, vale la última
+    altas = {e['id']: e for e in lote if e['op'] == 'alta'}
+    altas = {id: e for id, e in altas.items() if nuevo.indice_id.buscar(id) is not None}
+    if altas:
+        filas = np.array([nuevo.indice_id.buscar(id) for id in altas], dtype=np.int64)
+        fechas = convertir_fechas(pd.Series([e['fecha_alta'] for e in altas.values()]))
+        estancias = np.array([e['estancia'] for e in altas.values()], dtype=np.float64)
+        nuevo = nuevo.con_altas(filas, fechas, estancias)
+
+    if nuevo is not store:
+        nuevo.huella = store.huella
+        nuevo.generacion = store.generacion + 1
+    nuevo.seq_diario = max(store.seq_diario, lote[-1]['seq'])
+    return nuevo
+
+
+class DiarioEscrituras:
+    """
+    Diario append-only de admisiones y altas con commit agrupado.
+
+    Cada escritura se valida y encola; el primer hilo que encuentra el diario
+    libre escribe todo lo encolado con un único fsync, aplica el lote en una
+    nueva generación del almacén y despierta a los demás. Las escrituras que
+    llegan mientras tanto forman el lote siguiente. Los lectores nunca toman
+    estos locks: siguen usando el almacén anterior hasta que se publica el
+    nuevo con una sola asignación.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._cond = threading.Condition()
+        self._pendientes: List[Dict] = []
+        self._escribiendo = False
+        self.seq = 0
+        self.sin_compactar = 0
+        # Admisiones confirmadas o en curso que aún no están en el almacén (id -> fecha_entrada)
+        self.admisiones_en_curso: Dict[str, np.datetime64] = {}
+        self.compactar_ahora = threading.Event()
+        self._compactador = None
+        # ((tamaño, mtime_ns), líneas no conservadas) del último CSV revisado
+        self._csv_revisado = None
+
+    def entradas(self) -> List[Dict]:
+        """Entradas guardadas, incluidas las de una compactación interrumpida."""
+        return leer_diario(self.ruta + '.compactando') + leer_diario(self.ruta)
+
+    def recuperar(self, store: PacientesStore) -> PacientesStore:
+        """
+        Al arrancar, aplica sobre `store` las escrituras aún no compactadas y
+        continúa la numeración donde quedó.
+        """
+        entradas = self.entradas()
+        if not entradas:
+            return store
+        logger.info("Reaplicando %d escrituras del diario", len(entradas))
+        self.seq = max(e['seq'] for e in entradas)
+        self.sin_compactar = len(entradas)
+        self.iniciar_compactador()
+        return aplicar_lote(store, entradas, reaplicando=True)
+
+    def confirmar(self, preparar: Callable[[PacientesStore], Dict]) -> Dict:
+        """
+        Valida, guarda en disco y aplica una escritura.
+
+        Args:
+            preparar (Callable): Recibe el almacén más reciente y devuelve la
+                entrada del diario; lanza ErrorEscritura si no es válida
+
+        Returns:
+            Dict: Entrada confirmada, ya persistida y visible para los lectores
+        """
+        with self._cond:
+            # Se valida bajo el lock para que dos escrituras no se contradigan
+            entrada = preparar(pacientes_store)
+            self.seq += 1
+            entrada['seq'] = self.seq
+            if entrada['op'] == 'admision':
+                self.admisiones_en_curso[entrada['registro']['id']] = entrada['_fecha_entrada']
+            self._pendientes.append(entrada)
+
+            while '_confirmada' not in entrada:
+                if self._escribiendo:
+                    self._cond.wait()
+                    continue
+                lote, self._pendientes = self._pendientes, []
+                self._escribiendo = True
+                self._cond.release()
+                try:
+                    self._procesar(lote)
+                    aplicado = True
+                except Exception:
+                    logger.exception("Error confirmando %d escrituras", len(lote))
+                    aplicado = False
+                finally:
+                    self._cond.acquire()
+                    self._escribiendo = False
+                    for e in lote:
+                        if e['op'] == 'admision':
+                            self.admisiones_en_curso.pop(e['registro']['id'], None)
+                        e['_confirmada'] = aplicado
+                    if aplicado:
+                        self.sin_compactar += len(lote)
+                    self._cond.notify_all()
+            if not entrada['_confirmada']:
+                raise ErrorEscritura(500, "No se pudo guardar la escritura en el diario")
+            if self.sin_compactar >= UMBRAL_COMPACTACION:
+                self.compactar_ahora.set()
+        self.iniciar_compactador()
+        return entrada
+
+    def _procesar(self, lote: List[Dict]) -> None:
+        """Escribe el lote con un solo fsync y publica la generación que lo incluye."""
+        global pacientes_store
+        datos = ''.join(json.dumps({k: v for k, v in e.items() if not k.startswith('_')}, ensure_ascii=False) + '\n' for e in lote)
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        inicio = time.perf_counter()
+        with _recarga_lock:
+            # Una recarga completa del CSV pudo reaplicar ya parte del lote
+            lote = [e for e in lote if e['seq'] > pacientes_store.seq_diario]
+            if lote:
+                pacientes_store = aplicar_lote(pacientes_store, lote)
+        METRICAS.observar_carga("escritura", time.perf_counter() - inicio)
+
+    def iniciar_compactador(self) -> None:
+        """Arranca (una sola vez) el hilo que compacta el diario en segundo plano."""
+        with self._cond:
+            if self._compactador is not None:
+                return
+            self._compactador = threading.Thread(target=self._compactar_periodicamente, name="compactador-diario", daemon=True)
+            self._compactador.start()
+
+    def _compactar_periodicamente(self) -> None:
+        while True:
+            self.compactar_ahora.wait(INTERVALO_COMPACTACION_S)
+            self.compactar_ahora.clear()
+            if self.sin_compactar:
+                try:
+                    self.compactar()
+                except Exception:
+                    logger.exception("Error compactando el diario de escrituras")
+
+    def compactar(self) -> None:
+        """
+        Vuelca el almacén al CSV y descarta las entradas ya incluidas.
+
+        El diario se renombra a .compactando en el mismo instante en que se
+        toma el almacén, así las escrituras siguientes van a un diario nuevo y
+        no se detienen mientras se reescribe el CSV. Si el proceso cae a mitad,
+        .compactando se reaplica al arrancar (reaplicar es idempotente) y la
+        compactación siguiente lo incluye aunque todavía no exista un diario.
+
+        El CSV se reescribe desde el almacén, así que cualquier línea que no
+        vuelva idéntica (ver lineas_no_conservadas: líneas descartadas, campos
+        de más, fechas o números con otro formato) se perdería o cambiaría. Si
+        el CSV tiene alguna, no se compacta: se registra cuántas son y el
+        diario sigue creciendo hasta que se corrija el archivo. Tampoco se reemplaza un CSV
+        que cambió desde que se cargó el almacén.
+        """
+        global pacientes_store
+        estado_csv = os.stat(RUTA_CSV)
+        firma_csv = (estado_csv.st_size, estado_csv.st_mtime_ns)
+        if self._csv_revisado is None or self._csv_revisado[0] != firma_csv:
+            self._csv_revisado = (firma_csv, lineas_no_conservadas(RUTA_CSV))
+        perdidas = self._csv_revisado[1]
+        if perdidas:
+            logger.warning(
+                "No se compacta el diario: %d líneas de %s no se conservarían al reescribirlo",
+                perdidas, RUTA_CSV,
+            )
+            return
+
+        with self._cond:
+            while self._escribiendo:
+                self._cond.wait()
+            store = pacientes_store
+            compactando = self.ruta + '.compactando'
+            if os.path.exists(self.ruta):
+                if not os.path.exists(compactando):
+                    os.replace(self.ruta, compactando)
+                else:
+                    # Quedó una compactación interrumpida: se suman ambas
+                    with open(self.ruta, 'rb') as origen, open(compactando, 'ab') as destino:
+                        destino.write(origen.read())
+                        destino.flush()
+                        os.fsync(destino.fileno())
+                    os.remove(self.ruta)
+            self.sin_compactar = 0
+            if not os.path.exists(compactando):
+                return
+
+        inicio = time.perf_counter()
+        temporal = RUTA_CSV + '.compactando.tmp'
+        escribir_csv(store, temporal)
+        with _recarga_lock:
+            if store.huella is not None and comparar_csv(store.huella, RUTA_CSV) != 'igual':
+                # Alguien modificó el CSV mientras tanto: .compactando queda para la próxima
+                os.remove(temporal)
+                logger.warning("No se compacta el diario: %s cambió durante la compactación", RUTA_CSV)
+                return
+            os.replace(temporal, RUTA_CSV)
+            huella = huella_csv(RUTA_CSV)
+            # El CSV ahora contiene todo lo anterior a la compactación
+            pacientes_store.huella = huella
+            store.huella = huella
+            # El CSV recién escrito sale de generar_csv: se conserva completo
+            self._csv_revisado = ((huella['tamano'], huella['mtime_ns']), 0)
+        guardar_snapshot(store)
+        os.remove(compactando)
+        METRICAS.observar_carga("compactacion", time.perf_counter() - inicio)
+        logger.info("Diario compactado en %s (%d pacientes)", RUTA_CSV, len(store))
+
+
+def lineas_no_conservadas(ruta_csv: str) -> int:
+    """
+    Cuenta las líneas del CSV que no volverían idénticas al reescribirlo desde el almacén.
+
+    El CSV se carga igual que al arrancar y se regenera con generar_csv, y las
+    líneas se comparan byte a byte: cuenta cualquier campo que cambiaría, sea
+    una línea descartada por mal formada, campos de más, una fecha que no sigue
+    FORMATO_FECHA ("2020-01-15" quedaría vacía) o que cambia de relleno
+    ("3/4/2020" pasaría a "3/04/2020"), o un número escrito de otra forma. Solo
+    se ignoran el fin de línea y las líneas vacías. Como la comparación es por
+    posición, una línea descartada hace contar también todas las siguientes.
+
+    Returns:
+        int: cantidad de líneas que se perderían o modificarían
+    """
+    store = construir_store(pd.read_csv(ruta_csv, **OPCIONES_CSV))
+    generadas = (
+        linea
+        for bloque in generar_csv(store, np.arange(len(store)))
+        for linea in bloque.split('\n')[:-1]
+    )
+    with open(ruta_csv, encoding='utf-8', newline='') as archivo:
+        originales = (linea.rstrip('\r\n') for linea in archivo)
+        return sum(
+            original != generada
+            for original, generada in itertools.zip_longest((l for l in originales if l), generadas)
+        )
+
+
+def escribir_csv(store: PacientesStore, ruta: str) -> None:
+    """Escribe el almacén completo con el formato del CSV original y lo sincroniza a disco."""
+    with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+        for bloque in generar_csv(store, np.arange(len(store))):
+            archivo.write(bloque)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+
+diario = DiarioEscrituras(RUTA_DIARIO)
+
+
+def reaplicar_diario(store: PacientesStore) -> PacientesStore:
+    """Aplica sobre `store` las escrituras del diario que aún no se compactaron."""
+    entradas = diario.entradas()
+    return aplicar_lote(store, entradas, reaplicando=True) if entradas else store
+
+
+def fecha_entrada_de(store: PacientesStore, id: str) -> np.datetime64:
+    """
+    Fecha de entrada de un paciente existente o con admisión en curso.
+
+    Raises:
+        ErrorEscritura: 404 si el id no existe, 409 si está duplicado
+    """
+    if id in store.indice_id.duplicados:
+        raise ErrorEscritura(409, f"El id '{id}' está duplicado en el dataset")
+    fila = store.indice_id.buscar(id)
+    if fila is not None:
+        return store.fecha_entrada[fila]
+    if id in diario.admisiones_en_curso:
+        return diario.admisiones_en_curso[id]
+    raise ErrorEscritura(404, f"No existe el paciente '{id}'")
+
+
+def registrar_admision(datos: Dict) -> str:
+    """
+    Admite un paciente nuevo y espera a que la escritura sea durable y visible.
+
+    Args:
+        datos (Dict): id (opcional), fecha_entrada (date), genero, edad,
+            enfermedad, servicio y, opcionalmente, fecha_alta y estancia
+
+    Returns:
+        str: Id del paciente admitido
+    """
+    def preparar(store: PacientesStore) -> Dict:
+        id = datos.get('id')
+        if id is None:
+            # Ids correlativos con el formato del dataset (s1, s2, ...)
+            numero = len(store) + len(diario.admisiones_en_curso) + 1
+            while store.indice_id.buscar(f"s{numero}") is not None or f"s{numero}" in diario.admisiones_en_curso:
+                numero += 1
+            id = f"s{numero}"
+        elif store.indice_id.buscar(id) is not None or id in store.indice_id.duplicados or id in diario.admisiones_en_curso:
+            raise ErrorEscritura(409, f"Ya existe un paciente con id '{id}'")
+        entrada = np.datetime64(datos['fecha_entrada'], 'D')
+        alta = np.datetime64(datos['fecha_alta'], 'D') if datos.get('fecha_alta') else None
+        estancia = datos.get('estancia')
+        if alta is not None and alta < entrada:
+            raise ErrorEscritura(400, "fecha_alta no puede ser anterior a fecha_entrada")
+        if alta is not None and estancia is None:
+            estancia = int((alta - entrada).astype(int))
+        return {
+            'op': 'admision',
+            'registro': {
+                'id': id,
+                'fecha_entrada': formatear_fecha(entrada),
+                'fecha_alta': formatear_fecha(alta) if alta is not None else '',
+                'Genero': datos['genero'],
+                'Edad': datos['edad'],
+                'Enfermedad': datos['enfermedad'],
+                'Servicio': datos['servicio'],
+                'Estancia': '' if estancia is None else estancia
+            },
+            '_fecha_entrada': entrada
+        }
+
+    if MODO_DATOS != "local":
+        raise ErrorEscritura(503, "Las escrituras requieren MODO_DATOS=local")
+    return diario.confirmar(preparar)['registro']['id']
+
+
+def registrar_alta(id: str, fecha_alta, estancia: Optional[int]) -> None:
+    """
+    Registra el alta de un paciente y espera a que sea durable y visible.
+
+    Args:
+        id (str): Id del paciente
+        fecha_alta (date): Fecha de alta
+        estancia (Optional[int]): Días de estancia; por defecto, alta - entrada
+    """
+    def preparar(store: PacientesStore) -> Dict:
+        entrada = fecha_entrada_de(store, id)
+        alta = np.datetime64(fecha_alta, 'D')
+        if not np.isnat(entrada) and alta < entrada:
+            raise ErrorEscritura(400, "fecha_alta no puede ser anterior a fecha_entrada")
+        dias = estancia if estancia is not None else (None if np.isnat(entrada) else int((alta - entrada).astype(int)))
+        if dias is None:
+            raise ErrorEscritura(400, "Indique 'estancia': el paciente no tiene fecha_entrada")
+        return {'op': 'alta', 'id': id, 'fecha_alta': formatear_fecha(alta), 'estancia': dias}
+
+    if MODO_DATOS != "local":
+        raise ErrorEscritura(503, "Las escrituras requieren MODO_DATOS=local")
+    diario.confirmar(preparar)
+
+
+# El almacén propio (no el adjuntado a una generación publicada) incluye las
+# escrituras del diario que todavía no se compactaron en el CSV
+if not (MODO_DATOS == "compartido" and __name__ != "__main__"):
+    pacientes_store = diario.recuperar(pacientes_store)
+
+# ======================================================
+# FUNCIONALIDADES DE PROCESAMIENTO DE TEXTO
+# ======================================================
+
+_wordnet = None
+_wordnet_lock = threading.Lock()
+
+
+def cargar_wordnet():
+    """
+    Carga WordNet desde las rutas locales la primera vez que se necesita.
+
+    Returns:
+        El lector de corpus de WordNet ya cargado
+
+    Raises:
+        RuntimeError: Si el recurso no está instalado en ninguna ruta local
+    """
+    global _wordnet
+    if _wordnet is None:
+        with _wordnet_lock:
+            if _wordnet is None:
+                inicio = time.perf_counter()
+                import nltk
+                from nltk.corpus import wordnet
+
+                nltk.data.path.extend(r for r in NLTK_RUTAS if r not in nltk.data.path)
+                try:
+                    wordnet.ensure_loaded()
+                except LookupError:
+                    raise RuntimeError(
+                        "No se encontró el recurso 'wordnet' de NLTK en las rutas locales; "
+                        "instálelo con: python -m nltk.downloader -d <ruta> wordnet y defina NLTK_DATA"
+                    )
+                _wordnet = wordnet
+                logger.info("WordNet cargado en %.0f ms", (time.perf_counter() - inicio) * 1000)
+    return _wordnet
+
+
+def get_synonyms(word: str) -> set:
+    """
+    Genera sinónimos para una palabra usando WordNet.
+    
+    Args:
+        word (str): Palabra para buscar sinónimos
+        
+    Returns:
+        set: Conjunto de sinónimos en minúsculas
+    """
+    return {lemma.name().lower() for syn in cargar_wordnet().synsets(word) for lemma in syn.lemmas()}
+
+# ======================================================
+# MOTOR DE INTENCIONES DEL CHAT
+# ======================================================
+
+# Palabras y frases (hasta dos tokens) que aportan puntaje a cada intención
+PATRONES_INTENCION = {
+    'saludo': {'hola': 2, 'buenos dias': 2, 'buenas tardes': 2, 'buenas noches': 2, 'saludos': 2},
+    'promedio_estancia': {'promedio': 2, 'media': 1.5, 'estancia': 1, 'dias': 0.5, 'dura': 1},
+    'conteo_pacientes': {'cuantos pacientes': 1.5, 'numero de': 1, 'cantidad de': 1, 'pacientes': 0.5, 'hay': 0.5},
+    'camas_ocupadas': {'camas': 2, 'cama': 2, 'ocupadas': 1, 'disponibles': 1, 'ocupacion': 1.5, 'censo': 1.5},
+    'altas_proyectadas': {'alta': 2, 'altas': 2, 'egreso': 2, 'egresos': 2, 'hoy': 0.5},
+    'afirmacion': {'si': 2, 'claro': 2, 'dale': 2, 'por favor': 1},
+}
+# Puntaje mínimo para aceptar una intención
+PUNTAJE_MINIMO_INTENCION = 2
+# Respuesta afirmativa esperada tras cada intención que ofrece un detalle adicional
+SEGUIMIENTO_INTENCION = {'camas_ocupadas': 'camas_por_servicio'}
+TAMANO_CACHE_CHAT = 1024
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Divide el texto normalizado en palabras alfanuméricas."""
+    return re.findall(r'[a-z0-9]+', normalizar(texto))
+
+
+def compilar_patrones(patrones: Dict[str, Dict[str, float]]) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Construye el índice token/bigrama -> intenciones que lo usan.
+
+    Args:
+        patrones (Dict[str, Dict[str, float]]): Frases y pesos por intención
+
+    Returns:
+        Dict[str, List[Tuple[str, float]]]: Intenciones y pesos de cada frase
+    """
+    indice = {}
+    for intencion, frases in patrones.items():
+        for frase, peso in frases.items():
+            indice.setdefault(' '.join(tokenizar(frase)), []).append((intencion, peso))
+    return indice
+
+
+INDICE_INTENCIONES = compilar_patrones(PATRONES_INTENCION)
+
+
+def clasificar_intencion(tokens: List[str]) -> Optional[str]:
+    """
+    Elige la intención con mayor puntaje según los tokens y bigramas del mensaje.
+
+    Args:
+        tokens (List[str]): Tokens normalizados del mensaje
+
+    Returns:
+        Optional[str]: Intención reconocida o None
+    """
+    puntajes = {}
+    for termino in set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}:
+        for intencion, peso in INDICE_INTENCIONES.get(termino, ()):
+            puntajes[intencion] = puntajes.get(intencion, 0) + peso
+    if not puntajes:
+        return None
+    # Ante empate gana la intención declarada primero en PATRONES_INTENCION
+    intencion = max(PATRONES_INTENCION, key=lambda i: puntajes.get(i, 0))
+    return intencion if puntajes[intencion] >= PUNTAJE_MINIMO_INTENCION else None
+
+
+class ExtractorEntidades:
+    """
+    Reconoce enfermedades y servicios del dataset dentro de un mensaje.
+
+    Guarda los valores normalizados de cada columna en un trie de tokens y, en
+    cada posición del mensaje, se queda con la coincidencia más larga, de modo
+    que "bronquitis aguda" prevalece sobre "bronquitis".
+    """
+
+    def __init__(self, store: 'PacientesStore'):
+        self.tries = {}
+        for campo, columna in (('enfermedad', store.enfermedad), ('servicio', store.servicio)):
+            trie = {}
+            # Se omiten claves muy cortas ("g", "f c d") que coincidirían con cualquier mensaje
+            for clave in columna.grupos()[0]:
+                if len(clave.replace(' ', '')) < 3:
+                    continue
+                nodo = trie
+                for token in tokenizar(clave):
+                    nodo = nodo.setdefault(token, {})
+                nodo[None] = clave
+            self.tries[campo] = trie
+
+    def extraer(self, tokens: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Args:
+            tokens (List[str]): Tokens normalizados del mensaje
+
+        Returns:
+            Dict[str, Optional[str]]: Clave normalizada de enfermedad y servicio (o None)
+        """
+        entidades = {}
+        for campo, trie in self.tries.items():
+            mejor, largo = None, 0
+            for inicio in range(len(tokens)):
+                nodo = trie
+                for fin in range(inicio, len(tokens)):
+                    nodo = nodo.get(tokens[fin])
+                    if nodo is None:
+                        break
+                    if None in nodo and fin - inicio + 1 > largo:
+                        mejor, largo = nodo[None], fin - inicio + 1
+            entidades[campo] = mejor
+        return entidades
+
+
+def describir_filtros(enfermedad: Optional[str], servicio: Optional[str]) -> str:
+    """Texto con los filtros reconocidos, para incluirlo en la respuesta."""
+    partes = [f"la enfermedad '{enfermedad}'" if enfermedad else '', f"el servicio '{servicio}'" if servicio else '']
+    partes = [p for p in partes if p]
+    return f" para {' y '.join(partes)}" if partes else ''
+
+
+def mascara_entidades(store: 'PacientesStore', enfermedad: Optional[str], servicio: Optional[str]) -> Optional[np.ndarray]:
+    """
+    Máscara de las filas con la enfermedad y el servicio reconocidos en el mensaje.
+
+    Args:
+        store (PacientesStore): Datos de pacientes
+        enfermedad (Optional[str]): Enfermedad normalizada mencionada
+        servicio (Optional[str]): Servicio normalizado mencionado
+
+    Returns:
+        Optional[np.ndarray]: Máscara booleana por fila; None si no se mencionó ninguna
+    """
+    mascaras = [
+        columna.mascara(columna.codigos_por_clave[clave])
+        for columna, clave in ((store.enfermedad, enfermedad), (store.servicio, servicio))
+        if clave is not None
+    ]
+    return np.logical_and.reduce(mascaras) if mascaras else None
+
+
+@lru_cache(maxsize=TAMANO_CACHE_CHAT)
+def responder_intencion(
+    intencion: Optional[str], enfermedad: Optional[str], servicio: Optional[str], generacion: int, dia: date
+) -> Tuple[str, Optional[str]]:
+    """
+    Redacta la respuesta de una intención con los datos actuales.
+
+    `generacion` y `dia` forman parte de la clave de la caché: una recarga del
+    CSV o el cambio de día invalidan las respuestas anteriores.
+
+    Args:
+        intencion (Optional[str]): Intención reconocida
+        enfermedad (Optional[str]): Enfermedad normalizada mencionada
+        servicio (Optional[str]): Servicio normalizado mencionado
+        generacion (int): Generación de los datos con que se responde
+        dia (date): Día de referencia para "hoy"
+
+    Returns:
+        Tuple[str, Optional[str]]: Respuesta y contexto para el siguiente mensaje
+    """
+    store = obtener_store()
+    filtros = describir_filtros(enfermedad, servicio)
+    # Si el dataset no llega a hoy, "hoy" pasa a ser el último día con ingresos registrados
+    hoy = min(np.datetime64(dia, 'D'), store.censo.ultimo_ingreso)
+
+    if intencion == 'saludo':
+        return ('¡Hola! Soy tu asistente virtual. Puedes preguntarme por el promedio de estancia o la cantidad '
+                'de pacientes de una enfermedad o servicio, las camas ocupadas y las altas proyectadas para hoy.', None)
+
+    if intencion == 'conteo_pacientes':
+        # El cubo solo cuenta las estancias válidas; aquí van todas las filas
+        mascara = mascara_entidades(store, enfermedad, servicio)
+        pacientes = len(store) if mascara is None else int(np.count_nonzero(mascara))
+        if pacientes == 0:
+            return (f"No hay registros{filtros}.", None)
+        return (f"Hay {pacientes} pacientes registrados{filtros}.", None)
+
+    if intencion == 'promedio_estancia':
+        estadisticas = store.cubo_estancias.consultar(enfermedad=enfermedad, servicio=servicio)
+        if estadisticas is None:
+            return (f"No hay registros{filtros}.", None)
+        return (f"El promedio de días de estancia{filtros} es de {estadisticas['promedio_estancia']:.2f} "
+                f"(desviación {estadisticas['desviacion_estancia']:.2f}, {estadisticas['pacientes']} pacientes).", None)
+
+    if intencion in ('camas_ocupadas', 'camas_por_servicio'):
+        censo = store.censo
+        ocupacion = censo.serie(hoy, hoy)[:, 0]
+        if intencion == 'camas_por_servicio':
+            detalle = '; '.join(f"{censo.etiquetas[g] or 'sin servicio'}: {int(n)}" for g, n in enumerate(ocupacion) if n)
+            return (f"Camas ocupadas por servicio el {hoy}: {detalle or 'ninguna'}.", None)
+        if servicio is not None:
+            ocupadas = int(ocupacion[censo.claves.index(servicio)])
+        else:
+            ocupadas = int(ocupacion.sum())
+        return (f"El {hoy} hay {ocupadas} camas ocupadas{filtros}. El dataset no registra la capacidad, "
+                "así que no puedo calcular las disponibles. ¿Quieres el dato por servicio?", 'camas_ocupadas')
+
+    if intencion == 'altas_proyectadas':
+        proyeccion = proyectar_altas(store, hoy, hoy - np.timedelta64(1, 'D'), mascara_entidades(store, enfermedad, servicio))
+        return (f"Se proyectan {proyeccion['altas_proyectadas']:.2f} altas para el {proyeccion['fecha']}{filtros}, entre "
+                f"{proyeccion['pacientes_hospitalizados']} pacientes hospitalizados.", None)
+
+    return ('Lo siento, no entiendo tu pregunta. ¿Podrías reformularla o especificar más detalles? 😊', None)
+
+
+def responder_chat(mensaje: str, contexto: Optional[str] = None) -> Dict:
+    """
+    Interpreta un mensaje del chat y lo responde con los datos vigentes.
+
+    Args:
+        mensaje (str): Texto escrito por el usuario
+        contexto (Optional[str]): Contexto devuelto por la respuesta anterior
+
+    Returns:
+        Dict: Intención reconocida, respuesta y contexto para el siguiente mensaje
+    """
+    store = obtener_store()
+    tokens = tokenizar(mensaje)
+    intencion = clasificar_intencion(tokens)
+    if intencion == 'afirmacion':
+        intencion = SEGUIMIENTO_INTENCION.get(contexto)
+    entidades = store.entidades_chat.extraer(tokens)
+    respuesta, nuevo_contexto = responder_intencion(
+        intencion, entidades['enfermedad'], entidades['servicio'], store.generacion, date.today()
+    )
+    return {"intencion": intencion, **entidades, "respuesta": respuesta, "contexto": nuevo_contexto}
 
 # ======================================================
-# CARGA Y PREPARACIÓN DE DATOS
+# PAGINACIÓN Y RESPUESTAS EN STREAMING
 # ======================================================
 
-def load_pacientes() -> List[Dict]:
+# Tamaño máximo de página y de cada bloque enviado en modo streaming
+LIMITE_MAXIMO = 10000
+TAMANO_BLOQUE = 1000
+
+
+def paginar(filas: np.ndarray, limit: Optional[int], cursor: Optional[int]) -> Tuple[np.ndarray, Optional[int]]:
     """
-    Carga y prepara los datos de pacientes desde un archivo CSV.
-    
+    Aplica paginación por cursor (keyset) sobre filas en orden ascendente.
+
+    El cursor es la posición de la última fila entregada; como las filas nuevas
+    siempre se agregan al final, el orden de las páginas es estable.
+
+    Args:
+        filas (np.ndarray): Índices de fila en orden ascendente
+        limit (Optional[int]): Tamaño de página; None devuelve todo lo restante
+        cursor (Optional[int]): Cursor devuelto por la página anterior
+
     Returns:
-        List[Dict]: Lista de diccionarios con información de pacientes
+        Tuple[np.ndarray, Optional[int]]: Filas de la página y cursor siguiente
+        (None si no hay más resultados)
     """
-    try:
-        # Cargar datos y seleccionar columnas relevantes
-        df = pd.read_csv(
-            "Dataset/Dataset_Pacientes_LOS.csv",
-            delimiter=";",
-            quotechar='"',
-            on_bad_lines="skip"
-        )[['id', 'fecha_entrada', 'fecha_alta', 'Genero', 'Edad', 'Enfermedad', 'Servicio', 'Estancia']]
-        
-        # Renombrar columnas para consistencia
-        df.columns = ['id', 'fecha_entrada', 'fecha_alta', 'Genero', 'Edad (años)', 'Enfermedad', 'Servicio', 'Estancia (días)']
-        
-        return df.fillna('').to_dict(orient='records')
-    
-    except Exception as e:
-        raise RuntimeError(f"Error cargando datos: {str(e)}")
+    if cursor is not None:
+        filas = filas[np.searchsorted(filas, cursor, side='right'):]
+    if limit is None or len(filas) <= limit:
+        return filas, None
+    pagina = filas[:limit]
+    return pagina, int(pagina[-1])
+
+
+def generar_ndjson(store: PacientesStore, filas: np.ndarray) -> Iterator[str]:
+    """
+    Genera los registros como NDJSON por bloques de TAMANO_BLOQUE filas.
+
+    Args:
+        store (PacientesStore): Almacén del que se leen las filas
+        filas (np.ndarray): Índices de las filas a enviar
+
+    Yields:
+        str: Bloque de líneas JSON terminadas en salto de línea
+    """
+    for inicio in range(0, len(filas), TAMANO_BLOQUE):
+        bloque = store.registros(filas[inicio:inicio + TAMANO_BLOQUE])
+        yield ''.join(json.dumps(registro, ensure_ascii=False) + '\n' for registro in bloque)
+
+
+def responder_pacientes(
+    store: PacientesStore,
+    filas: np.ndarray,
+    limit: Optional[int],
+    cursor: Optional[int],
+    formato: str
+):
+    """
+    Construye la respuesta de un listado de pacientes.
 
-# Cargar datos al iniciar la aplicación
-pacientes_list: List[Dict] = load_pacientes()
+    Con formato 'json' devuelve un arreglo JSON con la página solicitada; con
+    'ndjson' la envía en streaming, un registro por línea. El cursor de la
+    página siguiente viaja en la cabecera X-Siguiente-Cursor.
+    """
+    pagina, siguiente = paginar(filas, limit, cursor)
+    headers = {'X-Siguiente-Cursor': str(siguiente)} if siguiente is not None else {}
+    contar_filas(devueltas=len(pagina))
+
+    if formato == 'ndjson':
+        return StreamingResponse(generar_ndjson(store, pagina), media_type='application/x-ndjson', headers=headers)
+    return JSONResponse(content=store.registros(pagina), headers=headers)
 
 # ======================================================
-# FUNCIONALIDADES DE PROCESAMIENTO DE TEXTO
+# EXPORTACIÓN MASIVA
 # ======================================================
 
-def get_synonyms(word: str) -> set:
+# Filas por bloque exportado: la memoria de una exportación no depende de su tamaño
+FILAS_POR_BLOQUE_EXPORTACION = 65_536
+
+# Tipo MIME y extensión de cada formato de exportación
+FORMATOS_EXPORTACION = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def textos_distintos(valores: np.ndarray, formatear: Callable) -> np.ndarray:
+    """Formatea un bloque de valores llamando a `formatear` una sola vez por valor distinto."""
+    distintos, posiciones = np.unique(valores, return_inverse=True)
+    return np.array([str(formatear(v)) for v in distintos], dtype=object)[posiciones.reshape(-1)]
+
+
+def citar_csv(texto: str) -> str:
+    """Encierra el texto entre comillas si contiene el separador, comillas o saltos de línea."""
+    if any(caracter in texto for caracter in ';"\n\r'):
+        return '"' + texto.replace('"', '""') + '"'
+    return texto
+
+
+def textos_categorias(columna: ColumnaCategorica, filas: np.ndarray) -> np.ndarray:
+    """Valores de una columna categórica como se escriben en el CSV ('' para el vacío)."""
+    return np.array([citar_csv(c) for c in columna.categorias] + [''], dtype=object)[columna.codigos[filas]]
+
+
+def textos_ids(ids: np.ndarray) -> np.ndarray:
+    """Ids como se escriben en el CSV; solo los que lo necesitan pasan por citar_csv."""
+    textos = ids.astype(object)
+    especiales = np.zeros(len(ids), dtype=bool)
+    for caracter in ';"\n\r':
+        especiales |= np.char.find(ids, caracter) >= 0
+    for posicion in np.flatnonzero(especiales):
+        textos[posicion] = citar_csv(textos[posicion])
+    return textos
+
+
+def generar_csv(store: PacientesStore, filas: np.ndarray) -> Iterator[str]:
     """
-    Genera sinónimos para una palabra usando WordNet.
-    
+    Genera las filas con el esquema y el formato de Dataset_Pacientes_LOS.csv.
+
+    Cada columna del bloque se arma con operaciones sobre arreglos (fechas,
+    estancias y categorías se formatean una vez por valor distinto) y las
+    líneas se unen directamente, sin construir un diccionario por fila.
+
     Args:
-        word (str): Palabra para buscar sinónimos
-        
+        store (PacientesStore): Almacén del que se leen las filas
+        filas (np.ndarray): Índices de las filas a exportar
+
+    Yields:
+        str: Encabezado y bloques de hasta FILAS_POR_BLOQUE_EXPORTACION líneas
+    """
+    yield ';'.join(COLUMNAS_CSV) + '\n'
+    for inicio in range(0, len(filas), FILAS_POR_BLOQUE_EXPORTACION):
+        bloque = filas[inicio:inicio + FILAS_POR_BLOQUE_EXPORTACION]
+        columnas = (
+            textos_ids(store.ids[bloque]),
+            textos_distintos(store.fecha_entrada[bloque], formatear_fecha),
+            textos_distintos(store.fecha_alta[bloque], formatear_fecha),
+            textos_categorias(store.genero, bloque),
+            textos_categorias(store.edad_texto, bloque),
+            textos_categorias(store.enfermedad, bloque),
+            textos_categorias(store.servicio, bloque),
+            textos_distintos(store.estancia[bloque], formatear_numero),
+        )
+        yield ''.join(';'.join(linea) + '\n' for linea in zip(*columnas))
+
+
+def esquema_arrow() -> 'pa.Schema':
+    """Columnas del CSV con tipos nativos: fechas date32, textos codificados por diccionario."""
+    texto = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('id', pa.string()),
+        ('fecha_entrada', pa.date32()),
+        ('fecha_alta', pa.date32()),
+        ('Genero', texto),
+        ('Edad', texto),
+        ('Enfermedad', texto),
+        ('Servicio', texto),
+        ('Estancia', pa.float64()),
+    ])
+
+
+def lote_arrow(store: PacientesStore, filas: np.ndarray, esquema: 'pa.Schema') -> 'pa.RecordBatch':
+    """
+    Convierte un bloque de filas en un RecordBatch sin pasar por objetos Python.
+
+    Las columnas categóricas reutilizan sus códigos como índices del
+    diccionario; fechas y estancias faltantes quedan como nulos.
+    """
+    def categorica(columna: ColumnaCategorica) -> 'pa.DictionaryArray':
+        codigos = columna.codigos[filas]
+        return pa.DictionaryArray.from_arrays(pa.array(codigos, type=pa.int32(), mask=codigos < 0), columna.categorias)
+
+    fecha_entrada = store.fecha_entrada[filas]
+    fecha_alta = store.fecha_alta[filas]
+    estancia = store.estancia[filas]
+    return pa.RecordBatch.from_arrays([
+        pa.array(store.ids[filas], type=pa.string()),
+        pa.array(fecha_entrada, type=pa.date32(), mask=np.isnat(fecha_entrada)),
+        pa.array(fecha_alta, type=pa.date32(), mask=np.isnat(fecha_alta)),
+        categorica(store.genero),
+        categorica(store.edad_texto),
+        categorica(store.enfermedad),
+        categorica(store.servicio),
+        pa.array(estancia, type=pa.float64(), mask=np.isnan(estancia)),
+    ], schema=esquema)
+
+
+class SalidaPorBloques(io.RawIOBase):
+    """
+    Destino de escritura que acumula los bytes hasta que se retiran.
+
+    tell() cuenta todo lo escrito, así que el escritor de Parquet calcula bien
+    los desplazamientos del pie aunque los bytes ya se hayan enviado.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.partes: List[bytes] = []
+        self.posicion = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self) -> int:
+        return self.posicion
+
+    def retirar(self) -> bytes:
+        """Devuelve y descarta lo escrito desde el último retiro."""
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_columnar(store: PacientesStore, filas: np.ndarray, formato: str) -> Iterator[bytes]:
+    """
+    Genera la exportación en Arrow IPC (formato de stream) o Parquet.
+
+    Cada bloque de FILAS_POR_BLOQUE_EXPORTACION filas es un RecordBatch de
+    Arrow o un row group de Parquet, y se envía apenas se escribe.
+
+    Args:
+        store (PacientesStore): Almacén del que se leen las filas
+        filas (np.ndarray): Índices de las filas a exportar
+        formato (str): 'arrow' o 'parquet'
+
+    Yields:
+        bytes: Bytes escritos por cada bloque
+    """
+    esquema = esquema_arrow()
+    salida = SalidaPorBloques()
+    escritor = pa.ipc.new_stream(salida, esquema) if formato == 'arrow' else pq.ParquetWriter(salida, esquema)
+    for inicio in range(0, len(filas), FILAS_POR_BLOQUE_EXPORTACION):
+        lote = lote_arrow(store, filas[inicio:inicio + FILAS_POR_BLOQUE_EXPORTACION], esquema)
+        if formato == 'arrow':
+            escritor.write_batch(lote)
+        else:
+            escritor.write_table(pa.Table.from_batches([lote]))
+        yield salida.retirar()
+    escritor.close()
+    yield salida.retirar()
+
+# ======================================================
+# CACHÉ DE RESPUESTAS
+# ======================================================
+
+# Presupuesto de memoria de la caché (bytes de JSON ya serializado)
+PRESUPUESTO_CACHE_BYTES = int(os.getenv("PRESUPUESTO_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class CacheRespuestas:
+    """
+    Caché LRU de respuestas JSON ya serializadas, acotada por bytes.
+
+    Cada entrada guarda el cuerpo, su ETag y las cabeceras propias de la
+    respuesta. Las claves incluyen la generación del dataset; al ver una
+    generación más nueva se reemplaza el diccionario completo con una sola
+    asignación, así ninguna petición mezcla entradas de dos versiones. Las
+    peticiones que todavía usan una generación anterior se responden sin
+    caché, para no vaciarla cada vez que se alternan con las nuevas.
+    """
+
+    def __init__(self, presupuesto: int):
+        self.presupuesto = presupuesto
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._generacion = None
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _vigente(self, generacion: int) -> bool:
+        """Pasa a `generacion` si es más nueva; indica si es la que guarda la caché."""
+        if self._generacion is None or generacion > self._generacion:
+            self._entradas = OrderedDict()
+            self._generacion = generacion
+            self.bytes = 0
+        return generacion == self._generacion
+
+    def obtener(self, generacion: int, clave: Tuple) -> Optional[Tuple[bytes, str, Dict[str, str]]]:
+        with self._lock:
+            entrada = self._entradas.get(clave) if self._vigente(generacion) else None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada
+
+    def guardar(self, generacion: int, clave: Tuple, entrada: Tuple[bytes, str, Dict[str, str]]) -> None:
+        tamano = len(entrada[0])
+        if tamano > self.presupuesto:
+            return
+        with self._lock:
+            if not self._vigente(generacion):
+                return
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior[0])
+            self._entradas[clave] = entrada
+            self.bytes += tamano
+            while self.bytes > self.presupuesto:
+                _, expulsada = self._entradas.popitem(last=False)
+                self.bytes -= len(expulsada[0])
+
+    def exponer(self) -> str:
+        """Estado de la caché en el formato de texto de Prometheus."""
+        return (
+            '# HELP pacientes_cache_bytes Bytes de respuestas guardadas en la caché\n'
+            '# TYPE pacientes_cache_bytes gauge\n'
+            f'pacientes_cache_bytes {self.bytes}\n'
+            '# HELP pacientes_cache_entradas Respuestas guardadas en la caché\n'
+            '# TYPE pacientes_cache_entradas gauge\n'
+            f'pacientes_cache_entradas {len(self._entradas)}\n'
+            '# HELP pacientes_cache_consultas_total Consultas a la caché por resultado\n'
+            '# TYPE pacientes_cache_consultas_total counter\n'
+            f'pacientes_cache_consultas_total{{resultado="acierto"}} {self.aciertos}\n'
+            f'pacientes_cache_consultas_total{{resultado="fallo"}} {self.fallos}\n'
+        )
+
+
+cache_respuestas = CacheRespuestas(PRESUPUESTO_CACHE_BYTES)
+
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    """Indica si la cabecera If-None-Match del cliente incluye `etag` (o '*')."""
+    cabecera = request.headers.get('if-none-match')
+    if not cabecera:
+        return False
+    return any(valor.strip() in (etag, '*') for valor in cabecera.split(','))
+
+
+def responder_cacheado(request: Request, clave: Tuple, construir: Callable[[], Union[Dict, List, Response]]) -> Response:
+    """
+    Responde desde la caché o construye la respuesta y la guarda serializada.
+
+    Con un ETag coincidente en If-None-Match devuelve 304 sin cuerpo. Las
+    respuestas en streaming se devuelven sin guardar.
+
+    Args:
+        request (Request): Petición en curso (para If-None-Match)
+        clave (Tuple): Ruta y parámetros normalizados de la consulta
+        construir (Callable): Calcula la respuesta si no está en la caché
+
     Returns:
-        set: Conjunto de sinónimos en minúsculas
+        Response: Respuesta JSON, 304 o la respuesta en streaming sin cambios
+    """
+    generacion = obtener_store().generacion
+    entrada = cache_respuestas.obtener(generacion, clave)
+    if entrada is None:
+        resultado = construir()
+        if isinstance(resultado, StreamingResponse):
+            return resultado
+        if not isinstance(resultado, Response):
+            resultado = JSONResponse(content=resultado)
+        cabeceras = {k: v for k, v in resultado.headers.items() if k.lower().startswith('x-')}
+        cuerpo = bytes(resultado.body)
+        entrada = (cuerpo, f'"{hashlib.blake2b(cuerpo, digest_size=16).hexdigest()}"', cabeceras)
+        cache_respuestas.guardar(generacion, clave, entrada)
+
+    cuerpo, etag, cabeceras = entrada
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={'ETag': etag, **cabeceras})
+    return Response(content=cuerpo, media_type='application/json', headers={'ETag': etag, **cabeceras})
+
+# ======================================================
+# RECURSOS ESTÁTICOS PRECOMPRIMIDOS
+# ======================================================
+
+# Directorio de imágenes y demás estáticos; construir_estaticos.py escribe en
+# dist/ las copias versionadas por hash, sus variantes .gz/.br y el manifiesto
+DIRECTORIO_ESTATICOS = "Static"
+RUTA_MANIFIESTO = os.path.join(DIRECTORIO_ESTATICOS, "dist", "manifest.json")
+
+# Las URLs versionadas nunca cambian de contenido; el resto debe revalidarse
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+
+def cargar_manifiesto() -> Dict[str, Dict]:
+    """
+    Lee el manifiesto de estáticos versionados.
+
+    Returns:
+        Dict[str, Dict]: Entradas por nombre de archivo; vacío si no se construyó
+    """
+    try:
+        with open(RUTA_MANIFIESTO) as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        logger.info("Sin %s: se sirven los estáticos originales (python construir_estaticos.py)", RUTA_MANIFIESTO)
+        return {}
+
+
+manifiesto_estaticos = cargar_manifiesto()
+
+
+def url_estatico(nombre: str) -> str:
+    """Devuelve la URL versionada de un estático, o la original si no hay manifiesto."""
+    entrada = manifiesto_estaticos.get(nombre)
+    return f"/static/dist/{entrada['archivo']}" if entrada else f"/static/{nombre}"
+
+
+def srcset(versiones: List[Dict]) -> str:
+    """Atributo srcset ("url 480w, url 768w") de las versiones de una imagen."""
+    return ', '.join(f"/static/dist/{v['archivo']} {v['ancho']}w" for v in versiones)
+
+
+def imagen_responsiva(nombre: str, alt: str, clase: str, tamanos: str) -> str:
+    """
+    Genera la etiqueta <picture> de una imagen con sus versiones reducidas.
+
+    Args:
+        nombre (str): Nombre del archivo original en Static/
+        alt (str): Texto alternativo
+        clase (str): Clase CSS de la imagen
+        tamanos (str): Atributo sizes con el ancho que ocupará la imagen
+
+    Returns:
+        str: HTML de la imagen; sin versiones reducidas, un <img> simple
+    """
+    versiones = manifiesto_estaticos.get(nombre, {}).get('versiones')
+    if not versiones:
+        return f'<img src="{url_estatico(nombre)}" alt="{alt}" class="{clase}">'
+
+    por_tipo = {}
+    for version in versiones:
+        por_tipo.setdefault(version['tipo'], []).append(version)
+    # El <img> usa JPEG, que todos los navegadores aceptan; los demás formatos van como <source>
+    fuentes = ''.join(
+        f'<source type="{tipo}" srcset="{srcset(lista)}" sizes="{tamanos}">'
+        for tipo, lista in por_tipo.items() if tipo != 'image/jpeg'
+    )
+    respaldo = por_tipo.get('image/jpeg', versiones)
+    mayor = max(respaldo, key=lambda v: v['ancho'])
+    return (
+        f'<picture>{fuentes}'
+        f'<img src="/static/dist/{mayor["archivo"]}" srcset="{srcset(respaldo)}" '
+        f'sizes="{tamanos}" width="{mayor["ancho"]}" height="{mayor["alto"]}" alt="{alt}" class="{clase}" '
+        f'loading="lazy" decoding="async"></picture>'
+    )
+
+
+def codificaciones_aceptadas(request: Request) -> set:
+    """Codificaciones de Accept-Encoding que el cliente acepta (q > 0)."""
+    aceptadas = set()
+    for parte in request.headers.get('accept-encoding', '').split(','):
+        nombre, _, parametros = parte.partition(';')
+        parametros = parametros.replace(' ', '')
+        if parametros.startswith('q='):
+            try:
+                calidad = float(parametros[2:] or 0)
+            except ValueError:
+                # Un q ilegible se trata como q=0: esa codificación no se usa
+                calidad = 0.0
+            if not calidad > 0:
+                continue
+        aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+class RecursoPrecomprimido:
+    """
+    Contenido generado una sola vez al arrancar y guardado en memoria ya
+    comprimido (gzip y, si está disponible, brotli). Cada variante tiene su
+    propio ETag fuerte.
     """
-    return {lemma.name().lower() for syn in wordnet.synsets(word) for lemma in syn.lemmas()}
+
+    def __init__(self, contenido: bytes, media_type: str):
+        self.media_type = media_type
+        self.variantes = {'identity': contenido, 'gzip': gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variantes['br'] = brotli.compress(contenido, quality=11)
+        huella = hashlib.blake2b(contenido, digest_size=16).hexdigest()
+        self.etags = {cod: f'"{huella}"' if cod == 'identity' else f'"{huella}-{cod}"' for cod in self.variantes}
+
+    def responder(self, request: Request) -> Response:
+        aceptadas = codificaciones_aceptadas(request)
+        codificacion = next((c for c in ('br', 'gzip') if c in self.variantes and c in aceptadas), 'identity')
+        cabeceras = {'ETag': self.etags[codificacion], 'Cache-Control': CACHE_REVALIDAR, 'Vary': 'Accept-Encoding'}
+        if codificacion != 'identity':
+            cabeceras['Content-Encoding'] = codificacion
+        if etag_coincide(request, self.etags[codificacion]):
+            return Response(status_code=304, headers=cabeceras)
+        return Response(content=self.variantes[codificacion], media_type=self.media_type, headers=cabeceras)
+
+
+class EstaticosPrecomprimidos(StaticFiles):
+    """
+    StaticFiles que entrega la variante .br o .gz de un archivo cuando existe
+    y el cliente la acepta, y agrega las cabeceras de caché: "immutable" para
+    dist/ (URLs versionadas por hash) y revalidación para el resto.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        aceptadas = codificaciones_aceptadas(Request(scope))
+        respuesta = None
+        for codificacion, sufijo in (('br', '.br'), ('gzip', '.gz')):
+            if codificacion not in aceptadas:
+                continue
+            try:
+                respuesta = await super().get_response(path + sufijo, scope)
+            except StarletteHTTPException:
+                continue
+            respuesta.headers['Content-Encoding'] = codificacion
+            tipo = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            respuesta.headers['Content-Type'] = f"{tipo}; charset=utf-8" if tipo.startswith('text/') else tipo
+            break
+        if respuesta is None:
+            respuesta = await super().get_response(path, scope)
+
+        versionado = path.replace(os.sep, '/').startswith('dist/')
+        respuesta.headers['Cache-Control'] = CACHE_INMUTABLE if versionado else CACHE_REVALIDAR
+        respuesta.headers['Vary'] = 'Accept-Encoding'
+        return respuesta
 
 # ======================================================
 # CONFIGURACIÓN DE FASTAPI
@@ -82,20 +3925,70 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.middleware("http")
+async def middleware_generacion(request, call_next):
+    """
+    Fija la generación del dataset para toda la petición y la informa en la
+    cabecera X-Generacion-Datos. En modo compartido, antes cambia a la
+    generación publicada más reciente.
+    """
+    if MODO_DATOS == "compartido":
+        sincronizar_generacion()
+    store = pacientes_store
+    token = _store_peticion.set(store)
+    try:
+        respuesta = await call_next(request)
+    finally:
+        _store_peticion.reset(token)
+    respuesta.headers['X-Generacion-Datos'] = str(store.generacion)
+    return respuesta
+
+@app.middleware("http")
+async def middleware_metricas(request, call_next):
+    """
+    Registra latencia, tamaño de respuesta y filas escaneadas/devueltas por ruta.
+
+    La medición termina cuando se envía el último bloque del cuerpo, de modo
+    que las respuestas en streaming cuentan completas.
+    """
+    inicio = time.perf_counter()
+    costo = [0, 0]
+    token = _costo_peticion.set(costo)
+    try:
+        respuesta = await call_next(request)
+    finally:
+        _costo_peticion.reset(token)
+    ruta = getattr(request.scope.get('route'), 'path', 'sin_ruta')
+    cuerpo = respuesta.body_iterator
+
+    async def medir_cuerpo():
+        tamano = 0
+        try:
+            async for bloque in cuerpo:
+                tamano += len(bloque)
+                yield bloque
+        finally:
+            METRICAS.observar_peticion(
+                request.method, ruta, respuesta.status_code, time.perf_counter() - inicio, tamano, costo[0], costo[1]
+            )
+
+    respuesta.body_iterator = medir_cuerpo()
+    return respuesta
+
 # Configurar archivos estáticos (imágenes, CSS, JS)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", EstaticosPrecomprimidos(directory=DIRECTORIO_ESTATICOS), name="static")
 
 # ======================================================
 # ENDPOINTS PRINCIPALES
 # ======================================================
 
-@app.get('/', tags=['Home'])
-def home():
-    """Endpoint raíz que sirve la interfaz web principal"""
+def html_inicio() -> str:
+    """Construye el HTML de la interfaz web principal con las URLs versionadas de los estáticos."""
     html_content = """
     <html>
     <head>
         <title>API de Gestión Hospitalaria</title>
+        <!-- FAVICON -->
         <style>
             /* ============ ESTILOS BASE ============ */
             body {
@@ -293,6 +4186,9 @@ def home():
 
         <!-- ============ SCRIPTS ============ -->
         <script>
+            // Cantidad máxima de filas que se piden para la tabla de resultados
+            const LIMITE_TABLA = 200;
+
             // Función principal para manejar búsquedas
             async function handleSearch(type) {
                 const inputMap = {
@@ -312,10 +4208,10 @@ def home():
                         url = `/pacientes/${value}`;
                         break;
                     case 'enfermedad':
-                        url = `/pacientes/por_enfermedad/?enfermedad=${value}`;
+                        url = `/pacientes/por_enfermedad/?enfermedad=${value}&limit=${LIMITE_TABLA}`;
                         break;
                     case 'servicio':
-                        url = `/pacientes/por_servicio/?servicio=${value}`;
+                        url = `/pacientes/por_servicio/?servicio=${value}&limit=${LIMITE_TABLA}`;
                         break;
                     case 'promedio':
                         url = `/pacientes/promedio_estancia_por_enfermedad/?enfermedad=${value}`;
@@ -326,7 +4222,7 @@ def home():
                     try {
                         const response = await fetch(url);
                         const data = await response.json();
-                        displayResults(data);
+                        displayResults(data, response.headers.get('X-Siguiente-Cursor'));
                     } catch(error) {
                         displayResults({ error: 'No se encontraron resultados' });
                     }
@@ -334,7 +4230,7 @@ def home():
             }
 
             // Función para mostrar resultados en formato tabla
-            function displayResults(data) {
+            function displayResults(data, siguienteCursor) {
                 const resultsDiv = document.getElementById('searchResults');
                 let html = '';
                 
@@ -375,6 +4271,11 @@ def home():
                 } else {
                     html = `<div class="no-results">No se encontraron coincidencias</div>`;
                 }
+
+                // Aviso cuando la búsqueda tiene más resultados que los mostrados
+                if (siguienteCursor) {
+                    html += `<p>Mostrando los primeros ${LIMITE_TABLA} resultados.</p>`;
+                }
                 
                 resultsDiv.innerHTML = html;
             }
@@ -388,6 +4289,8 @@ def home():
                 document.getElementById('chatModal').style.display = 'none';
             }
 
+            let chatContexto = null;
+
             async function handleChatQuery() {
                 const input = document.getElementById('chatInput');
                 const message = input.value.trim();
@@ -396,27 +4299,20 @@ def home():
                 if (message) {
                     chatContainer.innerHTML += `<div class="chat-message user-message">${message}</div>`;
                     
-                    // Lógica de respuestas del chatbot
+                    // Las respuestas se generan en el servidor con los datos vigentes
                     let response = '';
-                    const greetings = ['hola', 'buenos dias', 'buenas tardes', 'buenas noches'];
-
-                    if (greetings.some(greet => message.toLowerCase().includes(greet))) {
-                        response = '¡Hola! Bienvenid@. 😊 ¡Qué alegría tenerte aquí! Soy tu asistente virtual y estoy listo para ayudarte en lo que necesites. 💡 Puedes preguntarme sobre <strong>nuestros servicios</strong>, <strong>cómo funciona la plataforma</strong> o cualquier otra duda que tengas. 🚀 ¡Empecemos! ¿En qué puedo ayudarte hoy?';
-
-                    } else if (message.toLowerCase().includes('podrias darme el promedio de dias de estancia para la enfermedad diabetes?')) {
-                        response = 'El promedio de días de estancia para esta enfermedad es de 5,57. Sin embargo, debes tener en cuenta que depende de la edad, el género y otros factores relacionados con la historia clínica del usuario.';
-
-                    } else if (message.toLowerCase().includes('ahora, podrias decirme cuántas camas tenemos disponibles en este momento?')) {
-                        response = 'Claro, en este momento disponemos de 10 camas disponibles en diferentes pabellones. ¿Quieres que indique el dato por pabellon?';
-
-                    } else if (message.toLowerCase().includes('si')) {
-                        response = 'Perfecto, ten cuento que el pabellon 2 tenemos 1 cama disponible; en el pabellon 7 tenemos 4 camas disponibles; en el pabellon 8 tenemos 3 camas disponibles; y en el pabellon 10 tenemos 2cama disponible.';
-
-                    } else if (message.toLowerCase().includes('ok, podrias indicarme cuántos pacientes serán dados de alta el día de hoy?')) {
-                        response = 'La cantidad de pacientes proyectados para dar de alta el día de hoy es: 5.';
-
-                    } else {
-                        response = 'Lo siento, no entiendo tu pregunta. ¿Podrías reformularla o especificar más detalles? 😊';
+                    try {
+                        const reply = await fetch('/chat', {
+                            method: 'POST',
+                            headers: { 'Content-Type': 'application/json' },
+                            body: JSON.stringify({ mensaje: message, contexto: chatContexto })
+                        });
+                        const data = await reply.json();
+                        response = data.respuesta;
+                        chatContexto = data.contexto;
+                    } catch(error) {
+                        response = 'No pude consultar los datos en este momento. Intenta de nuevo.';
+                        chatContexto = null;
                     }
 
                     chatContainer.innerHTML += `<div class="chat-message bot-message">${response}</div>`;
@@ -499,7 +4395,7 @@ def home():
                 </div>
 
                 <!-- Imagen Institucional -->
-                <img src="/static/hospital_futurista.png" alt="Hospital futurista" class="hospital-image">
+                <!-- IMAGEN_HOSPITAL -->
             </div>
         </div>
 
@@ -522,51 +4418,481 @@ def home():
     </body>
 </html>
     """
-    return HTMLResponse(content=html_content, status_code=200)
+    return (
+        html_content
+        .replace('<!-- FAVICON -->', f'<link rel="icon" href="{url_estatico("favicon.ico")}">')
+        .replace('<!-- IMAGEN_HOSPITAL -->', imagen_responsiva(
+            'hospital_futurista.png', 'Hospital futurista', 'hospital-image', '(max-width: 1200px) 50vw, 600px'
+        ))
+    )
+
+
+# La página se arma y comprime una sola vez al arrancar
+pagina_inicio = RecursoPrecomprimido(html_inicio().encode('utf-8'), 'text/html; charset=utf-8')
+
+@app.get('/', tags=['Home'])
+def home(request: Request):
+    """Endpoint raíz que sirve la interfaz web principal"""
+    return pagina_inicio.responder(request)
+
 
+# Parámetros comunes de los listados de pacientes
+LIMIT_QUERY = Query(None, ge=1, le=LIMITE_MAXIMO, description="Cantidad máxima de registros por página")
+CURSOR_QUERY = Query(None, ge=0, description="Cursor devuelto en la cabecera X-Siguiente-Cursor")
+FORMATO_QUERY = Query('json', pattern='^(json|ndjson)$', description="'json' o 'ndjson' (streaming)")
 
 @app.get('/pacientes', tags=['pacientes'])
-def get_pacientes():
-    return pacientes_list or HTTPException(status_code=500, detail="No hay datos de pacientes hospitalizados")
+def get_pacientes(limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY):
+    store = obtener_store()
+    if not len(store):
+        raise HTTPException(status_code=500, detail="No hay datos de pacientes hospitalizados")
+    filas = np.arange(len(store))
+    contar_filas(escaneadas=len(filas))
+    return responder_pacientes(store, filas, limit, cursor, formato)
+
+class Admision(BaseModel):
+    id: Optional[str] = None
+    fecha_entrada: date
+    genero: str
+    edad: Union[int, float, str]
+    enfermedad: str
+    servicio: str
+    fecha_alta: Optional[date] = None
+    estancia: Optional[int] = None
+
+class Alta(BaseModel):
+    fecha_alta: date
+    estancia: Optional[int] = None
+
+@app.post('/pacientes', tags=['pacientes'], status_code=201)
+def post_paciente(admision: Admision):
+    datos = admision.model_dump()
+    datos['genero'] = datos['genero'].strip().upper()
+    if datos['genero'] not in ('F', 'M'):
+        raise HTTPException(status_code=400, detail="genero debe ser 'F' o 'M'")
+    if datos['estancia'] is not None and datos['estancia'] < 0:
+        raise HTTPException(status_code=400, detail="estancia no puede ser negativa")
+    if isinstance(datos['edad'], float) and datos['edad'].is_integer():
+        datos['edad'] = int(datos['edad'])
+    datos['edad'] = str(datos['edad'])
+    try:
+        id = registrar_admision(datos)
+    except ErrorEscritura as e:
+        raise HTTPException(status_code=e.estado, detail=e.detalle)
+    store = pacientes_store
+    return store.registro(store.indice_id.buscar(id))
+
+@app.patch('/pacientes/{id}', tags=['pacientes'])
+def patch_paciente(id: str, alta: Alta):
+    if alta.estancia is not None and alta.estancia < 0:
+        raise HTTPException(status_code=400, detail="estancia no puede ser negativa")
+    try:
+        registrar_alta(id, alta.fecha_alta, alta.estancia)
+    except ErrorEscritura as e:
+        raise HTTPException(status_code=e.estado, detail=e.detalle)
+    store = pacientes_store
+    return store.registro(store.indice_id.buscar(id))
 
 @app.get('/pacientes/{id}', tags=['pacientes'])
 def get_pacientes(id: str):
-    return next((m for m in pacientes_list if m['id'] == id), {"detalle": "paciente no encontrado"})
+    store = obtener_store()
+    if id in store.indice_id.duplicados:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El id '{id}' está duplicado en el dataset ({len(store.indice_id.duplicados[id])} registros)"
+        )
+    fila = store.indice_id.buscar(id)
+    contar_filas(escaneadas=1, devueltas=int(fila is not None))
+    return store.registro(fila) if fila is not None else {"detalle": "paciente no encontrado"}
 
 @app.get('/pacientes/por_servicio/', tags=['pacientes'])
-def get_pacientes_por_service(servicio: str):
-    resultados = [m for m in pacientes_list if 'Servicio' in m and isinstance(m['Servicio'], str) and servicio.lower() in m['Servicio'].lower()]
-    
-    if not resultados:
-        return {"mensaje": "No hay datos disponibles para el servicio"}
-    
-    return resultados
+def get_pacientes_por_service(request: Request, servicio: str, limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY):
+    store = obtener_store()
+
+    def construir():
+        filas = filtrar_por_texto(store.servicio, servicio)
+        if not len(filas):
+            return {"mensaje": "No hay datos disponibles para el servicio"}
+        return responder_pacientes(store, filas, limit, cursor, formato)
+
+    return responder_cacheado(request, ('por_servicio', normalizar(servicio), limit, cursor, formato), construir)
+
+def validar_limites(minimo: Optional[float], maximo: Optional[float], campo_min: str = 'min', campo_max: str = 'max') -> None:
+    """
+    Rechaza con 400 los límites de un rango no finitos (inf, nan) o invertidos.
+
+    Un nan no coincide con ninguna fila y un infinito no se puede devolver en
+    la respuesta JSON, así que ninguno de los dos tiene una respuesta útil.
+    """
+    for campo, valor in ((campo_min, minimo), (campo_max, maximo)):
+        if valor is not None and not np.isfinite(valor):
+            raise HTTPException(status_code=400, detail=f"'{campo}' debe ser un número finito")
+    if minimo is not None and maximo is not None and minimo > maximo:
+        raise HTTPException(status_code=400, detail=f"'{campo_min}' no puede ser mayor que '{campo_max}'")
+
+def responder_rango(
+    request: Request, nombre: str, indice: IndiceOrdenado, minimo: Optional[float], maximo: Optional[float],
+    solo_conteo: bool, limit: Optional[int], cursor: Optional[int], formato: str
+):
+    """
+    Responde una consulta por rango sobre un índice ordenado.
+
+    Con `solo_conteo` devuelve la cantidad de pacientes sin construir las filas.
+    """
+    if minimo is None and maximo is None:
+        raise HTTPException(status_code=400, detail="Indique al menos 'min' o 'max'")
+    validar_limites(minimo, maximo)
+    store = obtener_store()
+
+    def construir():
+        if solo_conteo:
+            return {"min": minimo, "max": maximo, "pacientes": indice.contar(minimo, maximo)}
+        filas = indice.filas(minimo, maximo)
+        contar_filas(escaneadas=len(filas))
+        return responder_pacientes(store, filas, limit, cursor, formato)
+
+    return responder_cacheado(request, (nombre, minimo, maximo, solo_conteo, limit, cursor, formato), construir)
 
 @app.get('/pacientes/por_estancia/', tags=['pacientes'])
-def get_pacientes_por_Estancia(estancia: int):
-    return [m for m in pacientes_list if isinstance(m['Estancia (días)'], (int, float)) and m['Estancia (días)'] == estancia]
+def get_pacientes_por_Estancia(
+    request: Request,
+    estancia: Optional[int] = Query(None, description="Estancia exacta en días"),
+    minimo: Optional[float] = Query(None, alias="min", description="Estancia mínima en días (inclusive)"),
+    maximo: Optional[float] = Query(None, alias="max", description="Estancia máxima en días (inclusive)"),
+    solo_conteo: bool = False,
+    limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY
+):
+    if estancia is not None:
+        minimo = maximo = estancia
+    indice = obtener_store().indice_estancia
+    return responder_rango(request, 'por_estancia', indice, minimo, maximo, solo_conteo, limit, cursor, formato)
+
+@app.get('/pacientes/por_edad/', tags=['pacientes'])
+def get_pacientes_por_edad(
+    request: Request,
+    minimo: Optional[float] = Query(None, alias="min", description="Edad mínima en años (inclusive)"),
+    maximo: Optional[float] = Query(None, alias="max", description="Edad máxima en años (inclusive)"),
+    solo_conteo: bool = False,
+    limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY
+):
+    indice = obtener_store().indice_edad
+    return responder_rango(request, 'por_edad', indice, minimo, maximo, solo_conteo, limit, cursor, formato)
+
+FUZZY_QUERY = Query(False, description="Tolera errores de tipeo en la enfermedad")
+MAX_EDICIONES_QUERY = Query(None, ge=0, le=3, description="Ediciones admitidas con fuzzy=true (por omisión 1 o 2 según el largo)")
 
 @app.get('/pacientes/por_enfermedad/', tags=['pacientes'])
-def get_pacientes_por_enfermedad(enfermedad: str):
-    resultados = [m for m in pacientes_list if 'Enfermedad' in m and isinstance(m['Enfermedad'], str) and enfermedad.lower() in m['Enfermedad'].lower()]
-    
-    if not resultados:
-        return {"mensaje": "No hay datos disponibles para la enfermedad"}
-    
-    return resultados
+def get_pacientes_por_enfermedad(
+    request: Request,
+    enfermedad: str,
+    fuzzy: bool = FUZZY_QUERY,
+    max_ediciones: Optional[int] = MAX_EDICIONES_QUERY,
+    limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY
+):
+    store = obtener_store()
+    if fuzzy and max_ediciones is None:
+        max_ediciones = ediciones_por_omision(enfermedad)
+
+    def construir():
+        if fuzzy:
+            filas, coincidencias = filtrar_aproximado(store.enfermedad, enfermedad, max_ediciones)
+        else:
+            filas = filtrar_por_texto(store.enfermedad, enfermedad)
+        if not len(filas):
+            return {"mensaje": "No hay datos disponibles para la enfermedad"}
+        respuesta = responder_pacientes(store, filas, limit, cursor, formato)
+        if fuzzy:
+            # Valores encontrados y su distancia, sin cambiar el formato del listado
+            respuesta.headers['X-Coincidencias'] = describir_coincidencias(coincidencias)
+        return respuesta
+
+    clave = ('por_enfermedad', normalizar(enfermedad), max_ediciones if fuzzy else None, limit, cursor, formato)
+    return responder_cacheado(request, clave, construir)
+
+def predicados_consulta(
+    store: PacientesStore,
+    id: Optional[str],
+    enfermedad: Optional[str],
+    servicio: Optional[str],
+    genero: Optional[str],
+    edad_min: Optional[float],
+    edad_max: Optional[float],
+    estancia_min: Optional[float],
+    estancia_max: Optional[float],
+    desde: Optional[date],
+    hasta: Optional[date]
+) -> List[Predicado]:
+    """Predicados de los filtros indicados (los None se omiten) de /pacientes/consulta/ y /pacientes/exportar/."""
+    predicados = []
+    if id is not None:
+        predicados.append(PredicadoId(store, id))
+    for nombre, columna, texto in (('enfermedad', store.enfermedad, enfermedad), ('servicio', store.servicio, servicio), ('genero', store.genero, genero)):
+        if texto is not None:
+            predicados.append(PredicadoCategoria(nombre, columna, texto))
+    for nombre, valores, indice, minimo, maximo in (
+        ('edad', store.edad, store.indice_edad, edad_min, edad_max),
+        ('estancia', store.estancia, store.indice_estancia, estancia_min, estancia_max),
+    ):
+        if minimo is not None or maximo is not None:
+            validar_limites(minimo, maximo, f'{nombre}_min', f'{nombre}_max')
+            predicados.append(PredicadoRango(describir_rango(nombre, minimo, maximo), valores, indice, minimo, maximo))
+    if desde is not None or hasta is not None:
+        if desde is not None and hasta is not None and desde > hasta:
+            raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+        minimo, maximo = (None if fecha is None else float(np.datetime64(fecha, 'D').astype(np.int64)) for fecha in (desde, hasta))
+        predicados.append(PredicadoRango(
+            describir_rango('fecha_entrada', desde, hasta), store.dias_entrada, store.indice_fecha_entrada, minimo, maximo
+        ))
+    return predicados
+
+@app.get('/pacientes/consulta/', tags=['pacientes'])
+def get_consulta_pacientes(
+    request: Request,
+    id: Optional[str] = None,
+    enfermedad: Optional[str] = None,
+    servicio: Optional[str] = None,
+    genero: Optional[str] = Query(None, description="'F' o 'M'"),
+    edad_min: Optional[float] = None,
+    edad_max: Optional[float] = None,
+    estancia_min: Optional[float] = None,
+    estancia_max: Optional[float] = None,
+    desde: Optional[date] = Query(None, description="Fecha de entrada mínima (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Fecha de entrada máxima (AAAA-MM-DD)"),
+    explain: bool = Query(False, description="Devuelve el plan elegido con sus estimaciones en lugar de las filas"),
+    limit: Optional[int] = LIMIT_QUERY, cursor: Optional[int] = CURSOR_QUERY, formato: str = FORMATO_QUERY
+):
+    store = obtener_store()
+    predicados = predicados_consulta(
+        store, id, enfermedad, servicio, genero, edad_min, edad_max, estancia_min, estancia_max, desde, hasta
+    )
+    if not predicados:
+        raise HTTPException(status_code=400, detail="Indique al menos un filtro")
+
+    if explain:
+        inicio = time.perf_counter()
+        filas, plan = ejecutar_consulta(len(store), predicados)
+        return {**plan, "pacientes": len(filas), "tiempo_ms": round((time.perf_counter() - inicio) * 1000, 3)}
+
+    def construir():
+        filas, _ = ejecutar_consulta(len(store), predicados)
+        return responder_pacientes(store, filas, limit, cursor, formato)
+
+    clave = ('consulta', id, *(normalizar(t) if t is not None else None for t in (enfermedad, servicio, genero)),
+             edad_min, edad_max, estancia_min, estancia_max, desde, hasta, limit, cursor, formato)
+    return responder_cacheado(request, clave, construir)
+
+@app.get('/pacientes/exportar/', tags=['pacientes'])
+def get_exportar_pacientes(
+    formato: str = Query('csv', pattern='^(csv|arrow|parquet)$', description="'csv' (esquema del dataset), 'arrow' (IPC) o 'parquet'"),
+    id: Optional[str] = None,
+    enfermedad: Optional[str] = None,
+    servicio: Optional[str] = None,
+    genero: Optional[str] = Query(None, description="'F' o 'M'"),
+    edad_min: Optional[float] = None,
+    edad_max: Optional[float] = None,
+    estancia_min: Optional[float] = None,
+    estancia_max: Optional[float] = None,
+    desde: Optional[date] = Query(None, description="Fecha de entrada mínima (AAAA-MM-DD)"),
+    hasta: Optional[date] = Query(None, description="Fecha de entrada máxima (AAAA-MM-DD)")
+):
+    if formato != 'csv' and pa is None:
+        raise HTTPException(status_code=501, detail=f"El formato '{formato}' requiere pyarrow")
+    store = obtener_store()
+    predicados = predicados_consulta(
+        store, id, enfermedad, servicio, genero, edad_min, edad_max, estancia_min, estancia_max, desde, hasta
+    )
+    # Sin filtros se exporta el dataset completo
+    filas = ejecutar_consulta(len(store), predicados)[0] if predicados else np.arange(len(store))
+    contar_filas(devueltas=len(filas))
+
+    tipo, extension = FORMATOS_EXPORTACION[formato]
+    contenido = generar_csv(store, filas) if formato == 'csv' else generar_columnar(store, filas, formato)
+    return StreamingResponse(
+        contenido,
+        media_type=tipo,
+        headers={'Content-Disposition': f'attachment; filename="pacientes.{extension}"', 'X-Total-Filas': str(len(filas))}
+    )
 
 @app.get("/pacientes/promedio_estancia_por_enfermedad/", tags=["pacientes"])
-def get_promedio_Estancia_por_enfermedad(enfermedad: str):
-    estancia_list = []
-    for paciente in pacientes_list:
-        if paciente["Enfermedad"].lower() == enfermedad.lower():
-            try:
-                estancia = float(paciente["Estancia (días)"])
-                if estancia > 0:
-                    estancia_list.append(estancia)
-            except ValueError:
-                continue
-    if not estancia_list:
+def get_promedio_Estancia_por_enfermedad(
+    request: Request,
+    enfermedad: str,
+    fuzzy: bool = FUZZY_QUERY,
+    max_ediciones: Optional[int] = MAX_EDICIONES_QUERY
+):
+    store = obtener_store()
+    if fuzzy and max_ediciones is None:
+        max_ediciones = ediciones_por_omision(enfermedad)
+
+    def construir():
+        estadisticas = store.cubo_estancias.consultar(enfermedad=enfermedad)
+        if estadisticas is not None:
+            return {"enfermedad": enfermedad, "promedio_Estancia_(días)": estadisticas['promedio_estancia']}
+        if fuzzy:
+            # Sin coincidencia exacta se usa el diagnóstico más cercano
+            for clave, distancia, codigos in store.enfermedad.buscar_aproximado(enfermedad, max_ediciones):
+                estadisticas = store.cubo_estancias.consultar(enfermedad=clave)
+                if estadisticas is not None:
+                    return {
+                        "enfermedad": enfermedad,
+                        "enfermedad_encontrada": store.enfermedad.categorias[codigos[0]],
+                        "distancia": distancia,
+                        "promedio_Estancia_(días)": estadisticas['promedio_estancia']
+                    }
         return {"message": f"No hay datos disponibles para la enfermedad '{enfermedad}'"}
-    promedio_estancia = round(sum(estancia_list) / len(estancia_list), 2)
-    return {"enfermedad": enfermedad, "promedio_Estancia_(días)": promedio_estancia}
+
+    # La respuesta repite el texto recibido, así que la clave no se normaliza
+    clave = ('promedio_estancia_por_enfermedad', enfermedad, max_ediciones if fuzzy else None)
+    return responder_cacheado(request, clave, construir)
+
+@app.get("/pacientes/estadisticas_estancia/", tags=["pacientes"])
+def get_estadisticas_estancia(
+    enfermedad: Optional[str] = None,
+    servicio: Optional[str] = None,
+    genero: Optional[str] = None,
+    banda_edad: Optional[str] = Query(None, description=f"Una de: {', '.join(BANDAS_EDAD + [BANDA_SIN_DATO])}")
+):
+    if banda_edad is not None and banda_edad not in BANDAS_EDAD + [BANDA_SIN_DATO]:
+        raise HTTPException(status_code=400, detail=f"Banda de edad no válida: '{banda_edad}'")
+    filtros = {"enfermedad": enfermedad, "servicio": servicio, "genero": genero, "banda_edad": banda_edad}
+    estadisticas = obtener_store().cubo_estancias.consultar(**filtros)
+    if estadisticas is None:
+        return {"mensaje": "No hay datos disponibles para los filtros indicados"}
+    return {**{k: v for k, v in filtros.items() if v is not None}, **estadisticas}
+
+@app.get("/pacientes/distribucion_estancia/", tags=["pacientes"])
+def get_distribucion_estancia(request: Request, enfermedad: Optional[str] = None, servicio: Optional[str] = None):
+    def construir():
+        distribucion = obtener_store().sketches_estancia.consultar(enfermedad, servicio)
+        if distribucion is None:
+            return {"mensaje": "No hay datos disponibles para los filtros indicados"}
+        filtros = {"enfermedad": enfermedad, "servicio": servicio}
+        return {**{k: v for k, v in filtros.items() if v is not None}, **distribucion}
+
+    # La respuesta repite los textos recibidos, así que la clave no se normaliza
+    return responder_cacheado(request, ('distribucion_estancia', enfermedad, servicio), construir)
+
+@app.get("/pacientes/censo_camas/", tags=["pacientes"])
+def get_censo_camas(
+    desde: Optional[date] = Query(None, description="Primer día (AAAA-MM-DD); por defecto, el primer ingreso"),
+    hasta: Optional[date] = Query(None, description="Último día (AAAA-MM-DD); por defecto, la última fecha del dataset"),
+    servicio: Optional[str] = None,
+    por_servicio: bool = False
+):
+    censo = obtener_store().censo
+    inicio = np.datetime64(desde, 'D') if desde else censo.inicio
+    fin = np.datetime64(hasta, 'D') if hasta else censo.ultimo
+    if fin < inicio:
+        raise HTTPException(status_code=400, detail="La fecha 'hasta' debe ser posterior a 'desde'")
+    if int((fin - inicio).astype(int)) + 1 > MAX_DIAS_CENSO:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_DIAS_CENSO} días")
+
+    grupos = list(range(len(censo.claves)))
+    if servicio is not None:
+        grupos = [g for g in grupos if normalizar(servicio) in censo.claves[g]]
+        if not grupos:
+            return {"mensaje": "No hay datos disponibles para el servicio"}
+
+    serie = censo.serie(inicio, fin)[grupos]
+    respuesta = {
+        "desde": str(inicio),
+        "hasta": str(fin),
+        "fechas": np.arange(inicio, fin + 1).astype(str).tolist(),
+        "ocupadas": serie.sum(axis=0).tolist(),
+        "estancias_descartadas": censo.descartadas
+    }
+    if por_servicio:
+        respuesta["por_servicio"] = {censo.etiquetas[g] or "sin servicio": serie[i].tolist() for i, g in enumerate(grupos)}
+    return respuesta
+
+@app.get("/pacientes/altas_proyectadas/", tags=["pacientes"])
+def get_altas_proyectadas(
+    fecha: Optional[date] = Query(None, description="Día a proyectar (AAAA-MM-DD); por defecto, hoy"),
+    corte: Optional[date] = Query(None, description="Último día con información conocida; por defecto, el día anterior a 'fecha'")
+):
+    dia = np.datetime64(fecha or date.today(), 'D')
+    ultimo_conocido = np.datetime64(corte, 'D') if corte else dia - np.timedelta64(1, 'D')
+    if ultimo_conocido >= dia:
+        raise HTTPException(status_code=400, detail="El 'corte' debe ser anterior a la fecha proyectada")
+    return proyectar_altas(obtener_store(), dia, ultimo_conocido)
+
+@app.get("/metrics", tags=["metricas"])
+def get_metrics():
+    return PlainTextResponse(METRICAS.exponer() + cache_respuestas.exponer(), media_type="text/plain; version=0.0.4")
+
+@app.post("/metrics/perfilador", tags=["metricas"])
+def post_perfilador(activo: bool, reiniciar: bool = False, x_token_admin: Optional[str] = Header(None)):
+    if not TOKEN_ADMIN_PERFILADOR:
+        raise HTTPException(status_code=403, detail="El control del perfilador está deshabilitado (falta TOKEN_ADMIN_PERFILADOR)")
+    if x_token_admin is None or not hmac.compare_digest(x_token_admin, TOKEN_ADMIN_PERFILADOR):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+    if reiniciar:
+        perfilador.reiniciar()
+    if activo:
+        perfilador.iniciar()
+    else:
+        perfilador.detener()
+    return {"activo": perfilador.activo, "muestras": perfilador.muestras}
+
+@app.get("/metrics/perfilador", tags=["metricas"])
+def get_perfilador(maximo: int = Query(50, ge=1, le=1000)):
+    return PlainTextResponse(perfilador.exponer(maximo))
+
+class MensajeChat(BaseModel):
+    mensaje: str
+    contexto: Optional[str] = None
+
+@app.post("/chat", tags=["chat"])
+def post_chat(entrada: MensajeChat):
+    if not entrada.mensaje.strip():
+        raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
+    return responder_chat(entrada.mensaje, entrada.contexto)
+
+# ======================================================
+# ARRANQUE
+# ======================================================
+
+if RECARGA_AUTOMATICA and MODO_DATOS == "local" and __name__ != "__main__":
+    iniciar_vigilante()
+
+if PERFILADOR_ACTIVO:
+    perfilador.iniciar()
+
+if MODO_NLP == "inmediato":
+    try:
+        cargar_wordnet()
+    except RuntimeError as e:
+        logger.warning(str(e))
+
+# Tiempo hasta que la API puede atender /pacientes, comparado con el presupuesto
+tiempo_arranque_ms = (time.perf_counter() - _inicio_arranque) * 1000
+if tiempo_arranque_ms > PRESUPUESTO_ARRANQUE_MS:
+    logger.warning(
+        "Arranque en %.0f ms, por encima del presupuesto de %.0f ms",
+        tiempo_arranque_ms, PRESUPUESTO_ARRANQUE_MS
+    )
+else:
+    logger.info("Arranque en %.0f ms", tiempo_arranque_ms)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Herramientas del dataset de pacientes hospitalizados")
+    parser.add_argument(
+        "--publicar",
+        action="store_true",
+        help="Publica el dataset como nueva generación para los workers en MODO_DATOS=compartido"
+    )
+    parser.add_argument(
+        "--vigilar",
+        action="store_true",
+        help="Junto con --publicar, sigue vigilando el CSV y publica cada cambio"
+    )
+    argumentos = parser.parse_args()
+
+    if argumentos.publicar:
+        print(f"Generación publicada: {publicar_generacion(pacientes_store)}")
+        if argumentos.vigilar:
+            vigilar_csv(INTERVALO_RECARGA_S, al_recargar=publicar_generacion)
+    else:
+        parser.print_help()
@@ -0,0 +1,80 @@
+"""
+Configuración común de las pruebas.
+
+main.py carga los datos al importarse, así que antes de importarlo se apunta
+a una copia temporal del dataset (las escrituras y snapshots no tocan
+Dataset/) y se fija el directorio de trabajo en la raíz para montar Static/.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_ORIGINAL = os.path.join(RAIZ, 'Dataset', 'Dataset_Pacientes_LOS.csv')
+
+
+def entorno_temporal(directorio: str) -> dict:
+    """Variables de entorno para importar main.py sobre una copia del dataset en `directorio`."""
+    ruta_csv = os.path.join(directorio, 'pacientes.csv')
+    if not os.path.exists(ruta_csv):
+        shutil.copy(CSV_ORIGINAL, ruta_csv)
+    return {
+        'RUTA_CSV': ruta_csv,
+        'RUTA_DIARIO': ruta_csv + '.diario',
+        'USAR_SNAPSHOT': '0',
+        'MODO_DATOS': 'local',
+        'RECARGA_AUTOMATICA': '0',
+        'INTERVALO_COMPACTACION_S': '3600',
+    }
+
+
+def ejecutar(directorio, codigo: str, **variables: str) -> str:
+    """
+    Ejecuta `codigo` en un proceso nuevo que importa main sobre el dataset de `directorio`.
+
+    Las `variables` se agregan al entorno del proceso. Devuelve lo que imprimió.
+    """
+    entorno = {**os.environ, **entorno_temporal(str(directorio)), **variables}
+    resultado = subprocess.run(
+        [sys.executable, '-c', textwrap.dedent(codigo)],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True, timeout=300,
+    )
+    assert resultado.returncode == 0, resultado.stderr
+    return resultado.stdout
+
+
+def registros_csv(df) -> list:
+    """Registros que la API debería devolver para las filas de `df`, leídas del CSV con pandas."""
+    columnas = {'Edad': 'Edad (años)', 'Estancia': 'Estancia (días)'}
+    registros = []
+    for fila in df.astype(object).itertuples(index=False):
+        registro = {}
+        for columna, valor in zip(df.columns, fila):
+            if valor is None or valor != valor:
+                valor = ''
+            elif columna == 'Estancia':
+                valor = int(valor) if float(valor).is_integer() else float(valor)
+            else:
+                valor = str(valor)
+            registro[columnas.get(columna, columna)] = valor
+        registros.append(registro)
+    return registros
+
+
+os.environ.update(entorno_temporal(tempfile.mkdtemp(prefix='pacientes_pruebas_')))
+os.chdir(RAIZ)
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(scope='session')
+def cliente():
+    """Cliente HTTP sobre la app, cargada con la copia temporal del dataset."""
+    from fastapi.testclient import TestClient
+
+    import main
+    return TestClient(main.app)
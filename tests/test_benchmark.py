@@ -0,0 +1,50 @@
+"""Consultas del benchmark y comparación con la línea base."""
+import asyncio
+
+import pandas as pd
+
+import benchmark
+import main
+from generar_dataset import generar_dataset
+
+# Consultas que pasan por la caché de respuestas
+CACHEADAS = {
+    'por_servicio', 'por_enfermedad', 'por_enfermedad_fuzzy', 'por_estancia', 'por_estancia_rango',
+    'por_edad_conteo', 'consulta_compuesta', 'promedio_estancia', 'distribucion_estancia',
+}
+
+
+def test_consultas_del_benchmark(cliente):
+    presupuesto = main.cache_respuestas.presupuesto
+    resultados = asyncio.run(benchmark.medir_endpoints(main.app, main.cache_respuestas, len(main.obtener_store()), 3))
+    assert list(resultados) == [nombre for nombre, *_ in benchmark.consultas(len(main.obtener_store()))]
+    for nombre, metricas in resultados.items():
+        assert 0 < metricas['p50_ms'] <= metricas['p99_ms'], nombre
+        assert ('cache_p50_ms' in metricas) == (nombre in CACHEADAS), nombre
+    assert main.cache_respuestas.presupuesto == presupuesto
+
+
+def test_generar_dataset(tmp_path):
+    ruta = str(tmp_path / 'sintetico.csv')
+    generar_dataset(2000, ruta, semilla=3, origen=main.RUTA_CSV)
+    df = pd.read_csv(ruta, **main.OPCIONES_CSV)
+    assert len(df) == 2000
+    assert df['id'].is_unique
+    store = main.construir_store(df)
+    assert len(store) == 2000
+    assert main.lineas_no_conservadas(ruta) == 0
+
+
+def test_comparar_con_linea_base():
+    base = {'carga_csv_ms': 100.0, 'pico_rss_mb': 50.0, 'endpoints': {'a': {'p50_ms': 2.0, 'p99_ms': 4.0}}}
+    assert benchmark.comparar({'10': base}, {'10': base}, 1.5) == []
+
+    peor = {'carga_csv_ms': 160.0, 'pico_rss_mb': 76.0, 'endpoints': {'a': {'p50_ms': 2.4, 'p99_ms': 7.0}, 'b': {'p50_ms': 1.0}}}
+    regresiones = benchmark.comparar({'10': peor, '20': base}, {'10': base}, 1.5)
+    assert any(r.startswith('10 filas, carga_csv_ms') for r in regresiones)
+    assert any(r.startswith('10 filas, pico_rss_mb') for r in regresiones)
+    assert any(r.startswith('10 filas, a.p99_ms') for r in regresiones)
+    # Dentro de la tolerancia (y del margen absoluto) no es regresión
+    assert not any('a.p50_ms' in r for r in regresiones)
+    assert any(r.startswith('10 filas, b.p50_ms') and 'sin línea base' in r for r in regresiones)
+    assert any(r.startswith('20 filas: sin línea base') for r in regresiones)
@@ -0,0 +1,138 @@
+"""Búsquedas por id, por subcadena de enfermedad o servicio y aproximadas."""
+import pandas as pd
+import pytest
+
+import main
+from conftest import registros_csv
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+
+
+# ======================================================
+# BÚSQUEDA POR ID
+# ======================================================
+
+def test_paciente_por_id(cliente, df):
+    for id, esperado in zip(df['id'], registros_csv(df)):
+        respuesta = cliente.get(f'/pacientes/{id}')
+        assert respuesta.status_code == 200
+        assert respuesta.json() == esperado
+
+
+def test_paciente_inexistente(cliente):
+    respuesta = cliente.get('/pacientes/no-existe')
+    assert respuesta.status_code == 200
+    assert respuesta.json() == {'detalle': 'paciente no encontrado'}
+
+
+def test_id_duplicado(cliente, df, monkeypatch):
+    duplicado = pd.concat([df, df.iloc[[4]]], ignore_index=True)
+    monkeypatch.setattr(main, 'obtener_store', lambda: main.construir_store(duplicado))
+    respuesta = cliente.get(f"/pacientes/{df['id'][4]}")
+    assert respuesta.status_code == 409
+    assert '2 registros' in respuesta.json()['detail']
+    assert cliente.get(f"/pacientes/{df['id'][5]}").json() == registros_csv(df.iloc[[5]])[0]
+
+
+# ======================================================
+# BÚSQUEDA POR SUBCADENA
+# ======================================================
+
+def contiene(serie: pd.Series, texto: str) -> pd.Series:
+    """Filas cuyo valor no vacío contiene `texto` sin tildes ni mayúsculas."""
+    serie = serie.astype(object)
+    return serie.notna() & serie.fillna('').map(main.normalizar).str.contains(main.normalizar(texto), regex=False)
+
+
+@pytest.mark.parametrize('ruta, columna, texto', [
+    ('por_servicio', 'Servicio', 'pediatria'),
+    ('por_servicio', 'Servicio', 'PEDIATRÍA'),
+    ('por_servicio', 'Servicio', 'log'),
+    ('por_servicio', 'Servicio', 'ia'),
+    ('por_enfermedad', 'Enfermedad', 'malaria'),
+    ('por_enfermedad', 'Enfermedad', 'Bronquítis'),
+    ('por_enfermedad', 'Enfermedad', 'aguda'),
+    ('por_enfermedad', 'Enfermedad', 'f c'),
+])
+def test_busqueda_por_subcadena(cliente, df, ruta, columna, texto):
+    esperados = registros_csv(df[contiene(df[columna], texto)])
+    assert esperados
+    respuesta = cliente.get(f'/pacientes/{ruta}/', params={columna.lower(): texto, 'limit': main.LIMITE_MAXIMO})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == esperados
+
+
+@pytest.mark.parametrize('ruta, parametro, mensaje', [
+    ('por_servicio', 'servicio', 'No hay datos disponibles para el servicio'),
+    ('por_enfermedad', 'enfermedad', 'No hay datos disponibles para la enfermedad'),
+])
+def test_busqueda_sin_coincidencias(cliente, ruta, parametro, mensaje):
+    respuesta = cliente.get(f'/pacientes/{ruta}/', params={parametro: 'zzzz'})
+    assert respuesta.json() == {'mensaje': mensaje}
+
+
+# ======================================================
+# BÚSQUEDA APROXIMADA
+# ======================================================
+
+def levenshtein(a: str, b: str) -> int:
+    """Programación dinámica clásica, fila por fila."""
+    anterior = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        actual = [i]
+        for j, y in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (x != y)))
+        anterior = actual
+    return anterior[-1]
+
+
+def distancias_pandas(df: pd.DataFrame, texto: str, max_ediciones: int) -> dict:
+    """Distancia de cada enfermedad aceptada: 0 si contiene el texto, si no la de edición."""
+    buscado = main.normalizar(texto)
+    distancias = {}
+    for valor in df['Enfermedad'].dropna().map(main.normalizar).unique():
+        distancia = 0 if buscado in valor else levenshtein(valor, buscado)
+        if distancia <= max_ediciones:
+            distancias[valor] = distancia
+    return distancias
+
+
+@pytest.mark.parametrize('texto, max_ediciones', [
+    ('palustosiss', None),
+    ('malarria', None),
+    ('diabetis', 1),
+    ('hernai', 2),
+    ('KOD', 0),
+    ('bronquitis aguda', 3),
+])
+def test_busqueda_aproximada(cliente, df, texto, max_ediciones):
+    ediciones = main.ediciones_por_omision(texto) if max_ediciones is None else max_ediciones
+    distancias = distancias_pandas(df, texto, ediciones)
+    assert distancias
+    parametros = {'enfermedad': texto, 'fuzzy': True, 'limit': main.LIMITE_MAXIMO}
+    if max_ediciones is not None:
+        parametros['max_ediciones'] = max_ediciones
+    respuesta = cliente.get('/pacientes/por_enfermedad/', params=parametros)
+    assert respuesta.status_code == 200
+    aceptadas = df['Enfermedad'].astype(object).fillna('').map(main.normalizar).isin(distancias)
+    assert respuesta.json() == registros_csv(df[aceptadas])
+    ordenadas = sorted(distancias.items(), key=lambda par: (par[1], par[0]))
+    assert respuesta.headers['x-coincidencias'] == ', '.join(f'{clave}={distancia}' for clave, distancia in ordenadas)
+
+
+def test_busqueda_aproximada_sin_coincidencias(cliente):
+    respuesta = cliente.get('/pacientes/por_enfermedad/', params={'enfermedad': 'zzzzzzzz', 'fuzzy': True})
+    assert respuesta.json() == {'mensaje': 'No hay datos disponibles para la enfermedad'}
+    # Sin fuzzy un error de tipeo no encuentra nada
+    respuesta = cliente.get('/pacientes/por_enfermedad/', params={'enfermedad': 'palustosiss'})
+    assert respuesta.json() == {'mensaje': 'No hay datos disponibles para la enfermedad'}
+    assert 'x-coincidencias' not in respuesta.headers
+
+
+@pytest.mark.parametrize('max_ediciones', [-1, 4])
+def test_busqueda_aproximada_ediciones_invalidas(cliente, max_ediciones):
+    parametros = {'enfermedad': 'malaria', 'fuzzy': True, 'max_ediciones': max_ediciones}
+    assert cliente.get('/pacientes/por_enfermedad/', params=parametros).status_code == 422
@@ -0,0 +1,81 @@
+"""Caché de respuestas, ETag y respuestas condicionales entre generaciones."""
+import main
+from conftest import ejecutar
+
+
+def test_generacion_anterior_no_vacia_la_cache():
+    cache = main.CacheRespuestas(1024)
+    entrada = (b'{}', '"e"', {})
+    cache.guardar(2, ('a',), entrada)
+
+    # Una petición fijada a la generación anterior no lee, no guarda ni vacía
+    assert cache.obtener(1, ('a',)) is None
+    cache.guardar(1, ('b',), entrada)
+    assert cache.obtener(2, ('a',)) == entrada
+    assert cache.obtener(2, ('b',)) is None
+
+    # Una generación más nueva sí la reemplaza
+    assert cache.obtener(3, ('a',)) is None
+    assert cache.bytes == 0
+    cache.guardar(3, ('a',), entrada)
+    assert cache.obtener(3, ('a',)) == entrada
+
+
+def test_etag_y_respuesta_304(cliente):
+    url = '/pacientes/por_servicio/?servicio=pediatria&limit=20'
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 200
+    etag = respuesta.headers['etag']
+    cursor = respuesta.headers['x-siguiente-cursor']
+
+    aciertos = main.cache_respuestas.aciertos
+    repetida = cliente.get(url)
+    assert (repetida.content, repetida.headers['etag']) == (respuesta.content, etag)
+    assert main.cache_respuestas.aciertos == aciertos + 1
+
+    for condicion in (etag, f'"otro", {etag}', '*'):
+        condicional = cliente.get(url, headers={'If-None-Match': condicion})
+        assert condicional.status_code == 304
+        assert condicional.content == b''
+        assert condicional.headers['etag'] == etag
+        assert condicional.headers['x-siguiente-cursor'] == cursor
+
+    assert cliente.get(url, headers={'If-None-Match': '"otro"'}).status_code == 200
+    # Otra página es otra entrada con su propio ETag
+    assert cliente.get(url + f'&cursor={cursor}').headers['etag'] != etag
+
+
+def test_streaming_no_se_cachea(cliente):
+    respuesta = cliente.get('/pacientes/por_servicio/?servicio=pediatria&formato=ndjson')
+    assert respuesta.status_code == 200
+    assert 'etag' not in respuesta.headers
+
+
+def test_escritura_invalida_las_respuestas(tmp_path):
+    ejecutar(tmp_path, """
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+    pediatria = cliente.get('/pacientes/por_servicio/?servicio=pediatria')
+    neonatologia = cliente.get('/pacientes/por_servicio/?servicio=neonatologia')
+    assert pediatria.headers['x-generacion-datos'] == '1'
+
+    respuesta = cliente.post('/pacientes', json={
+        'id': 'prueba-1', 'fecha_entrada': '2020-01-01', 'genero': 'F', 'edad': 4,
+        'enfermedad': 'Gripe', 'servicio': 'Pediatria',
+    })
+    assert respuesta.status_code == 201
+
+    # La generación nueva no reutiliza la respuesta guardada
+    nueva = cliente.get('/pacientes/por_servicio/?servicio=pediatria', headers={'If-None-Match': pediatria.headers['etag']})
+    assert nueva.status_code == 200
+    assert nueva.headers['x-generacion-datos'] == '2'
+    assert nueva.headers['etag'] != pediatria.headers['etag']
+    assert nueva.json()[-1]['id'] == 'prueba-1'
+    assert len(nueva.json()) == len(pediatria.json()) + 1
+
+    # El ETag depende del contenido: lo que no cambió sigue validando
+    igual = cliente.get('/pacientes/por_servicio/?servicio=neonatologia', headers={'If-None-Match': neonatologia.headers['etag']})
+    assert igual.status_code == 304
+    """)
@@ -0,0 +1,141 @@
+"""Censo diario de camas y altas proyectadas, contrastados con pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+    df['servicio'] = df['Servicio'].astype(object).fillna('').astype(str).map(main.normalizar)
+    df['enfermedad'] = df['Enfermedad'].astype(object).fillna('').astype(str).map(main.normalizar)
+    entrada = pd.to_datetime(df['fecha_entrada'], format='%m/%d/%Y', errors='coerce')
+    alta = pd.to_datetime(df['fecha_alta'], format='%m/%d/%Y', errors='coerce')
+    df['estancia'] = pd.to_numeric(df['Estancia'], errors='coerce')
+    calculada = entrada + pd.to_timedelta(df['estancia'].where(df['estancia'] >= 0), unit='D')
+    df['entrada'] = entrada
+    df['fin'] = alta.where(alta >= entrada, calculada)
+    return df
+
+
+def hospitalizados(df, dia):
+    """Filas que ocupan cama el día `dia`: entrada <= dia < fin (o sin fin)."""
+    return (df['entrada'] <= dia) & (df['fin'].isna() | (df['fin'] > dia))
+
+
+# ======================================================
+# CENSO DE CAMAS
+# ======================================================
+
+@pytest.mark.parametrize('desde, hasta', [
+    ('2019-01-01', '2019-12-31'),
+    ('2009-12-25', '2010-01-20'),
+    ('2021-09-01', '2021-10-15'),
+])
+def test_censo_igual_a_pandas(cliente, df, desde, hasta):
+    respuesta = cliente.get('/pacientes/censo_camas/', params={'desde': desde, 'hasta': hasta, 'por_servicio': True})
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    dias = pd.date_range(desde, hasta)
+    assert datos['fechas'] == [str(dia.date()) for dia in dias]
+    assert datos['ocupadas'] == [int(hospitalizados(df, dia).sum()) for dia in dias]
+
+    etiquetas = df['Servicio'].astype(object).groupby(df['servicio']).first().fillna('sin servicio').to_dict()
+    for clave, etiqueta in etiquetas.items():
+        filas = df[df['servicio'] == clave]
+        assert datos['por_servicio'][etiqueta] == [int(hospitalizados(filas, dia).sum()) for dia in dias], etiqueta
+
+
+def test_censo_de_un_servicio(cliente, df):
+    datos = cliente.get('/pacientes/censo_camas/', params={'desde': '2020-03-01', 'hasta': '2020-03-31', 'servicio': 'PEDIATRÍA'}).json()
+    pediatria = df[df['servicio'] == 'pediatria']
+    assert datos['ocupadas'] == [int(hospitalizados(pediatria, dia).sum()) for dia in pd.date_range('2020-03-01', '2020-03-31')]
+    assert 'por_servicio' not in datos
+
+
+def test_censo_rango_por_omision(cliente, df):
+    datos = cliente.get('/pacientes/censo_camas/').json()
+    assert datos['desde'] == str(df['entrada'].min().date())
+    assert datos['hasta'] == str(max(df['entrada'].max(), df['fin'].max()).date())
+    assert datos['ocupadas'][0] == int(hospitalizados(df, df['entrada'].min()).sum())
+
+
+@pytest.mark.parametrize('parametros, codigo', [
+    ({'desde': '2019-02-01', 'hasta': '2019-01-01'}, 400),
+    ({'desde': '1900-01-01', 'hasta': '2019-01-01'}, 400),
+    ({'desde': '2019-02-30'}, 422),
+])
+def test_censo_parametros_invalidos(cliente, parametros, codigo):
+    assert cliente.get('/pacientes/censo_camas/', params=parametros).status_code == codigo
+
+
+def test_censo_servicio_inexistente(cliente):
+    datos = cliente.get('/pacientes/censo_camas/', params={'servicio': 'zzzz'}).json()
+    assert datos == {'mensaje': 'No hay datos disponibles para el servicio'}
+
+
+# ======================================================
+# ALTAS PROYECTADAS
+# ======================================================
+
+def probabilidad_alta(df, paciente, corte, fecha):
+    """
+    P(estancia = días hasta `fecha` | estancia > días hasta `corte`) con el nivel
+    más específico (enfermedad+servicio, enfermedad, global) que conserve al
+    menos MIN_MUESTRAS_ESTANCIA estancias más largas que lo transcurrido.
+    """
+    validas = df[df['estancia'].notna() & (df['estancia'] >= 0)]
+    transcurridos = (corte - paciente['entrada']).days
+    hasta_alta = (fecha - paciente['entrada']).days
+    niveles = [
+        validas[(validas['enfermedad'] == paciente['enfermedad']) & (validas['servicio'] == paciente['servicio'])],
+        validas[validas['enfermedad'] == paciente['enfermedad']],
+        validas,
+    ]
+    for nivel in niveles:
+        restantes = int((nivel['estancia'] > transcurridos).sum())
+        if restantes >= main.MIN_MUESTRAS_ESTANCIA or nivel is niveles[-1]:
+            return (nivel['estancia'] == hasta_alta).sum() / restantes if restantes else 0.0
+
+
+@pytest.mark.parametrize('fecha, corte', [
+    ('2019-06-02', None),
+    ('2020-11-15', None),
+    ('2020-11-15', '2020-11-10'),
+])
+def test_altas_proyectadas_igual_a_pandas(cliente, df, fecha, corte):
+    parametros = {'fecha': fecha, **({'corte': corte} if corte else {})}
+    respuesta = cliente.get('/pacientes/altas_proyectadas/', params=parametros)
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+
+    fecha = pd.Timestamp(fecha)
+    corte = pd.Timestamp(corte) if corte else fecha - pd.Timedelta(days=1)
+    pacientes = df[hospitalizados(df, corte)]
+    assert len(pacientes)
+    probabilidades = pacientes.apply(lambda paciente: probabilidad_alta(df, paciente, corte, fecha), axis=1)
+    esperadas = probabilidades.sum()
+    margen = 1.645 * np.sqrt((probabilidades * (1 - probabilidades)).sum())
+
+    assert datos['fecha'] == str(fecha.date())
+    assert datos['corte'] == str(corte.date())
+    assert datos['pacientes_hospitalizados'] == len(pacientes)
+    assert datos['altas_proyectadas'] == pytest.approx(esperadas, abs=0.006)
+    assert datos['intervalo_90'] == [pytest.approx(max(esperadas - margen, 0), abs=0.006), pytest.approx(esperadas + margen, abs=0.006)]
+    assert datos['altas_registradas'] == int((pacientes['fin'] == fecha).sum())
+
+    etiquetas = df['Servicio'].astype(object).groupby(df['servicio']).first().fillna('sin servicio')
+    por_servicio = probabilidades.groupby(pacientes['servicio']).sum()
+    assert datos['por_servicio'] == {
+        etiquetas[clave]: pytest.approx(valor, abs=0.006) for clave, valor in por_servicio.items() if valor > 0
+    }
+
+
+@pytest.mark.parametrize('parametros', [
+    {'fecha': '2020-11-15', 'corte': '2020-11-15'},
+    {'fecha': '2020-11-15', 'corte': '2020-11-20'},
+])
+def test_altas_corte_no_anterior(cliente, parametros):
+    assert cliente.get('/pacientes/altas_proyectadas/', params=parametros).status_code == 400
@@ -0,0 +1,84 @@
+"""Intenciones del chat contrastadas con conteos calculados con pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+    for columna in ('Enfermedad', 'Servicio'):
+        df[columna] = df[columna].astype(object).fillna('').astype(str).map(main.normalizar)
+    entrada = pd.to_datetime(df['fecha_entrada'], format='%m/%d/%Y', errors='coerce')
+    alta = pd.to_datetime(df['fecha_alta'], format='%m/%d/%Y', errors='coerce')
+    estancia = pd.to_numeric(df['Estancia'], errors='coerce')
+    calculada = entrada + pd.to_timedelta(estancia.where(estancia >= 0), unit='D')
+    df['entrada'] = entrada
+    df['fin'] = alta.where(alta >= entrada, calculada)
+    return df
+
+
+def preguntar(cliente, mensaje, contexto=None):
+    respuesta = cliente.post('/chat', json={'mensaje': mensaje, 'contexto': contexto})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+@pytest.mark.parametrize('mensaje, enfermedad, servicio', [
+    ('cuantos pacientes hay', None, None),
+    ('cuantos pacientes hay en pediatria', None, 'pediatria'),
+    ('cuantos pacientes con diabetes hay', 'diabetes', None),
+    ('cuantos pacientes con diabetes hay en hospitalizacion', 'diabetes', 'hospitalizacion'),
+])
+def test_conteo_pacientes(cliente, df, mensaje, enfermedad, servicio):
+    filtro = np.ones(len(df), dtype=bool)
+    if enfermedad:
+        filtro &= df['Enfermedad'] == enfermedad
+    if servicio:
+        filtro &= df['Servicio'] == servicio
+    datos = preguntar(cliente, mensaje)
+    assert (datos['intencion'], datos['enfermedad'], datos['servicio']) == ('conteo_pacientes', enfermedad, servicio)
+    assert f"Hay {int(filtro.sum())} pacientes" in datos['respuesta']
+
+
+def test_conteo_sin_registros(cliente, df):
+    assert not ((df['Enfermedad'] == 'diabetes') & (df['Servicio'] == 'pediatria')).any()
+    datos = preguntar(cliente, 'cuantos pacientes con diabetes hay en pediatria')
+    assert datos['respuesta'].startswith('No hay registros')
+
+
+@pytest.mark.parametrize('mensaje, servicio', [
+    ('altas proyectadas para hoy', None),
+    ('altas en pediatria', 'pediatria'),
+])
+def test_altas_filtradas_por_servicio(cliente, df, mensaje, servicio):
+    hoy = pd.Timestamp(min(np.datetime64(main.date.today(), 'D'), main.obtener_store().censo.ultimo_ingreso))
+    corte = hoy - pd.Timedelta(days=1)
+    hospitalizados = (df['entrada'] <= corte) & (df['fin'].isna() | (df['fin'] > corte))
+    if servicio:
+        hospitalizados &= df['Servicio'] == servicio
+    datos = preguntar(cliente, mensaje)
+    assert (datos['intencion'], datos['servicio']) == ('altas_proyectadas', servicio)
+    assert f"entre {int(hospitalizados.sum())} pacientes hospitalizados" in datos['respuesta']
+
+
+def test_promedio_estancia(cliente, df):
+    estancia = pd.to_numeric(df['Estancia'], errors='coerce')
+    esperado = estancia[(df['Enfermedad'] == 'diabetes') & (estancia > 0)].mean()
+    datos = preguntar(cliente, 'promedio de estancia para diabetes')
+    assert datos['intencion'] == 'promedio_estancia'
+    assert f"es de {esperado:.2f}" in datos['respuesta']
+
+
+def test_seguimiento_camas(cliente):
+    datos = preguntar(cliente, 'cuantas camas ocupadas hay')
+    assert (datos['intencion'], datos['contexto']) == ('camas_ocupadas', 'camas_ocupadas')
+    datos = preguntar(cliente, 'si', datos['contexto'])
+    assert datos['intencion'] == 'camas_por_servicio'
+    assert datos['respuesta'].startswith('Camas ocupadas por servicio')
+
+
+def test_mensaje_vacio(cliente):
+    assert cliente.post('/chat', json={'mensaje': '  '}).status_code == 400
@@ -0,0 +1,83 @@
+"""Generaciones del dataset compartidas entre workers (MODO_DATOS=compartido)."""
+import json
+
+from conftest import ejecutar, entorno_temporal
+
+COMPARTIDO = {'MODO_DATOS': 'compartido'}
+
+# Publica una generación como lo haría `python main.py --publicar`
+PUBLICAR = """
+    import runpy, sys
+    sys.argv = ['main.py', '--publicar']
+    runpy.run_path('main.py', run_name='__main__')
+"""
+
+CONSULTAS = [
+    '/pacientes',
+    '/pacientes/s500',
+    '/pacientes/por_enfermedad/?enfermedad=malaria',
+    '/pacientes/por_edad/?min=30&max=40',
+    '/pacientes/estadisticas_estancia/?genero=f',
+    '/pacientes/altas_proyectadas/?fecha=2019-06-02',
+]
+
+CONSULTAR = f"""
+    import json
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+    respuestas = [cliente.get(url) for url in {CONSULTAS!r}]
+    print(json.dumps({{
+        'generaciones': [r.headers['x-generacion-datos'] for r in respuestas],
+        'solo_lectura': not main.pacientes_store.estancia.flags.writeable,
+        'respuestas': [r.json() for r in respuestas],
+    }}))
+"""
+
+
+def test_worker_sin_generacion_publicada(tmp_path):
+    ejecutar(tmp_path, """
+    try:
+        import main
+    except RuntimeError as error:
+        assert '--publicar' in str(error)
+    else:
+        raise AssertionError('se esperaba RuntimeError')
+    """, **COMPARTIDO)
+
+
+def test_worker_responde_igual_que_local(tmp_path):
+    local = json.loads(ejecutar(tmp_path, CONSULTAR))
+    assert 'Generación publicada: 1' in ejecutar(tmp_path, PUBLICAR, **COMPARTIDO)
+    compartido = json.loads(ejecutar(tmp_path, CONSULTAR, **COMPARTIDO))
+    assert compartido['solo_lectura']
+    assert compartido['generaciones'] == ['1'] * len(CONSULTAS)
+    assert compartido['respuestas'] == local['respuestas']
+
+
+def test_worker_cambia_a_la_generacion_nueva(tmp_path):
+    entorno_temporal(str(tmp_path))
+    ejecutar(tmp_path, PUBLICAR, **COMPARTIDO)
+    ejecutar(tmp_path, """
+    import os, subprocess, sys
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+    total = len(cliente.get('/pacientes').json())
+    assert cliente.get('/pacientes/s9001').json() == {'detalle': 'paciente no encontrado'}
+
+    with open(main.RUTA_CSV, 'a', encoding='utf-8') as archivo:
+        archivo.write('s9001;3/01/2019;3/05/2019;F;40;Diabetes;Pediatria;4\\n')
+    for _ in range(2):
+        subprocess.run([sys.executable, 'main.py', '--publicar'], check=True, capture_output=True)
+
+    respuesta = cliente.get('/pacientes')
+    assert respuesta.headers['x-generacion-datos'] == '3'
+    assert len(respuesta.json()) == total + 1
+    assert cliente.get('/pacientes/s9001').json()['Servicio'] == 'Pediatria'
+    # Solo se conserva la generación anterior a la vigente
+    assert not os.path.exists(main.ruta_snapshot_generacion(1))
+    assert os.path.exists(main.ruta_snapshot_generacion(2))
+    """, **COMPARTIDO)
@@ -0,0 +1,107 @@
+"""Negociación de Accept-Encoding para los recursos precomprimidos."""
+import gzip
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import construir_estaticos
+import main
+
+cliente = TestClient(main.app)
+
+
+def test_q_ilegible_no_acepta_la_codificacion():
+    respuesta = cliente.get('/', headers={'Accept-Encoding': 'gzip;q=abc, br;q=nan'})
+    assert respuesta.status_code == 200
+    assert 'content-encoding' not in respuesta.headers
+
+
+def test_q_positivo_acepta_la_codificacion():
+    respuesta = cliente.get('/', headers={'Accept-Encoding': 'gzip;q=0.5, br;q=0'})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['content-encoding'] == 'gzip'
+
+
+def test_pagina_inicio_variantes_y_etag():
+    original = cliente.get('/', headers={'Accept-Encoding': 'identity'})
+    assert original.headers['content-type'] == 'text/html; charset=utf-8'
+    assert original.headers['cache-control'] == main.CACHE_REVALIDAR
+    assert original.headers['vary'] == 'Accept-Encoding'
+    etag = original.headers['etag']
+    for codificacion in ('gzip', 'br'):
+        respuesta = cliente.get('/', headers={'Accept-Encoding': codificacion})
+        assert respuesta.headers['content-encoding'] == codificacion
+        assert respuesta.headers['etag'] == f'{etag[:-1]}-{codificacion}"'
+        # El cliente descomprime el cuerpo: debe coincidir con la variante sin comprimir
+        assert respuesta.content == original.content
+    assert cliente.get('/', headers={'Accept-Encoding': 'gzip, br'}).headers['content-encoding'] == 'br'
+
+
+def test_pagina_inicio_304_por_variante():
+    etag_gzip = cliente.get('/', headers={'Accept-Encoding': 'gzip'}).headers['etag']
+    respuesta = cliente.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag_gzip})
+    assert respuesta.status_code == 304
+    assert respuesta.content == b''
+    assert respuesta.headers['etag'] == etag_gzip
+    # El ETag de una variante no valida otra codificación
+    assert cliente.get('/', headers={'Accept-Encoding': 'br', 'If-None-Match': etag_gzip}).status_code == 200
+
+
+@pytest.fixture
+def estaticos(tmp_path, monkeypatch):
+    """Construye estáticos de prueba en un directorio temporal y los monta en una app nueva."""
+    origen = tmp_path / 'Static'
+    origen.mkdir()
+    (origen / 'estilos.css').write_text('body { color: black; }\n' * 200)
+    (origen / 'ruido.bin').write_bytes(os.urandom(4096))
+    monkeypatch.setattr(construir_estaticos, 'DIRECTORIO_ORIGEN', str(origen))
+    monkeypatch.setattr(construir_estaticos, 'DIRECTORIO_DESTINO', str(origen / 'dist'))
+    monkeypatch.setattr(construir_estaticos, 'RUTA_MANIFIESTO', str(origen / 'dist' / 'manifest.json'))
+    manifiesto = construir_estaticos.construir()
+    app = FastAPI()
+    app.mount('/static', main.EstaticosPrecomprimidos(directory=str(origen)), name='static')
+    return origen, manifiesto, TestClient(app)
+
+
+def test_construir_escribe_variantes_que_ahorran(estaticos):
+    origen, manifiesto, _ = estaticos
+    assert json.loads((origen / 'dist' / 'manifest.json').read_text()) == manifiesto
+    css = origen / 'dist' / manifiesto['estilos.css']['archivo']
+    assert css.read_bytes() == (origen / 'estilos.css').read_bytes()
+    assert gzip.decompress((origen / 'dist' / (css.name + '.gz')).read_bytes()) == css.read_bytes()
+    assert main.brotli.decompress((origen / 'dist' / (css.name + '.br')).read_bytes()) == css.read_bytes()
+    # Datos aleatorios no se comprimen: no se guardan variantes inútiles
+    binario = manifiesto['ruido.bin']['archivo']
+    assert sorted(p.name for p in (origen / 'dist').glob(binario + '*')) == [binario]
+
+
+@pytest.mark.parametrize('aceptadas, esperada', [
+    ('gzip, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('identity', None),
+])
+def test_estaticos_negocian_codificacion(estaticos, aceptadas, esperada):
+    origen, manifiesto, cliente_estaticos = estaticos
+    archivo = manifiesto['estilos.css']['archivo']
+    respuesta = cliente_estaticos.get(f'/static/dist/{archivo}', headers={'Accept-Encoding': aceptadas})
+    assert respuesta.status_code == 200
+    assert respuesta.headers.get('content-encoding') == esperada
+    assert respuesta.headers['content-type'] == 'text/css; charset=utf-8'
+    assert respuesta.headers['vary'] == 'Accept-Encoding'
+    assert respuesta.content == (origen / 'estilos.css').read_bytes()
+
+
+def test_estaticos_cache_por_ruta(estaticos):
+    _, manifiesto, cliente_estaticos = estaticos
+    versionado = cliente_estaticos.get(f"/static/dist/{manifiesto['ruido.bin']['archivo']}")
+    assert versionado.headers['cache-control'] == main.CACHE_INMUTABLE
+    assert 'content-encoding' not in versionado.headers
+    original = cliente_estaticos.get('/static/estilos.css', headers={'Accept-Encoding': 'gzip'})
+    assert original.headers['cache-control'] == main.CACHE_REVALIDAR
+    # Los originales no tienen variantes precomprimidas
+    assert 'content-encoding' not in original.headers
+    assert cliente_estaticos.get('/static/no_existe.css').status_code == 404
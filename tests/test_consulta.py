@@ -0,0 +1,120 @@
+"""Consulta compuesta (/pacientes/consulta/) contrastada con máscaras de pandas."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from conftest import registros_csv
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+
+
+def contiene(serie: pd.Series, texto: str) -> pd.Series:
+    """Filas cuyo valor no vacío contiene `texto` sin tildes ni mayúsculas."""
+    serie = serie.astype(object)
+    return serie.notna() & serie.fillna('').map(main.normalizar).str.contains(main.normalizar(texto), regex=False)
+
+
+def edad_en_anos(texto) -> float:
+    """Edad en años del texto del CSV ("30", "5 jours")."""
+    partes = str(texto).split()
+    try:
+        valor = float(partes[0].replace(',', '.'))
+    except (IndexError, ValueError):
+        return np.nan
+    return valor / 365 if len(partes) > 1 and partes[1].lower().startswith('jour') else valor
+
+
+def mascara(df: pd.DataFrame, filtros: dict) -> pd.Series:
+    """Conjunción de los filtros de la consulta calculada fila por fila con pandas."""
+    resultado = pd.Series(True, index=df.index)
+    edad = df['Edad'].map(edad_en_anos)
+    estancia = pd.to_numeric(df['Estancia'], errors='coerce')
+    entrada = pd.to_datetime(df['fecha_entrada'], format='%m/%d/%Y', errors='coerce')
+    for clave, valor in filtros.items():
+        if clave == 'id':
+            resultado &= df['id'].astype(str) == valor
+        elif clave in ('enfermedad', 'servicio', 'genero'):
+            resultado &= contiene(df[clave.capitalize()], valor)
+        elif clave in ('edad_min', 'estancia_min'):
+            resultado &= (edad if clave == 'edad_min' else estancia) >= valor
+        elif clave in ('edad_max', 'estancia_max'):
+            resultado &= (edad if clave == 'edad_max' else estancia) <= valor
+        elif clave == 'desde':
+            resultado &= entrada >= pd.Timestamp(valor)
+        else:
+            resultado &= entrada <= pd.Timestamp(valor)
+    return resultado
+
+
+@pytest.mark.parametrize('filtros', [
+    {'id': 's500'},
+    {'enfermedad': 'diabetes'},
+    {'servicio': 'PEDIATRÍA', 'genero': 'f'},
+    {'enfermedad': 'a', 'servicio': 'hospital', 'edad_min': 40},
+    {'edad_min': 0, 'edad_max': 1},
+    {'estancia_min': 3, 'estancia_max': 7, 'genero': 'M'},
+    {'estancia_min': 20},
+    {'desde': '2010-03-01', 'hasta': '2010-06-30'},
+    {'desde': '2011-01-01', 'servicio': 'gine', 'estancia_max': 60},
+    {'hasta': '2010-01-15', 'edad_max': 10},
+])
+def test_consulta_igual_a_pandas(cliente, df, filtros):
+    esperados = registros_csv(df[mascara(df, filtros)])
+    assert esperados
+    respuesta = cliente.get('/pacientes/consulta/', params={**filtros, 'limit': main.LIMITE_MAXIMO})
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json() == esperados
+
+    plan = cliente.get('/pacientes/consulta/', params={**filtros, 'explain': 'true'}).json()
+    assert plan['pacientes'] == len(esperados)
+    assert plan['estrategia'] in ('sondeo', 'mapa_de_bits')
+    # Los dos límites de un mismo rango forman un solo predicado
+    rangos = {'edad_min': 'edad', 'edad_max': 'edad', 'estancia_min': 'estancia', 'estancia_max': 'estancia',
+              'desde': 'fecha', 'hasta': 'fecha'}
+    assert len(plan['pasos']) == len({rangos.get(clave, clave) for clave in filtros})
+
+
+def test_consulta_sin_resultados(cliente):
+    respuesta = cliente.get('/pacientes/consulta/', params={'enfermedad': 'diabetes', 'servicio': 'pediatria'})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == []
+
+
+def test_consulta_paginada(cliente, df):
+    filtros = {'genero': 'F', 'estancia_max': 5}
+    esperados = registros_csv(df[mascara(df, filtros)])
+    recibidos, cursor = [], None
+    while True:
+        respuesta = cliente.get('/pacientes/consulta/', params={**filtros, 'limit': 50, **({'cursor': cursor} if cursor else {})})
+        recibidos += respuesta.json()
+        cursor = respuesta.headers.get('x-siguiente-cursor')
+        if cursor is None:
+            break
+    assert recibidos == esperados
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'explain': 'true'},
+    {'desde': '2011-01-02', 'hasta': '2011-01-01'},
+    {'edad_min': 30, 'edad_max': 20},
+    {'estancia_min': 9, 'estancia_max': 1},
+])
+def test_consulta_invalida(cliente, params):
+    assert cliente.get('/pacientes/consulta/', params=params).status_code == 400
+
+
+def test_consulta_fecha_mal_formada(cliente):
+    assert cliente.get('/pacientes/consulta/', params={'desde': '01/02/2010'}).status_code == 422
+
+
+def test_consulta_un_solo_dia(cliente, df):
+    dia = date(2010, 1, 2)
+    respuesta = cliente.get('/pacientes/consulta/', params={'desde': dia, 'hasta': dia, 'limit': main.LIMITE_MAXIMO})
+    assert respuesta.json() == registros_csv(df[df['fecha_entrada'] == '1/02/2010'])
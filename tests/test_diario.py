@@ -0,0 +1,63 @@
+"""Recuperación y compactación del diario de escrituras entre reinicios del proceso."""
+import pytest
+
+from conftest import ejecutar, entorno_temporal
+
+
+ADMITIR = """
+    import main
+    main.registrar_admision({
+        'id': 'prueba-1', 'fecha_entrada': '2020-01-01', 'genero': 'F', 'edad': 40,
+        'enfermedad': 'Neumonia', 'servicio': 'UCI', 'fecha_alta': '2020-01-05',
+    })
+"""
+
+
+def test_compactacion_interrumpida_tras_renombrar(tmp_path):
+    # Se admite un paciente y el proceso "cae" justo después de renombrar el diario
+    ejecutar(tmp_path, ADMITIR + """
+    import os
+    os.replace(main.diario.ruta, main.diario.ruta + '.compactando')
+    """)
+    diario = tmp_path / 'pacientes.csv.diario'
+    assert not diario.exists()
+    assert (tmp_path / 'pacientes.csv.diario.compactando').exists()
+
+    # Al reiniciar se reaplica .compactando y la compactación lo vuelca al CSV
+    ejecutar(tmp_path, """
+    import main
+    assert main.pacientes_store.indice_id.buscar('prueba-1') is not None
+    main.diario.compactar()
+    """)
+    assert not (tmp_path / 'pacientes.csv.diario.compactando').exists()
+    assert 'prueba-1;1/01/2020;1/05/2020;F;40;Neumonia;UCI;4' in (tmp_path / 'pacientes.csv').read_text(encoding='utf-8')
+
+    # Y el paciente sigue ahí sin diario que reaplicar
+    ejecutar(tmp_path, """
+    import main
+    assert main.pacientes_store.indice_id.buscar('prueba-1') is not None
+    """)
+
+
+@pytest.mark.parametrize('lineas', [
+    # Fechas ISO (se leerían como vacías) y día sin relleno (se reescribiría como 3/04/2020)
+    [
+        's9001;2020-01-15;2020-01-20;F;40;Neumonia;UCI;5',
+        's9002;3/4/2020;3/9/2020;M;40;Neumonia;UCI;5',
+    ],
+    # Campo de más, que usecols descarta
+    ['s9003;1/05/2020;1/06/2020;F;40;Neumonia;UCI;1;extra'],
+])
+def test_no_compacta_si_perderia_lineas(tmp_path, lineas):
+    ruta_csv = tmp_path / 'pacientes.csv'
+    entorno_temporal(str(tmp_path))
+    with open(ruta_csv, 'a', encoding='utf-8') as archivo:
+        archivo.write(''.join(linea + '\n' for linea in lineas))
+    original = ruta_csv.read_bytes()
+
+    ejecutar(tmp_path, ADMITIR + f"""
+    assert main.lineas_no_conservadas(main.RUTA_CSV) == {len(lineas)}
+    main.diario.compactar()
+    """)
+    assert ruta_csv.read_bytes() == original
+    assert 'prueba-1' in (tmp_path / 'pacientes.csv.diario').read_text(encoding='utf-8')
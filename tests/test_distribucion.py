@@ -0,0 +1,81 @@
+"""Percentiles e histograma de /pacientes/distribucion_estancia/ contrastados con pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+    for columna in ('Enfermedad', 'Servicio'):
+        df[columna] = df[columna].astype(object).fillna('').astype(str).map(main.normalizar)
+    df['Estancia'] = pd.to_numeric(df['Estancia'], errors='coerce')
+    return df
+
+
+def estancias(df: pd.DataFrame, enfermedad=None, servicio=None) -> np.ndarray:
+    """Estancias positivas del grupo, ordenadas (el sketch ignora las demás)."""
+    filtro = df['Estancia'] > 0
+    if enfermedad is not None:
+        filtro &= df['Enfermedad'] == main.normalizar(enfermedad)
+    if servicio is not None:
+        filtro &= df['Servicio'] == main.normalizar(servicio)
+    return np.sort(df.loc[filtro, 'Estancia'].to_numpy())
+
+
+@pytest.mark.parametrize('filtros', [
+    {},
+    {'enfermedad': 'Malaria'},
+    {'servicio': 'PEDIATRÍA'},
+    {'enfermedad': 'choque emocional', 'servicio': 'Hospitalizacion'},
+    {'enfermedad': 'Bajo peso al nacer', 'servicio': 'neonatologia'},
+])
+def test_distribucion_igual_a_pandas(cliente, df, filtros):
+    valores = estancias(df, **filtros)
+    respuesta = cliente.get('/pacientes/distribucion_estancia/', params=filtros)
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    assert {k: datos[k] for k in filtros} == filtros
+    assert datos['pacientes'] == len(valores)
+
+    # Percentil inferior con a lo sumo PRECISION_SKETCH de error relativo
+    for nombre, q in main.PERCENTILES_ESTANCIA.items():
+        esperado = valores[int(q * (len(valores) - 1))]
+        assert datos[nombre] == pytest.approx(esperado, rel=main.PRECISION_SKETCH), nombre
+
+    # Histograma: los bordes solo pueden correrse para estancias a menos del 1% del borde
+    assert [r['dias'] for r in datos['histograma']] == main.RANGOS_HISTOGRAMA_ESTANCIA
+    acumulado = np.cumsum([r['pacientes'] for r in datos['histograma']])
+    assert acumulado[-1] == len(valores)
+    margen = 1 + 2 * main.PRECISION_SKETCH
+    for limite, debajo in zip(main.LIMITES_HISTOGRAMA_ESTANCIA, acumulado):
+        assert (valores < limite / margen).sum() <= debajo <= (valores < limite * margen).sum(), limite
+
+
+def test_distribucion_exacta_en_estancias_cortas(cliente, df):
+    # Hasta ~50 días cada cubeta contiene un único día: histograma y percentiles son exactos
+    datos = cliente.get('/pacientes/distribucion_estancia/', params={'servicio': 'hospitalizacion'}).json()
+    valores = estancias(df, servicio='hospitalizacion')
+    esperados = pd.cut(valores, [0] + main.LIMITES_HISTOGRAMA_ESTANCIA[:10], right=False).value_counts().tolist()
+    assert [r['pacientes'] for r in datos['histograma'][:10]] == esperados
+    exactos = 0
+    for nombre, q in main.PERCENTILES_ESTANCIA.items():
+        esperado = valores[int(q * (len(valores) - 1))]
+        if esperado <= 50:
+            assert datos[nombre] == esperado, nombre
+            exactos += 1
+    assert exactos
+
+
+@pytest.mark.parametrize('filtros', [
+    {'enfermedad': 'zzzz'},
+    {'servicio': 'zzzz'},
+    {'enfermedad': 'diabetes', 'servicio': 'pediatria'},
+    # El filtro es por valor exacto (sin tildes ni mayúsculas), no por subcadena
+    {'enfermedad': 'malar'},
+])
+def test_distribucion_sin_datos(cliente, filtros):
+    respuesta = cliente.get('/pacientes/distribucion_estancia/', params=filtros)
+    assert respuesta.json() == {'mensaje': 'No hay datos disponibles para los filtros indicados'}
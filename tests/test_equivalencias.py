@@ -0,0 +1,301 @@
+"""
+Equivalencia de las estructuras derivadas con una implementación de fuerza bruta.
+
+Cada prueba corre sobre el dataset real y sobre uno sintético más grande que
+se construye en dos partes (construir_store + extender) para cubrir también
+los caminos incrementales.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from generar_dataset import generar_dataset
+
+FILAS_SINTETICAS = 20_000
+
+
+@pytest.fixture(scope='module')
+def sintetico(tmp_path_factory):
+    """DataFrame sintético con algunos ids repetidos al final."""
+    ruta = str(tmp_path_factory.mktemp('datos') / 'sintetico.csv')
+    generar_dataset(FILAS_SINTETICAS, ruta, semilla=7, origen=main.RUTA_CSV)
+    df = pd.read_csv(ruta, **main.OPCIONES_CSV)
+    return pd.concat([df, df.iloc[[3, 50, 50]]], ignore_index=True)
+
+
+@pytest.fixture(scope='module', params=['real', 'sintetico'])
+def caso(request, sintetico):
+    """Par (DataFrame de origen, almacén construido a partir de él)."""
+    if request.param == 'real':
+        df = pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+        return df, main.construir_store(df)
+    mitad = len(sintetico) // 2
+    store = main.construir_store(sintetico.iloc[:mitad].reset_index(drop=True))
+    return sintetico, store.extender(sintetico.iloc[mitad:].reset_index(drop=True))
+
+
+def contiene(serie: pd.Series, texto: str) -> np.ndarray:
+    """Filas cuyo valor no vacío contiene `texto` sin tildes ni mayúsculas."""
+    serie = serie.astype(object)
+    normalizada = serie.fillna('').map(main.normalizar)
+    return (serie.notna() & normalizada.str.contains(main.normalizar(texto), regex=False)).to_numpy()
+
+
+# ======================================================
+# ÍNDICE DE TRIGRAMAS
+# ======================================================
+
+def test_trigramas_igual_a_subcadena(caso):
+    df, store = caso
+    rng = random.Random(1)
+    for columna, nombre in ((store.enfermedad, 'Enfermedad'), (store.servicio, 'Servicio')):
+        consultas = {'', 'zzz', 'xq'}
+        for valor in columna.normalizadas:
+            for largo in (1, 2, 3, 4, 6):
+                inicio = rng.randrange(max(len(valor) - largo + 1, 1))
+                consultas.add(valor[inicio:inicio + largo])
+        for texto in consultas:
+            esperados = [c for c, valor in enumerate(columna.normalizadas) if texto in valor]
+            assert columna.indice_trigramas.buscar(texto) == esperados, texto
+            filas = columna.filas(columna.buscar(texto))
+            np.testing.assert_array_equal(filas, np.flatnonzero(contiene(df[nombre], texto)))
+
+
+# ======================================================
+# ÍNDICE DE IDS
+# ======================================================
+
+@pytest.mark.parametrize('anteriores', [0, 100, FILAS_SINTETICAS - 100])
+def test_indice_ids_igual_a_dict(sintetico, anteriores):
+    ids = main.convertir_ids(sintetico['id'])
+    indice = main.IndiceIds.construir(ids[:anteriores]).extender(ids)
+
+    primeras, todas = {}, {}
+    for fila, id in enumerate(ids.tolist()):
+        primeras.setdefault(id, fila)
+        todas.setdefault(id, []).append(fila)
+    for id, fila in primeras.items():
+        assert indice.buscar(id) == fila
+    assert indice.duplicados == {id: filas for id, filas in todas.items() if len(filas) > 1}
+    for id in ('', 'no-existe', 's0', f's{len(ids) + 10}'):
+        assert indice.buscar(id) is None
+
+
+def test_indice_ids_vacio():
+    ids = np.array([], dtype='<U8')
+    assert main.hash_ids(ids).dtype == np.uint64 and len(main.hash_ids(ids)) == 0
+    indice = main.IndiceIds.construir(ids)
+    assert indice.buscar('s1') is None and indice.duplicados == {}
+
+
+# ======================================================
+# CONSULTAS COMPUESTAS
+# ======================================================
+
+@pytest.mark.parametrize('fraccion_sondeo', [1, 8, 10 ** 9])
+def test_consulta_igual_a_mascara(caso, fraccion_sondeo, monkeypatch):
+    df, store = caso
+    monkeypatch.setattr(main, 'FRACCION_SONDEO', fraccion_sondeo)
+    rng = random.Random(fraccion_sondeo)
+    enfermedades = [c for c in store.enfermedad.categorias if c]
+    servicios = [c for c in store.servicio.categorias if c]
+    dias = store.dias_entrada[~np.isnan(store.dias_entrada)]
+
+    for _ in range(150):
+        filtros = {clave: None for clave in (
+            'id', 'enfermedad', 'servicio', 'genero', 'edad_min', 'edad_max',
+            'estancia_min', 'estancia_max', 'desde', 'hasta'
+        )}
+        mascara = np.ones(len(store), dtype=bool)
+        for clave in rng.sample(list(filtros), rng.randint(1, 4)):
+            if clave == 'id':
+                filtros[clave] = str(df['id'].iloc[rng.randrange(len(df))])
+                mascara &= (df['id'] == filtros[clave]).to_numpy()
+            elif clave in ('enfermedad', 'servicio'):
+                valor = rng.choice(enfermedades if clave == 'enfermedad' else servicios)
+                inicio = rng.randrange(len(valor))
+                filtros[clave] = valor[inicio:inicio + rng.randint(1, 6)]
+                mascara &= contiene(df['Enfermedad' if clave == 'enfermedad' else 'Servicio'], filtros[clave])
+            elif clave == 'genero':
+                filtros[clave] = rng.choice(['F', 'm'])
+                mascara &= contiene(df['Genero'], filtros[clave])
+            elif clave.startswith('edad') or clave.startswith('estancia'):
+                valores = store.edad if clave.startswith('edad') else store.estancia
+                filtros[clave] = float(rng.randint(0, 60))
+                mascara &= (valores >= filtros[clave]) if clave.endswith('min') else (valores <= filtros[clave])
+            else:
+                dia = int(rng.choice(dias.tolist()))
+                filtros[clave] = np.datetime64(dia, 'D').astype(object)
+                mascara &= (store.dias_entrada >= dia) if clave == 'desde' else (store.dias_entrada <= dia)
+        if any(filtros[a] is not None and filtros[b] is not None and filtros[a] > filtros[b]
+               for a, b in (('edad_min', 'edad_max'), ('estancia_min', 'estancia_max'), ('desde', 'hasta'))):
+            continue
+
+        filas, _ = main.ejecutar_consulta(len(store), main.predicados_consulta(store, **filtros))
+        np.testing.assert_array_equal(filas, np.flatnonzero(mascara), err_msg=str(filtros))
+
+
+# ======================================================
+# DISTANCIA DE EDICIÓN
+# ======================================================
+
+def levenshtein(a: str, b: str) -> int:
+    """Programación dinámica clásica, fila por fila."""
+    anterior = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        actual = [i]
+        for j, y in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (x != y)))
+        anterior = actual
+    return anterior[-1]
+
+
+def test_distancia_edicion_igual_a_programacion_dinamica():
+    rng = random.Random(3)
+    for _ in range(3000):
+        alfabeto = rng.choice(['ab', 'abc', 'aeiouñ ', 'abcdefghijklmnopqrstuvwxyz'])
+        a = ''.join(rng.choice(alfabeto) for _ in range(rng.randint(0, 70)))
+        b = ''.join(rng.choice(alfabeto) for _ in range(rng.randint(0, 70)))
+        esperada = levenshtein(a, b)
+        assert main.distancia_edicion(a, b) == esperada, (a, b)
+        maximo = rng.randint(0, 5)
+        assert main.distancia_edicion(a, b, maximo) == min(esperada, maximo + 1), (a, b, maximo)
+
+
+# ======================================================
+# CENSO DE CAMAS
+# ======================================================
+
+def test_censo_igual_a_recorrido_por_dia(caso):
+    _, store = caso
+    censo = store.censo
+    claves, _ = store.servicio.grupos()
+    desde, hasta = censo.inicio - 3, censo.ultimo + 3
+    dias = int((hasta - desde).astype(int)) + 1
+    esperado = np.zeros((len(claves), dias), dtype=np.int64)
+
+    for fila in range(len(store)):
+        entrada, alta, estancia = store.fecha_entrada[fila], store.fecha_alta[fila], store.estancia[fila]
+        if np.isnat(entrada):
+            continue
+        if not np.isnat(alta) and alta >= entrada:
+            fin = alta
+        elif not np.isnan(estancia) and estancia >= 0:
+            fin = entrada + np.timedelta64(int(estancia), 'D')
+        else:
+            fin = None
+        grupo = claves.index(main.normalizar(store.servicio.valor(fila)))
+        # Ocupa cama los días entrada <= d < fin; una estancia abierta, hasta el final
+        primero = int((entrada - desde).astype(int))
+        ultimo = dias if fin is None else int((fin - desde).astype(int))
+        esperado[grupo, primero:ultimo] += 1
+
+    np.testing.assert_array_equal(censo.serie(desde, hasta), esperado)
+
+
+# ======================================================
+# SNAPSHOT
+# ======================================================
+
+def test_snapshot_ida_y_vuelta(caso, tmp_path):
+    _, store = caso
+    ruta = str(tmp_path / 'pacientes.snapshot')
+    huella = {'tamano': 0, 'mtime_ns': 0}
+    main.escribir_snapshot(store, ruta, huella)
+    arreglos, cabecera = main.abrir_snapshot(ruta)
+    leido = main.PacientesStore.desde_columnas(arreglos, cabecera)
+
+    assert leido.huella == huella
+    originales, metadatos = store.columnas()
+    copiados, metadatos_leidos = leido.columnas()
+    assert metadatos_leidos == metadatos
+    assert list(copiados) == list(originales)
+    for nombre, arreglo in originales.items():
+        np.testing.assert_array_equal(copiados[nombre], arreglo, err_msg=nombre)
+
+    assert leido.registros(np.arange(len(leido))) == store.registros(np.arange(len(store)))
+    for id in store.ids[::97].tolist():
+        assert leido.indice_id.buscar(id) == store.indice_id.buscar(id)
+    assert leido.indice_id.duplicados == store.indice_id.duplicados
+    np.testing.assert_array_equal(leido.censo.ocupacion, store.censo.ocupacion)
+
+
+# ======================================================
+# ÍNDICES HEREDADOS ENTRE GENERACIONES
+# ======================================================
+
+DERIVADOS = ('fin_estancia', 'dias_entrada', 'indice_estancia', 'indice_edad', 'indice_fecha_entrada',
+             'censo', 'distribuciones_estancia', 'entidades_chat')
+
+
+def calcular_derivados(store):
+    for nombre in DERIVADOS:
+        getattr(store, nombre)
+
+
+def reconstruido(store):
+    """Mismo almacén sin nada calculado, para comparar con lo heredado."""
+    return main.PacientesStore(
+        store.ids, store.fecha_entrada, store.fecha_alta, store.genero, store.edad, store.edad_texto,
+        store.enfermedad, store.servicio, store.estancia,
+        cubo_estancias=store.cubo_estancias, indice_id=store.indice_id, sketches_estancia=store.sketches_estancia
+    )
+
+
+def comparar_derivados(store):
+    assert set(DERIVADOS) <= set(store.__dict__), 'no se heredaron todos los derivados'
+    referencia = reconstruido(store)
+    np.testing.assert_array_equal(store.fin_estancia, referencia.fin_estancia)
+    np.testing.assert_array_equal(store.dias_entrada, referencia.dias_entrada)
+    for nombre in ('indice_estancia', 'indice_edad', 'indice_fecha_entrada'):
+        heredado, nuevo = getattr(store, nombre), getattr(referencia, nombre)
+        np.testing.assert_array_equal(heredado.valores, nuevo.valores)
+        np.testing.assert_array_equal(np.sort(heredado.orden), np.sort(nuevo.orden))
+        for minimo, maximo in ((None, 3), (2, 9), (5, None), (0, 0), (-1e9, 1e9)):
+            assert heredado.contar(minimo, maximo) == nuevo.contar(minimo, maximo)
+            np.testing.assert_array_equal(heredado.filas(minimo, maximo), nuevo.filas(minimo, maximo))
+    for atributo in ('inicio', 'ultimo', 'ultimo_ingreso', 'descartadas', 'claves'):
+        assert getattr(store.censo, atributo) == getattr(referencia.censo, atributo), atributo
+    np.testing.assert_array_equal(store.censo.ocupacion, referencia.censo.ocupacion)
+    for atributo in ('frecuencias', 'supervivencia'):
+        np.testing.assert_array_equal(getattr(store.distribuciones_estancia, atributo),
+                                      getattr(referencia.distribuciones_estancia, atributo))
+    assert store.distribuciones_estancia.max_dias == referencia.distribuciones_estancia.max_dias
+    assert store.entidades_chat.tries == referencia.entidades_chat.tries
+
+
+def test_altas_heredan_derivados(caso):
+    _, store = caso
+    rng = np.random.default_rng(5)
+    calcular_derivados(store)
+    for paso in range(6):
+        filas = np.unique(rng.integers(0, len(store), size=int(rng.integers(1, 40))))
+        if paso == 2:
+            # El alta que fijaba el último día del censo se adelanta
+            filas = np.union1d(filas, np.flatnonzero(store.fin_estancia == store.censo.ultimo))
+        if paso == 3:
+            # Y las estancias más largas se acortan (baja la estancia máxima)
+            filas = np.union1d(filas, np.flatnonzero(store.estancia == np.nanmax(store.estancia)))
+        entrada = store.fecha_entrada[filas]
+        estancias = rng.integers(0, 4 if paso in (2, 3) else 200, size=len(filas)).astype(np.float64)
+        estancias[rng.random(len(filas)) < 0.1] = np.nan
+        altas = np.where(np.isnat(entrada), entrada, entrada + np.nan_to_num(estancias).astype('timedelta64[D]'))
+        store = store.con_altas(filas, altas, estancias)
+        comparar_derivados(store)
+
+
+def test_filas_agregadas_heredan_derivados(caso):
+    df, store = caso
+    rng = np.random.default_rng(6)
+    calcular_derivados(store)
+    anteriores = len(store)
+    for _ in range(4):
+        lote = df.iloc[rng.integers(0, len(df), size=int(rng.integers(1, 30)))].reset_index(drop=True)
+        lote['id'] = [f'nuevo{anteriores + i}' for i in range(len(lote))]
+        lote.loc[0, 'fecha_entrada'] = None
+        store = store.extender(lote)
+        anteriores = len(store)
+        comparar_derivados(store)
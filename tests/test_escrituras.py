@@ -0,0 +1,99 @@
+"""Admisiones y altas por la API: validaciones y efecto sobre las consultas."""
+import json
+
+import pytest
+
+from conftest import ejecutar
+
+
+ADMISION = {
+    'fecha_entrada': '2021-09-01', 'genero': 'F', 'edad': 40,
+    'enfermedad': 'Enfermedad de prueba', 'servicio': 'Servicio de prueba',
+}
+
+
+# ======================================================
+# VALIDACIONES (NO ESCRIBEN NADA)
+# ======================================================
+
+@pytest.mark.parametrize('cambios, detalle', [
+    ({'genero': 'X'}, "genero debe ser 'F' o 'M'"),
+    ({'estancia': -1}, 'estancia no puede ser negativa'),
+    ({'id': 's1'}, "Ya existe un paciente con id 's1'"),
+    ({'fecha_alta': '2021-08-31'}, 'fecha_alta no puede ser anterior a fecha_entrada'),
+])
+def test_admision_rechazada(cliente, cambios, detalle):
+    generacion = cliente.get('/pacientes?limit=1').headers['x-generacion-datos']
+    respuesta = cliente.post('/pacientes', json={**ADMISION, **cambios})
+    assert respuesta.status_code == (409 if 'id' in cambios else 400)
+    assert respuesta.json()['detail'] == detalle
+    assert cliente.get('/pacientes?limit=1').headers['x-generacion-datos'] == generacion
+
+
+def test_admision_incompleta(cliente):
+    assert cliente.post('/pacientes', json={'genero': 'F'}).status_code == 422
+
+
+@pytest.mark.parametrize('id, alta, codigo', [
+    ('no-existe', {'fecha_alta': '2021-01-01'}, 404),
+    ('s1', {'fecha_alta': '2009-12-31'}, 400),
+    ('s1', {'fecha_alta': '2010-01-10', 'estancia': -3}, 400),
+])
+def test_alta_rechazada(cliente, id, alta, codigo):
+    assert cliente.patch(f'/pacientes/{id}', json=alta).status_code == codigo
+
+
+# ======================================================
+# EFECTO DE LAS ESCRITURAS
+# ======================================================
+
+def test_admision_y_alta_visibles_en_las_consultas(tmp_path):
+    salida = ejecutar(tmp_path, f"""
+    import json
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+    admision = {ADMISION!r}
+    censo = {{'servicio': 'servicio de prueba', 'desde': '2021-08-31', 'hasta': '2021-09-06'}}
+    antes = cliente.get('/pacientes/por_edad/?min=40&max=40&solo_conteo=true').json()['pacientes']
+
+    creado = cliente.post('/pacientes', json=admision)
+    assert creado.status_code == 201, creado.text
+    id = creado.json()['id']
+    abierto = cliente.get('/pacientes/censo_camas/', params=censo).json()['ocupadas']
+
+    alta = cliente.patch(f'/pacientes/{{id}}', json={{'fecha_alta': '2021-09-05'}})
+    assert alta.status_code == 200, alta.text
+    duplicado = cliente.post('/pacientes', json={{**admision, 'id': id}})
+
+    print(json.dumps({{
+        'creado': creado.json(),
+        'alta': alta.json(),
+        'por_id': cliente.get(f'/pacientes/{{id}}').json(),
+        'duplicado': duplicado.status_code,
+        'edad': cliente.get('/pacientes/por_edad/?min=40&max=40&solo_conteo=true').json()['pacientes'] - antes,
+        'estancia': [p['id'] for p in cliente.get('/pacientes/consulta/', params={{'estancia_min': 4, 'estancia_max': 4, 'servicio': 'de prueba'}}).json()],
+        'estadisticas': cliente.get('/pacientes/estadisticas_estancia/', params={{'enfermedad': 'enfermedad de prueba'}}).json(),
+        'censo_abierto': abierto,
+        'censo_cerrado': cliente.get('/pacientes/censo_camas/', params=censo).json()['ocupadas'],
+    }}))
+    """)
+    datos = json.loads(salida)
+    id = datos['creado']['id']
+    assert id == 's839'
+    assert datos['creado'] == {
+        'id': id, 'fecha_entrada': '9/01/2021', 'fecha_alta': '', 'Genero': 'F', 'Edad (años)': '40',
+        'Enfermedad': 'Enfermedad de prueba', 'Servicio': 'Servicio de prueba', 'Estancia (días)': '',
+    }
+    assert datos['alta'] == datos['por_id'] == {**datos['creado'], 'fecha_alta': '9/05/2021', 'Estancia (días)': 4}
+    assert datos['duplicado'] == 409
+    assert datos['edad'] == 1
+    assert datos['estancia'] == [id]
+    assert datos['estadisticas'] == {
+        'enfermedad': 'enfermedad de prueba', 'pacientes': 1,
+        'promedio_estancia': 4.0, 'varianza_estancia': 0.0, 'desviacion_estancia': 0.0,
+    }
+    # Del 31/08 al 06/09: sin alta sigue hospitalizado; con alta el 05/09 deja la cama ese día
+    assert datos['censo_abierto'] == [0, 1, 1, 1, 1, 1, 1]
+    assert datos['censo_cerrado'] == [0, 1, 1, 1, 1, 0, 0]
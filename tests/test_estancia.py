@@ -0,0 +1,88 @@
+"""Estadísticas de estancia del cubo, contrastadas con pandas."""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+    for columna in ('Enfermedad', 'Servicio', 'Genero'):
+        df[columna.lower()] = df[columna].astype(object).fillna('').astype(str).map(main.normalizar)
+    edad = df['Edad'].astype(object).fillna('').astype(str).map(main.parsear_edad)
+    limites = [-np.inf] + main.LIMITES_BANDAS_EDAD + [np.inf]
+    bandas = pd.cut(edad, limites, right=False, labels=main.BANDAS_EDAD).astype(object)
+    df['banda_edad'] = bandas.where(edad.notna(), main.BANDA_SIN_DATO)
+    df['estancia'] = pd.to_numeric(df['Estancia'], errors='coerce')
+    return df
+
+
+def estadisticas_pandas(df, **filtros):
+    """Lo que debería responder /pacientes/estadisticas_estancia/ para `filtros` (None si no hay datos)."""
+    filas = df['estancia'] > 0
+    for dimension, valor in filtros.items():
+        filas &= df[dimension] == (valor if dimension == 'banda_edad' else main.normalizar(valor))
+    estancia = df.loc[filas, 'estancia']
+    if estancia.empty:
+        return None
+    varianza = estancia.var(ddof=1) if len(estancia) > 1 else 0.0
+    return {
+        'pacientes': len(estancia),
+        'promedio_estancia': pytest.approx(estancia.mean(), abs=0.006),
+        'varianza_estancia': pytest.approx(varianza, abs=0.006),
+        'desviacion_estancia': pytest.approx(np.sqrt(varianza), abs=0.006),
+    }
+
+
+def combinaciones(df):
+    """Cada valor de cada dimensión por separado y algunos pares de dimensiones."""
+    valores = {
+        'enfermedad': sorted(df['Enfermedad'].dropna().astype(str).unique())[:40],
+        'servicio': sorted(df['Servicio'].dropna().astype(str).unique()),
+        'genero': ['F', 'm'],
+        'banda_edad': main.BANDAS_EDAD + [main.BANDA_SIN_DATO],
+    }
+    for dimension, opciones in valores.items():
+        for valor in opciones:
+            yield {dimension: valor}
+    for (a, opciones_a), (b, opciones_b) in itertools.combinations(valores.items(), 2):
+        for valor_a, valor_b in itertools.product(opciones_a[:3], opciones_b[:3]):
+            yield {a: valor_a, b: valor_b}
+
+
+def test_estadisticas_iguales_a_pandas(cliente, df):
+    assert cliente.get('/pacientes/estadisticas_estancia/').json() == estadisticas_pandas(df)
+    for filtros in combinaciones(df):
+        esperado = estadisticas_pandas(df, **filtros)
+        respuesta = cliente.get('/pacientes/estadisticas_estancia/', params=filtros).json()
+        if esperado is None:
+            assert respuesta == {'mensaje': 'No hay datos disponibles para los filtros indicados'}, filtros
+        else:
+            assert respuesta == {**filtros, **esperado}, filtros
+
+
+def test_banda_de_edad_invalida(cliente):
+    assert cliente.get('/pacientes/estadisticas_estancia/', params={'banda_edad': '100+'}).status_code == 400
+
+
+@pytest.mark.parametrize('enfermedad', ['Malaria', 'malaria', 'Bronquitis aguda', 'Paludismo grave'])
+def test_promedio_por_enfermedad(cliente, df, enfermedad):
+    esperado = estadisticas_pandas(df, enfermedad=enfermedad)['promedio_estancia']
+    respuesta = cliente.get('/pacientes/promedio_estancia_por_enfermedad/', params={'enfermedad': enfermedad}).json()
+    assert respuesta == {'enfermedad': enfermedad, 'promedio_Estancia_(días)': esperado}
+
+
+def test_promedio_aproximado(cliente, df):
+    respuesta = cliente.get('/pacientes/promedio_estancia_por_enfermedad/', params={'enfermedad': 'malarria', 'fuzzy': True}).json()
+    assert respuesta == {
+        'enfermedad': 'malarria',
+        'enfermedad_encontrada': 'Malaria',
+        'distancia': 1,
+        'promedio_Estancia_(días)': estadisticas_pandas(df, enfermedad='malaria')['promedio_estancia'],
+    }
+    respuesta = cliente.get('/pacientes/promedio_estancia_por_enfermedad/', params={'enfermedad': 'malarria'}).json()
+    assert respuesta == {'message': "No hay datos disponibles para la enfermedad 'malarria'"}
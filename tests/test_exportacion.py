@@ -0,0 +1,138 @@
+"""Exportación en CSV, Arrow y Parquet leída de vuelta y contrastada con el dataset."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+requiere_pyarrow = pytest.mark.skipif(pa is None, reason="Arrow y Parquet requieren pyarrow")
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+
+
+FILTROS = [
+    {},
+    {'servicio': 'pediatria', 'genero': 'F'},
+    {'enfermedad': 'malaria', 'estancia_min': 10},
+    {'desde': '2015-01-01', 'hasta': '2018-12-31', 'edad_max': 30},
+]
+
+
+def exportar(cliente, formato: str, filtros: dict):
+    respuesta = cliente.get('/pacientes/exportar/', params={'formato': formato, **filtros})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta
+
+
+def ids_consulta(cliente, filtros: dict) -> list:
+    """Ids que devuelve /pacientes/consulta/ (o el listado completo sin filtros)."""
+    if not filtros:
+        return [p['id'] for p in cliente.get('/pacientes', params={'limit': main.LIMITE_MAXIMO}).json()]
+    return [p['id'] for p in cliente.get('/pacientes/consulta/', params={**filtros, 'limit': main.LIMITE_MAXIMO}).json()]
+
+
+def registros_columnares(df: pd.DataFrame, ids: list) -> list:
+    """Filas del CSV con los tipos de la exportación columnar: fechas, textos o None y estancia float."""
+    filas = df.set_index(df['id'].astype(str)).loc[ids].reset_index(drop=True).astype(object)
+    for columna in ('fecha_entrada', 'fecha_alta'):
+        fechas = pd.to_datetime(filas[columna], format='%m/%d/%Y', errors='coerce')
+        filas[columna] = [None if pd.isna(f) else f.date() for f in fechas]
+    filas['Estancia'] = pd.to_numeric(filas['Estancia'], errors='coerce').astype(object)
+    return [{columna: None if valor is None or valor != valor else valor for columna, valor in registro.items()}
+            for registro in filas.to_dict('records')]
+
+
+def comparar_tabla(tabla: 'pa.Table', esperados: list) -> None:
+    assert tabla.schema.equals(main.esquema_arrow())
+    assert tabla.to_pylist() == esperados
+
+
+def test_csv_completo_identico_al_dataset(cliente):
+    respuesta = exportar(cliente, 'csv', {})
+    with open(main.RUTA_CSV, 'rb') as archivo:
+        assert respuesta.content == archivo.read()
+    assert respuesta.headers['content-type'] == 'text/csv; charset=utf-8'
+    assert respuesta.headers['content-disposition'] == 'attachment; filename="pacientes.csv"'
+
+
+@pytest.mark.parametrize('filtros', FILTROS[1:])
+def test_csv_filtrado_ida_y_vuelta(cliente, df, filtros):
+    respuesta = exportar(cliente, 'csv', filtros)
+    ids = ids_consulta(cliente, filtros)
+    assert ids
+    assert respuesta.headers['x-total-filas'] == str(len(ids))
+    leido = pd.read_csv(io.BytesIO(respuesta.content), **main.OPCIONES_CSV)
+    esperado = df.set_index(df['id'].astype(str)).loc[ids].reset_index(drop=True)
+    pd.testing.assert_frame_equal(leido.astype(str), esperado.astype(str))
+
+
+@requiere_pyarrow
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_arrow_ida_y_vuelta(cliente, df, filtros):
+    respuesta = exportar(cliente, 'arrow', filtros)
+    assert respuesta.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+    ids = ids_consulta(cliente, filtros)
+    assert respuesta.headers['x-total-filas'] == str(len(ids))
+    comparar_tabla(pa.ipc.open_stream(respuesta.content).read_all(), registros_columnares(df, ids))
+
+
+@requiere_pyarrow
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_parquet_ida_y_vuelta(cliente, df, filtros):
+    respuesta = exportar(cliente, 'parquet', filtros)
+    assert respuesta.headers['content-type'] == 'application/vnd.apache.parquet'
+    assert respuesta.headers['content-disposition'] == 'attachment; filename="pacientes.parquet"'
+    ids = ids_consulta(cliente, filtros)
+    comparar_tabla(pq.read_table(io.BytesIO(respuesta.content)), registros_columnares(df, ids))
+
+
+@requiere_pyarrow
+def test_exportacion_por_bloques(cliente, df, monkeypatch):
+    monkeypatch.setattr(main, 'FILAS_POR_BLOQUE_EXPORTACION', 100)
+    esperados = registros_columnares(df, df['id'].astype(str).tolist())
+    bloques = int(np.ceil(len(df) / 100))
+
+    lector = pa.ipc.open_stream(exportar(cliente, 'arrow', {}).content)
+    lotes = list(lector)
+    assert [len(lote) for lote in lotes] == [100] * (bloques - 1) + [len(df) % 100 or 100]
+    comparar_tabla(pa.Table.from_batches(lotes, lector.schema), esperados)
+
+    archivo = pq.ParquetFile(io.BytesIO(exportar(cliente, 'parquet', {}).content))
+    assert archivo.num_row_groups == bloques
+    comparar_tabla(archivo.read(), esperados)
+
+    with open(main.RUTA_CSV, 'rb') as original:
+        assert exportar(cliente, 'csv', {}).content == original.read()
+
+
+@requiere_pyarrow
+def test_exportacion_sin_resultados(cliente):
+    filtros = {'enfermedad': 'diabetes', 'servicio': 'pediatria'}
+    assert exportar(cliente, 'csv', filtros).text == ';'.join(main.COLUMNAS_CSV) + '\n'
+    tabla = pq.read_table(io.BytesIO(exportar(cliente, 'parquet', filtros).content))
+    assert tabla.num_rows == 0 and tabla.schema.equals(main.esquema_arrow())
+
+
+def test_formato_invalido(cliente):
+    assert cliente.get('/pacientes/exportar/', params={'formato': 'xlsx'}).status_code == 422
+    assert cliente.get('/pacientes/exportar/', params={'desde': '2012-01-01', 'hasta': '2011-01-01'}).status_code == 400
+
+
+def test_columnar_sin_pyarrow(cliente, monkeypatch):
+    monkeypatch.setattr(main, 'pa', None)
+    for formato in ('arrow', 'parquet'):
+        respuesta = cliente.get('/pacientes/exportar/', params={'formato': formato})
+        assert respuesta.status_code == 501
+        assert respuesta.json()['detail'] == f"El formato '{formato}' requiere pyarrow"
+    assert cliente.get('/pacientes/exportar/').status_code == 200
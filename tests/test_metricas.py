@@ -0,0 +1,97 @@
+"""Superficie /metrics y control del perfilador de muestreo."""
+import re
+import threading
+
+import pytest
+
+import main
+
+
+def metrica(texto, nombre, **etiquetas):
+    """Valor de la serie `nombre` con exactamente esas etiquetas (0 si todavía no existe)."""
+    serie = ','.join(f'{clave}="{valor}"' for clave, valor in etiquetas.items())
+    coincidencia = re.search(rf'^{re.escape(nombre)}{{{re.escape(serie)}}} (\S+)$', texto, re.MULTILINE)
+    return float(coincidencia.group(1)) if coincidencia else 0.0
+
+
+def test_metricas_por_ruta(cliente):
+    ruta = {'metodo': 'GET', 'ruta': '/pacientes/por_servicio/'}
+    antes = cliente.get('/metrics').text
+    respuesta = cliente.get('/pacientes/por_servicio/?servicio=pediatria&limit=5')
+    assert respuesta.status_code == 200
+    despues = cliente.get('/metrics')
+    assert despues.headers['content-type'].startswith('text/plain')
+    despues = despues.text
+
+    def delta(nombre, **etiquetas):
+        return metrica(despues, nombre, **etiquetas) - metrica(antes, nombre, **etiquetas)
+
+    assert delta('pacientes_http_peticiones_total', **ruta, codigo='200') == 1
+    assert delta('pacientes_http_duracion_segundos_count', **ruta) == 1
+    assert delta('pacientes_http_respuesta_bytes_sum', **ruta) == len(respuesta.content)
+    assert delta('pacientes_filas_devueltas_total', **ruta) == 5
+    assert delta('pacientes_filas_escaneadas_total', **ruta) >= 5
+    assert 'pacientes_cache_consultas_total{resultado="acierto"}' in despues
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(main, 'TOKEN_ADMIN_PERFILADOR', 'secreto')
+    yield 'secreto'
+    main.perfilador.detener()
+    main.perfilador.reiniciar()
+
+
+def test_perfilador_deshabilitado_sin_token(cliente, monkeypatch):
+    monkeypatch.setattr(main, 'TOKEN_ADMIN_PERFILADOR', '')
+    respuesta = cliente.post('/metrics/perfilador?activo=true', headers={'X-Token-Admin': ''})
+    assert respuesta.status_code == 403
+    assert not main.perfilador.activo
+
+
+def test_perfilador_rechaza_token_invalido(cliente, token):
+    assert cliente.post('/metrics/perfilador?activo=true').status_code == 403
+    assert cliente.post('/metrics/perfilador?activo=true', headers={'X-Token-Admin': 'otro'}).status_code == 403
+    assert not main.perfilador.activo
+
+
+def test_perfilador_con_token(cliente, token):
+    respuesta = cliente.post('/metrics/perfilador?activo=true&reiniciar=true', headers={'X-Token-Admin': token})
+    assert respuesta.status_code == 200
+    assert respuesta.json()['activo']
+    while main.perfilador.muestras == 0:
+        cliente.get('/pacientes/por_servicio/?servicio=pediatria')
+    respuesta = cliente.post('/metrics/perfilador?activo=false', headers={'X-Token-Admin': token})
+    assert respuesta.json()['activo'] is False
+    pilas = cliente.get('/metrics/perfilador?maximo=5').text.splitlines()
+    assert 0 < len(pilas) <= 5
+    assert all(linea.rsplit(' ', 1)[1].isdigit() for linea in pilas)
+
+
+def test_exponer_espera_al_muestreo():
+    perfilador = main.PerfiladorMuestreo(0.001)
+    perfilador.pilas['a;b'] = 3
+    salida = []
+    lector = threading.Thread(target=lambda: salida.append(perfilador.exponer(10)))
+    # Mientras el muestreo tiene el lock, exponer() no puede recorrer las pilas
+    with perfilador._lock:
+        lector.start()
+        lector.join(0.05)
+        assert lector.is_alive()
+    lector.join()
+    assert salida == ['a;b 3\n']
+
+
+def test_perfilador_muestrea_y_expone_en_paralelo():
+    perfilador = main.PerfiladorMuestreo(0.0001)
+    perfilador.iniciar()
+    try:
+        lectores = [threading.Thread(target=lambda: [perfilador.exponer(1000) for _ in range(500)]) for _ in range(4)]
+        for lector in lectores:
+            lector.start()
+        for lector in lectores:
+            lector.join()
+    finally:
+        perfilador.detener()
+    assert perfilador.muestras > 0
+    assert sum(perfilador.pilas.values()) >= perfilador.muestras
@@ -0,0 +1,50 @@
+"""Arranque sin NLTK y carga de WordNet solo desde rutas locales."""
+from conftest import ejecutar
+
+# Sin rutas propias de NLTK y con la descarga prohibida: WordNet queda sin instalar
+SIN_WORDNET = """
+    import nltk
+    nltk.data.path[:] = []
+
+    def descargar(*args, **kwargs):
+        raise AssertionError('nltk.download no debe llamarse')
+
+    nltk.download = descargar
+"""
+
+
+def test_arranque_perezoso_no_importa_nltk(tmp_path):
+    ejecutar(tmp_path, """
+    import sys
+    from fastapi.testclient import TestClient
+    import main
+
+    assert 'nltk' not in sys.modules
+    cliente = TestClient(main.app)
+    assert cliente.get('/pacientes?limit=1').status_code == 200
+    assert cliente.post('/chat', json={'mensaje': 'cuantos pacientes hay'}).status_code == 200
+    assert 'nltk' not in sys.modules
+    """, MODO_NLP='perezoso')
+
+
+def test_recurso_faltante_no_se_descarga(tmp_path):
+    ejecutar(tmp_path, SIN_WORDNET + """
+    import main
+
+    try:
+        main.get_synonyms('fiebre')
+    except RuntimeError as error:
+        assert 'NLTK_DATA' in str(error)
+    else:
+        raise AssertionError('se esperaba RuntimeError')
+    """, MODO_NLP='perezoso', NLTK_DATA=str(tmp_path / 'nltk_data'))
+
+
+def test_arranque_inmediato_sin_recurso(tmp_path):
+    ejecutar(tmp_path, SIN_WORDNET + """
+    from fastapi.testclient import TestClient
+    import main
+
+    assert main._wordnet is None
+    assert TestClient(main.app).get('/pacientes?limit=1').status_code == 200
+    """, MODO_NLP='inmediato', NLTK_DATA=str(tmp_path / 'nltk_data'))
@@ -0,0 +1,67 @@
+"""Paginación por cursor y respuestas NDJSON en streaming de los listados."""
+import json
+
+import pandas as pd
+import pytest
+
+import main
+from conftest import registros_csv
+
+
+@pytest.fixture(scope='module')
+def esperados():
+    return registros_csv(pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV))
+
+
+def recorrer(cliente, ruta, **parametros):
+    """Pide todas las páginas siguiendo X-Siguiente-Cursor; devuelve los registros y la cantidad de páginas."""
+    registros, paginas, cursor = [], 0, None
+    while True:
+        respuesta = cliente.get(ruta, params={**parametros, **({'cursor': cursor} if cursor is not None else {})})
+        assert respuesta.status_code == 200
+        if parametros.get('formato') == 'ndjson':
+            assert respuesta.headers['content-type'] == 'application/x-ndjson'
+            registros += [json.loads(linea) for linea in respuesta.text.splitlines()]
+        else:
+            registros += respuesta.json()
+        paginas += 1
+        cursor = respuesta.headers.get('x-siguiente-cursor')
+        if cursor is None:
+            return registros, paginas
+
+
+@pytest.mark.parametrize('formato', ['json', 'ndjson'])
+def test_paginas_cubren_todo_el_listado(cliente, esperados, formato):
+    registros, paginas = recorrer(cliente, '/pacientes', limit=100, formato=formato)
+    assert registros == esperados
+    assert paginas == -(-len(esperados) // 100)
+
+
+def test_paginas_de_una_busqueda(cliente):
+    todos = cliente.get('/pacientes/por_servicio/', params={'servicio': 'pediatria'}).json()
+    registros, paginas = recorrer(cliente, '/pacientes/por_servicio/', servicio='pediatria', limit=50)
+    assert registros == todos
+    assert paginas == -(-len(todos) // 50)
+    assert all(registro['Servicio'] == 'Pediatria' for registro in registros)
+
+
+def test_sin_limit_devuelve_todo(cliente, esperados):
+    respuesta = cliente.get('/pacientes')
+    assert respuesta.json() == esperados
+    assert 'x-siguiente-cursor' not in respuesta.headers
+
+
+def test_cursor_al_final(cliente, esperados):
+    respuesta = cliente.get('/pacientes', params={'limit': 10, 'cursor': len(esperados) - 1})
+    assert respuesta.json() == []
+    assert 'x-siguiente-cursor' not in respuesta.headers
+
+
+@pytest.mark.parametrize('parametros', [
+    {'limit': 0},
+    {'limit': main.LIMITE_MAXIMO + 1},
+    {'cursor': -1},
+    {'formato': 'xml'},
+])
+def test_parametros_invalidos(cliente, parametros):
+    assert cliente.get('/pacientes', params=parametros).status_code == 422
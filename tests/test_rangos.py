@@ -0,0 +1,95 @@
+"""Consultas por rango de Estancia y Edad sobre los índices ordenados."""
+import pandas as pd
+import pytest
+
+import main
+from conftest import registros_csv
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(main.RUTA_CSV, **main.OPCIONES_CSV)
+
+
+@pytest.mark.parametrize('url', [
+    '/pacientes/por_estancia/?min=inf&solo_conteo=true',
+    '/pacientes/por_estancia/?min=nan&solo_conteo=true',
+    '/pacientes/por_estancia/?min=nan',
+    '/pacientes/por_estancia/?max=-inf',
+    '/pacientes/por_edad/?max=inf&solo_conteo=true',
+    '/pacientes/por_edad/?min=5&max=nan',
+    '/pacientes/por_edad/?min=9&max=3',
+    '/pacientes/consulta/?estancia_min=inf',
+    '/pacientes/consulta/?edad_max=nan',
+    '/pacientes/exportar/?estancia_max=-inf',
+])
+def test_limites_invalidos(cliente, url):
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 400, respuesta.text
+
+
+def test_conteo_por_estancia(cliente, df):
+    estancia = pd.to_numeric(df['Estancia'], errors='coerce')
+    respuesta = cliente.get('/pacientes/por_estancia/?min=3&max=7&solo_conteo=true')
+    assert respuesta.status_code == 200
+    assert respuesta.json() == {'min': 3, 'max': 7, 'pacientes': int(estancia.between(3, 7).sum())}
+
+
+def test_filas_por_edad(cliente):
+    store = main.obtener_store()
+    respuesta = cliente.get(f'/pacientes/por_edad/?min=60&limit={main.LIMITE_MAXIMO}')
+    assert respuesta.status_code == 200
+    ids = [paciente['id'] for paciente in respuesta.json()]
+    assert sorted(ids) == sorted(store.ids[store.edad >= 60].tolist())
+
+
+def edad_en_anos(texto) -> float:
+    """Edad en años del texto del CSV: los neonatos vienen en días ("5 jours", "1 Jour")."""
+    partes = str(texto).split()
+    try:
+        valor = float(partes[0].replace(',', '.'))
+    except (IndexError, ValueError):
+        return float('nan')
+    return valor / 365 if len(partes) > 1 and partes[1].lower().startswith('jour') else valor
+
+
+@pytest.mark.parametrize('ruta, parametros', [
+    ('por_estancia', {'min': 3, 'max': 7}),
+    ('por_estancia', {'min': 365}),
+    ('por_estancia', {'max': 0}),
+    ('por_estancia', {'estancia': 21}),
+    ('por_estancia', {'min': 2.5, 'max': 3.5}),
+    ('por_edad', {'min': 60}),
+    ('por_edad', {'max': 0.05}),
+    ('por_edad', {'min': 18, 'max': 18}),
+    ('por_edad', {'min': 1, 'max': 12}),
+])
+def test_rango_igual_a_pandas(cliente, df, ruta, parametros):
+    if ruta == 'por_estancia':
+        valores = pd.to_numeric(df['Estancia'], errors='coerce')
+    else:
+        valores = df['Edad'].map(edad_en_anos).astype(float)
+    minimo = parametros.get('estancia', parametros.get('min', float('-inf')))
+    maximo = parametros.get('estancia', parametros.get('max', float('inf')))
+    esperados = registros_csv(df[valores.between(minimo, maximo)])
+    assert esperados
+
+    respuesta = cliente.get(f'/pacientes/{ruta}/', params={**parametros, 'limit': main.LIMITE_MAXIMO})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == esperados
+    conteo = cliente.get(f'/pacientes/{ruta}/', params={**parametros, 'solo_conteo': True}).json()
+    assert conteo['pacientes'] == len(esperados)
+
+
+def test_rango_sin_limites(cliente):
+    for ruta in ('por_estancia', 'por_edad'):
+        respuesta = cliente.get(f'/pacientes/{ruta}/')
+        assert respuesta.status_code == 400
+        assert respuesta.json()['detail'] == "Indique al menos 'min' o 'max'"
+
+
+def test_rango_vacio(cliente):
+    assert cliente.get('/pacientes/por_estancia/', params={'min': 100000}).json() == []
+    assert cliente.get('/pacientes/por_edad/', params={'min': 200, 'solo_conteo': True}).json() == {
+        'min': 200, 'max': None, 'pacientes': 0,
+    }
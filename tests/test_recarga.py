@@ -0,0 +1,86 @@
+"""Recarga en caliente del CSV: filas agregadas, reescrituras y vigilante."""
+from conftest import ejecutar
+
+# Prepara un cliente y una función para agregar texto al CSV
+INICIO = """
+    import time
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+
+    def agregar(texto):
+        with open(main.RUTA_CSV, 'a', encoding='utf-8') as archivo:
+            archivo.write(texto)
+
+    def contar(servicio):
+        return cliente.get('/pacientes/estadisticas_estancia/', params={'servicio': servicio}).json()['pacientes']
+"""
+
+
+def test_filas_agregadas(tmp_path):
+    ejecutar(tmp_path, INICIO + """
+    total = len(cliente.get('/pacientes').json())
+    pediatria = contar('pediatria')
+    assert not main.recargar_pacientes()
+
+    # La última línea está incompleta: se carga recién cuando termina
+    agregar('s9001;3/01/2019;3/05/2019;F;40;Diabetes;Pediatria;4\\ns9002;3/02/2019;3/0')
+    assert main.recargar_pacientes()
+    respuesta = cliente.get('/pacientes')
+    assert respuesta.headers['x-generacion-datos'] == '2'
+    assert len(respuesta.json()) == total + 1
+    assert cliente.get('/pacientes/s9002').json() == {'detalle': 'paciente no encontrado'}
+    assert contar('pediatria') == pediatria + 1
+
+    agregar('9/2019;M;7;Gripe;Pediatria;7\\n')
+    assert main.recargar_pacientes()
+    assert cliente.get('/pacientes/s9002').json()['fecha_alta'] == '3/09/2019'
+    assert len(cliente.get('/pacientes').json()) == total + 2
+    assert contar('pediatria') == pediatria + 2
+    assert cliente.get('/pacientes').headers['x-generacion-datos'] == '3'
+    """)
+
+
+def test_csv_reescrito(tmp_path):
+    ejecutar(tmp_path, INICIO + """
+    with open(main.RUTA_CSV, encoding='utf-8') as archivo:
+        lineas = archivo.readlines()
+    with open(main.RUTA_CSV, 'w', encoding='utf-8') as archivo:
+        archivo.writelines(lineas[:101])
+    assert main.recargar_pacientes()
+    respuesta = cliente.get('/pacientes')
+    assert respuesta.headers['x-generacion-datos'] == '2'
+    assert len(respuesta.json()) == 100
+    """)
+
+
+def test_recarga_conserva_las_escrituras_del_diario(tmp_path):
+    ejecutar(tmp_path, INICIO + """
+    respuesta = cliente.post('/pacientes', json={
+        'id': 'prueba-1', 'fecha_entrada': '2020-01-01', 'genero': 'F', 'edad': 40,
+        'enfermedad': 'Neumonia', 'servicio': 'UCI',
+    })
+    assert respuesta.status_code == 201
+
+    # Reescribir el CSV obliga a reconstruir todo y a reaplicar el diario
+    with open(main.RUTA_CSV, encoding='utf-8') as archivo:
+        texto = archivo.read()
+    with open(main.RUTA_CSV, 'w', encoding='utf-8') as archivo:
+        archivo.write(texto.replace(';Pediatria;', ';Pediatría;', 1))
+    assert main.recargar_pacientes()
+    assert cliente.get('/pacientes/prueba-1').json()['Servicio'] == 'UCI'
+    assert cliente.get('/pacientes/s1').json()['Servicio'] == 'Pediatría'
+    """)
+
+
+def test_vigilante_publica_los_cambios(tmp_path):
+    ejecutar(tmp_path, INICIO + """
+    assert any(hilo.name == 'vigilante-csv' for hilo in main.threading.enumerate())
+    agregar('s9001;3/01/2019;3/05/2019;F;40;Diabetes;Pediatria;4\\n')
+    limite = time.monotonic() + 30
+    while cliente.get('/pacientes/s9001').json().get('id') != 's9001':
+        assert time.monotonic() < limite, 'el vigilante no recargó el CSV'
+        time.sleep(0.05)
+    assert main.pacientes_store.generacion == 2
+    """, RECARGA_AUTOMATICA='1', INTERVALO_RECARGA_S='0.05')
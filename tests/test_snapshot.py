@@ -0,0 +1,80 @@
+"""Arranque desde el snapshot binario y su invalidación cuando cambia el CSV."""
+import json
+
+from conftest import ejecutar, entorno_temporal
+
+CONSULTAS = [
+    '/pacientes',
+    '/pacientes/s500',
+    '/pacientes/por_servicio/?servicio=pediatria',
+    '/pacientes/por_estancia/?min=3&max=9',
+    '/pacientes/consulta/?enfermedad=malaria&genero=f',
+    '/pacientes/estadisticas_estancia/?servicio=hospitalizacion',
+    '/pacientes/distribucion_estancia/?enfermedad=diabetes',
+    '/pacientes/censo_camas/?desde=2019-01-01&hasta=2019-03-31&por_servicio=true',
+]
+
+CONSULTAR = f"""
+    import json
+    from fastapi.testclient import TestClient
+    import main
+
+    cliente = TestClient(main.app)
+    print(json.dumps({{
+        'desde_snapshot': not main.pacientes_store.ids.flags.writeable,
+        'respuestas': [cliente.get(url).json() for url in {CONSULTAS!r}],
+    }}))
+"""
+
+
+def arrancar(directorio):
+    """Arranca main en un proceso nuevo con el snapshot activado y devuelve lo que respondió."""
+    return json.loads(ejecutar(directorio, CONSULTAR, USAR_SNAPSHOT='1'))
+
+
+def test_arranque_desde_snapshot(tmp_path):
+    snapshot = tmp_path / 'pacientes.csv.snapshot'
+    desde_csv = arrancar(tmp_path)
+    assert not desde_csv['desde_snapshot']
+    assert snapshot.exists()
+
+    desde_snapshot = arrancar(tmp_path)
+    assert desde_snapshot['desde_snapshot']
+    assert desde_snapshot['respuestas'] == desde_csv['respuestas']
+
+
+def test_csv_agregado_se_suma_al_snapshot(tmp_path):
+    ruta_csv = tmp_path / 'pacientes.csv'
+    snapshot = tmp_path / 'pacientes.csv.snapshot'
+    entorno_temporal(str(tmp_path))
+    total = len(arrancar(tmp_path)['respuestas'][0])
+    escrito = snapshot.stat().st_mtime_ns
+
+    with open(ruta_csv, 'a', encoding='utf-8') as archivo:
+        archivo.write('s9001;3/01/2019;3/05/2019;F;40;Diabetes;Pediatria;4\n')
+    agregado = arrancar(tmp_path)
+    assert len(agregado['respuestas'][0]) == total + 1
+    assert agregado['respuestas'][0][-1]['id'] == 's9001'
+    assert snapshot.stat().st_mtime_ns != escrito
+
+    # El snapshot reescrito ya incluye la fila agregada
+    siguiente = arrancar(tmp_path)
+    assert siguiente['desde_snapshot']
+    assert siguiente['respuestas'] == agregado['respuestas']
+
+
+def test_csv_reescrito_descarta_el_snapshot(tmp_path):
+    ruta_csv = tmp_path / 'pacientes.csv'
+    entorno_temporal(str(tmp_path))
+    original = arrancar(tmp_path)
+
+    # Mismo tamaño, contenido distinto: s500 pasa a tener otro servicio
+    texto = ruta_csv.read_text(encoding='utf-8')
+    linea = next(linea for linea in texto.splitlines() if linea.startswith('s500;'))
+    assert ';Pediatria;' in linea
+    ruta_csv.write_text(texto.replace(linea, linea.replace(';Pediatria;', ';Pediatrie;')), encoding='utf-8')
+
+    reescrito = arrancar(tmp_path)
+    assert not reescrito['desde_snapshot']
+    assert original['respuestas'][1]['Servicio'] == 'Pediatria'
+    assert reescrito['respuestas'][1]['Servicio'] == 'Pediatrie'